@@ -11,9 +11,16 @@ from System.Text import *
 clr.AddReference('System.Xml')
 from System.Xml import *
 from System.IO import *
+from System import AppDomain
+import re
 
 class JSON(FormatPlugin):
   
+	#Finds the value elements in the Xml that the SlotSplicer splices injected values into
+	slot_regex = re.compile("<(str|num|bool|undef)>([^<]*)</\\1>")
+	#XmlToJson writes a value that is only a marker as a JSON string
+	slot_quote = "\""
+	
 	def ToXmlFromRequest(self, Request):
 	    return self.ToXml(Request.BodyArray)
 	
@@ -25,7 +32,11 @@ class JSON(FormatPlugin):
 		return self.JsonToXml(JSONString)
 	
 	def ToRequestFromXml(self, Request, XML):
-		Request.BodyArray = self.ToObject(XML)
+		JSONString = AppDomain.CurrentDomain.GetData("SlotSplicer").get_body(self, Request, XML)
+		if JSONString == None:
+			Request.BodyArray = self.ToObject(XML)
+		else:
+			Request.BodyArray = Encoding.UTF8.GetBytes(JSONString)
 		return Request
 	
 	def ToResponseFromXml(self, Response, XML):
@@ -149,31 +160,61 @@ class JSON(FormatPlugin):
 				elif XR.Name == "cons" :
 					JTW.WriteEndConstructor()
 			elif XR.NodeType == XmlNodeType.Text :
-				if ValueType == "num" :
-					try:
-						JTW.WriteValue(int(XR.Value.Trim()))
-					except:
-						try:
-							JTW.WriteValue(float.Parse(XR.Value.Trim()))
-						except:
-							JTW.WriteValue(XR.Value)
-				elif ValueType == "str" :
-					JTW.WriteValue(XR.Value.ToString())
-				elif ValueType == "bool" :
-					if XR.Value.ToString().Equals("1"):
-						JTW.WriteValue(True)
-					elif(XR.Value.ToString().Equals("0")):
-						JTW.WriteValue(False)
-					else:
-						JTW.WriteValue(XR.Value)
-				elif ValueType == "undef" :
-					if XR.Value.ToString() == "null" :
-						JTW.WriteNull()
-					else:
-						JTW.WriteValue(XR.Value.ToString())
+				self.WriteValue(JTW, ValueType, XR.Value)
 		JTW.Close()
 		return JW.ToString()
 
+	def WriteValue(self, JTW, ValueType, Value):
+		if ValueType == "num" :
+			try:
+				JTW.WriteValue(int(Value.Trim()))
+			except:
+				try:
+					JTW.WriteValue(float.Parse(Value.Trim()))
+				except:
+					JTW.WriteValue(Value)
+		elif ValueType == "str" :
+			JTW.WriteValue(Value.ToString())
+		elif ValueType == "bool" :
+			if Value.ToString().Equals("1"):
+				JTW.WriteValue(True)
+			elif(Value.ToString().Equals("0")):
+				JTW.WriteValue(False)
+			else:
+				JTW.WriteValue(Value)
+		elif ValueType == "undef" :
+			if Value.ToString() == "null" :
+				JTW.WriteNull()
+			else:
+				JTW.WriteValue(Value.ToString())
+
+	#The Xml from JsonToXml and the same without the indentation as written out by an XmlDocument, see SlotSplicer
+	def get_slot_xmls(self, req):
+		xml = self.JsonToXml(Encoding.UTF8.GetString(req.BodyArray))
+		xd = XmlDocument()
+		xd.LoadXml(xml)
+		return [xml, xd.OuterXml]
+
+	def rebuild_body(self, req, xml):
+		return self.XmlToJson(xml)
+
+	def get_slot_kind(self, m):
+		return m.group(1)
+
+	#XmlReader turns line breaks into \n, an empty value element is written as an empty string by XmlToJson
+	def read_slot_value(self, text):
+		return AppDomain.CurrentDomain.GetData("SlotSplicer").read_text(text, True)
+
+	def write_slot_value(self, value_type, value):
+		JW = StringWriter()
+		JTW = Json.JsonTextWriter(JW)
+		if len(value) == 0:
+			JTW.WriteValue("")
+		else:
+			self.WriteValue(JTW, value_type, value)
+		JTW.Flush()
+		return JW.ToString()
+
 p = JSON();
 p.Name = "JSON";
 p.Description = "Plugin to Convert JSON to XML and XML to JSON. Used in the Scanner section to set Injection points"
@@ -8,10 +8,67 @@ from System.Text import *
 clr.AddReference('System.Xml')
 from System.Xml import *
 from System.Collections.Generic import *
+from System.Security.Cryptography import MD5
+from System.Threading import Monitor
+from collections import OrderedDict
+import re
+
+#Keeps the bytes of the binary parts of multipart bodies so that the Xml has a short handle in their place instead of their Base64 encoding.
+#File contents are not injected into, so putting them back is a copy of the stored bytes and not a decode for every injected request.
+#The least recently used parts are dropped when they take more than max_bytes, see MultiPart.get_part for how a dropped part is found again.
+#It is only used when MultiPart.binary_part_handles is set to True.
+class BinaryPartStore:
+
+	max_bytes = 64 * 1024 * 1024
+	handle_prefix = "ironwasp-binary-part:"
+	#A value with a payload added to a handle is not a handle
+	handle_regex = re.compile("^" + handle_prefix + "[0-9a-f]{32}:[0-9]+$")
+
+	def __init__(self):
+		self.lock = Object()
+		self.parts = OrderedDict()
+		self.bytes = 0
+
+	#Stores the bytes and returns their handle, the md5 and the length of the bytes
+	def put(self, ba):
+		handle = "{0}{1}:{2}".format(self.handle_prefix, BitConverter.ToString(MD5.Create().ComputeHash(ba)).replace("-", "").lower(), len(ba))
+		Monitor.Enter(self.lock)
+		try:
+			if self.parts.has_key(handle):
+				self.parts.pop(handle)
+			else:
+				self.bytes = self.bytes + len(ba)
+			self.parts[handle] = ba
+			while len(self.parts) > 1 and self.bytes > self.max_bytes:
+				old_handle, old_ba = self.parts.popitem(False)
+				self.bytes = self.bytes - len(old_ba)
+		finally:
+			Monitor.Exit(self.lock)
+		return handle
+
+	#Returns the stored bytes of the handle or None
+	def get(self, handle):
+		Monitor.Enter(self.lock)
+		try:
+			if not self.parts.has_key(handle):
+				return None
+			ba = self.parts.pop(handle)
+			self.parts[handle] = ba
+			return ba
+		finally:
+			Monitor.Exit(self.lock)
+
+	def is_handle(self, value):
+		return self.handle_regex.match(value) != None
+
 
 #Inherit from the base FormatPlugin class
 class MultiPart(FormatPlugin):
 
+	#Binary parts are written to the Xml as their Base64 encoding, set this to True to write handles to the bytes in part_store instead
+	binary_part_handles = False
+	part_store = BinaryPartStore()
+
 	#Override the ToXmlFromRequest method of the base class with custom functionlity. Convert RequestBody in to Xml String and return it
 	def ToXmlFromRequest(self, Req):
 		return self.BodyToXml(Req)
@@ -37,20 +94,25 @@ class MultiPart(FormatPlugin):
 		pass
 	
 	
-	#Compare byte_arrays
-	def check_boundary(self, sign_bytes, ba, index):
-		for i in range(len(sign_bytes)):
-			if(sign_bytes[i] != ba[index + i]):
-				return "No"
-		end_ba = Array.CreateInstance(Byte,2)
-		Array.Copy(ba,index+len(sign_bytes),end_ba,0,2)
-		end_str = Encoding.UTF8.GetString(end_ba)
-		if end_str == "--":
-			return "End"
-		elif end_str == "\r\n":
-			return "Bound"
-		else:
-			return "No"
+	#Returns the offsets in the body of every boundary, the last one is that of the end of body marker.
+	#The body is read as ISO-8859-1 so that each byte becomes one character and the native string search finds all markers in one pass.
+	def get_boundary_points(self, req, sign_bytes):
+		latin1 = Encoding.GetEncoding(28591)
+		body_str = latin1.GetString(req.BodyArray)
+		sign_str = latin1.GetString(sign_bytes)
+		points = []
+		i = body_str.find(sign_str)
+		while i > -1:
+			end_str = body_str[i + len(sign_str):i + len(sign_str) + 2]
+			if end_str == "--":
+				points.append(i)
+				break
+			elif end_str == "\r\n":
+				points.append(i)
+				i = body_str.find(sign_str, i + len(sign_str) + 2)
+			else:
+				i = body_str.find(sign_str, i + 1)
+		return points
 	
 	#Gets the ByteArray of Boundry and End of body markers
 	def get_bs(self, req):
@@ -61,34 +123,14 @@ class MultiPart(FormatPlugin):
 	
 	def BodyToXml(self, req):
 		b_len = len(req.Headers.Get("Content-Type").split("boundary=")[1]) + 4
-		bs = self.get_bs(req)
-		i = 0
-		points = []
-		while i < req.BodyLength:
-			chk_result = self.check_boundary(bs, req.BodyArray, i)
-			if chk_result == "Bound":
-				points.append(i)
-				#print "Boundary @ " + str(i + b_len)
-				i = i + b_len
-			elif chk_result == "End":
-				points.append(i)
-				#print "End @ " + str(i + b_len + 2)
-				i = req.BodyLength
-			else:
-				i = i+ 1
+		points = self.get_boundary_points(req, self.get_bs(req))
 		ba_parts = []
-		start_point = 0
-		for i in range(len(points)):
-			if i == len(points) - 1:
-				part = Array[Byte](range(end_point - start_point))
-			else:
-				if i == 0:
-					start_point = points[i] + b_len
-				end_point = points[i + 1] - 2
-				part = Array.CreateInstance(Byte,end_point - start_point)
-				Array.Copy(req.BodyArray, start_point, part,0, end_point - start_point)
-				ba_parts.append(part)
-				start_point = points[i + 1] + b_len
+		for i in range(len(points) - 1):
+			start_point = points[i] + b_len
+			end_point = points[i + 1] - 2
+			part = Array.CreateInstance(Byte, end_point - start_point)
+			Array.Copy(req.BodyArray, start_point, part, 0, end_point - start_point)
+			ba_parts.append(part)
 		#print len(ba_parts)
 		XB = StringBuilder()
 		Settings = XmlWriterSettings()
@@ -138,7 +180,10 @@ class MultiPart(FormatPlugin):
 			binary_data = Array.CreateInstance(Byte, len(ba) - (len(parts[0]) + 4 ))#don't use len(parts[1]) as binary values would have incorrect length in the string form
 			Array.Copy(ba, len(parts[0]) + 4, binary_data,0, len(binary_data))
 			#xml = xml + Tools.Base64Encode(binary_data)
-			XW.WriteValue(Tools.Base64EncodeByteArray(binary_data))
+			if self.binary_part_handles:
+				XW.WriteValue(self.part_store.put(binary_data))
+			else:
+				XW.WriteValue(Tools.Base64EncodeByteArray(binary_data))
 		else:
 			#xml = xml + parts[1]
 			XW.WriteValue(parts[1])
@@ -192,7 +237,15 @@ class MultiPart(FormatPlugin):
 				body_list.AddRange(Encoding.UTF8.GetBytes("\r\n"))
 			#mp = mp + "\r\n"
 			body_list.AddRange(Encoding.UTF8.GetBytes("\r\n"))
-			if binary:
+			binary_part = None
+			if binary and self.part_store.is_handle(value):
+				binary_part = self.get_part(req, value)
+				#writing the handle into the body would silently replace the upload with it
+				if binary_part == None:
+					raise Exception("Binary part {0} is not in the part store and is not in the body of the request".format(value))
+			if binary_part != None:
+				body_list.AddRange(binary_part)
+			elif binary:
 				#mp = mp + Tools.Base64Decode(value)
 				try:
 					body_list.AddRange(Tools.Base64DecodeToByteArray(value))
@@ -207,6 +260,19 @@ class MultiPart(FormatPlugin):
 		body_list.AddRange(Encoding.UTF8.GetBytes(boundary + "--\r\n"))
 		req.BodyArray = body_list.ToArray()
 		return req
+	
+	#Returns the bytes of the binary part handle or None. If the part was dropped from part_store the body of the request,
+	#which is normally the one the Xml was made from, is converted again to put its binary parts back in the store.
+	#XmlToBody raises when this returns None, there is no way to get the bytes back from the handle.
+	def get_part(self, req, handle):
+		ba = self.part_store.get(handle)
+		if ba == None:
+			try:
+				self.BodyToXml(req)
+			except:
+				return None
+			ba = self.part_store.get(handle)
+		return ba
 
 p = MultiPart()
 p.Name = "MultiPart"
@@ -0,0 +1,235 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+
+from IronWASP import *
+from System import *
+from System.Security.Cryptography import MD5
+from System.Threading import Monitor
+from collections import OrderedDict
+import re
+
+#Makes an injected request by splicing the new value into the body that a format plugin rebuilt from its xml, instead of converting
+#the whole injected xml back. Used by the JSON and XML format plugins.
+#This file does not add a format plugin, it only creates a single splicer and puts it in the AppDomain under the name 'SlotSplicer'.
+#Format plugins get it with AppDomain.CurrentDomain.GetData("SlotSplicer") and call get_body with themselves, the request and the injected xml.
+#
+#A slot is the text of an element in the xml of a body that a value can be injected into. For each body the splicer keeps one or more
+#references, each is an xml form of the body with the offsets of its slots, the body rebuilt from it and the offsets of each slot's value
+#in that body. The rebuilt body and its offsets are found by converting the xml once with a marker in every slot, and a reference is only
+#used if splicing the original values back in gives the same body as the full conversion.
+#When the injected xml is the same as a reference except inside one slot, the new value is read and written like the conversion would
+#and spliced into the body of the reference. Anything else goes through the full conversion.
+#References are keyed on the plugin and the md5 of the body and are only made the second time a body is seen, so that bodies
+#that are never injected into cost only the md5.
+#
+#The plugin has the parts that depend on its format:
+#	slot_regex - finds the slots in the xml, group 1 is the element name and group 2 the text
+#	slot_quote - the text the rebuilt body has on both sides of a slot that is only a marker, like the quotes of a JSON string
+#	get_slot_xmls(req) - the xml forms of the body of the request to make references from
+#	rebuild_body(req, xml) - the full conversion of the xml to a body
+#	get_slot_kind(m) - what the writer needs to know about the slot matched by slot_regex
+#	read_slot_value(text) - the value the conversion reads from the text of a slot or None, see read_text
+#	write_slot_value(kind, value) - the value as the conversion writes it in the body
+class SlotSplicer:
+
+	max_entries = 400
+	#Most number of characters of xml and rebuilt bodies that the references of the JSON and XML plugins hold together
+	max_chars = 128 * 1024 * 1024
+	entity_regex = re.compile("&(lt|gt|amp|quot|apos|#[0-9]+|#x[0-9a-fA-F]+);")
+	invalid_char_regex = re.compile(u"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+	entities = {"lt": "<", "gt": ">", "amp": "&", "quot": "\"", "apos": "'"}
+
+	def __init__(self):
+		self.lock = Object()
+		#plugin name|md5 of the body -> list of SlotReference, None if the body has been seen only once or False if it has no usable reference
+		self.entries = OrderedDict()
+		self.chars = 0
+
+	#Returns the body for the injected xml, or None if it has to be converted in full
+	def get_body(self, plugin, req, xml):
+		key = "{0}|{1}".format(plugin.Name, BitConverter.ToString(MD5.Create().ComputeHash(req.BodyArray)))
+		Monitor.Enter(self.lock)
+		try:
+			seen = self.entries.has_key(key)
+			if seen:
+				refs = self.entries.pop(key)
+				self.entries[key] = refs
+		finally:
+			Monitor.Exit(self.lock)
+		if not seen:
+			self.put(key, None)
+			return None
+		if refs == None:
+			refs = self.make_references(plugin, req)
+			self.put(key, refs)
+		if refs == False:
+			return None
+		try:
+			for ref in refs:
+				body = self.splice(plugin, ref, xml)
+				if body != None:
+					return body
+		except:
+			pass
+		return None
+
+	def put(self, key, refs):
+		Monitor.Enter(self.lock)
+		try:
+			if self.entries.has_key(key):
+				self.chars = self.chars - self.get_size(self.entries.pop(key))
+			self.entries[key] = refs
+			self.chars = self.chars + self.get_size(refs)
+			while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.chars > self.max_chars):
+				old_key, old_refs = self.entries.popitem(False)
+				self.chars = self.chars - self.get_size(old_refs)
+		finally:
+			Monitor.Exit(self.lock)
+
+	def get_size(self, refs):
+		if not refs:
+			return 0
+		return sum([len(ref.xml) + len(ref.body) for ref in refs])
+
+	def make_references(self, plugin, req):
+		refs = []
+		try:
+			for xml in plugin.get_slot_xmls(req):
+				ref = self.make_reference(plugin, req, xml)
+				if ref != None:
+					refs.append(ref)
+		except:
+			pass
+		if len(refs) == 0:
+			return False
+		return refs
+
+	def make_reference(self, plugin, req, xml):
+		marker = "ironwaspslot{0}n".format(Tools.GetRandomNumber(100000, 1000000))
+		if xml.find(marker) > -1:
+			return None
+		ref = SlotReference(xml)
+		marked_xml = []
+		last = 0
+		values = []
+		for m in plugin.slot_regex.finditer(xml):
+			#slots whose value is not read here, like whitespace, are left as they are and go through the full conversion when injected
+			value = plugin.read_slot_value(m.group(2))
+			if value == None:
+				continue
+			ref.slots.append([m.start(2), m.end(2), plugin.get_slot_kind(m)])
+			values.append(value)
+			marked_xml.append(xml[last:m.start(2)])
+			marked_xml.append("{0}{1}e".format(marker, len(ref.slots) - 1))
+			last = m.end(2)
+		if len(ref.slots) == 0:
+			return None
+		marked_xml.append(xml[last:])
+		marked_body = plugin.rebuild_body(req, "".join(marked_xml))
+		body = []
+		body_length = 0
+		last = 0
+		for i in range(len(ref.slots)):
+			slot_marker = "{0}{1}{2}e{0}".format(plugin.slot_quote, marker, i)
+			if marked_body.count(slot_marker) != 1:
+				return None
+			start = marked_body.index(slot_marker)
+			body.append(marked_body[last:start])
+			body_length = body_length + start - last
+			written_value = plugin.write_slot_value(ref.slots[i][2], values[i])
+			body.append(written_value)
+			ref.body_slots.append([body_length, body_length + len(written_value)])
+			body_length = body_length + len(written_value)
+			last = start + len(slot_marker)
+		body.append(marked_body[last:])
+		ref.body = "".join(body)
+		if ref.body != plugin.rebuild_body(req, xml):
+			return None
+		return ref
+
+	#Returns the body for the injected xml if it differs from the reference only inside one slot, else None
+	def splice(self, plugin, ref, xml):
+		i = self.find_slot(ref, xml)
+		if i < 0:
+			return None
+		start, end, kind = ref.slots[i]
+		value = plugin.read_slot_value(xml[start:end + len(xml) - len(ref.xml)])
+		if value == None:
+			return None
+		body_start, body_end = ref.body_slots[i]
+		return ref.body[:body_start] + plugin.write_slot_value(kind, value) + ref.body[body_end:]
+
+	#Returns the index of the only slot that the injected xml differs from the reference in, or -1.
+	#The slot of the previous injection is checked first as payloads are injected into the same slot one after another.
+	def find_slot(self, ref, xml):
+		if self.is_only_change(ref, xml, ref.last_slot):
+			return ref.last_slot
+		#the last slot that starts before the first character that is different
+		low = 0
+		high = len(ref.slots) - 1
+		while low < high:
+			mid = (low + high + 1) / 2
+			if String.CompareOrdinal(xml, 0, ref.xml, 0, ref.slots[mid][0]) == 0:
+				low = mid
+			else:
+				high = mid - 1
+		if self.is_only_change(ref, xml, low):
+			ref.last_slot = low
+			return low
+		return -1
+
+	def is_only_change(self, ref, xml, i):
+		start, end = ref.slots[i][0], ref.slots[i][1]
+		shift = len(xml) - len(ref.xml)
+		if end + shift < start:
+			return False
+		return String.CompareOrdinal(xml, 0, ref.xml, 0, start) == 0 and String.CompareOrdinal(xml, end + shift, ref.xml, end, len(ref.xml) - end) == 0
+
+	#Returns the value XmlReader reads from the text of a slot, or None for text that it may not read as a single text node.
+	#Set normalize_newlines for readers that turn line breaks into \n, an empty text is returned as it is.
+	def read_text(self, text, normalize_newlines):
+		if text.find("<") > -1 or text.find("]]>") > -1:
+			return None
+		if normalize_newlines:
+			text = text.replace("\r\n", "\n").replace("\r", "\n")
+		if text.find("&") > -1:
+			if len(self.entity_regex.sub("", text).split("&")) > 1:
+				return None
+			try:
+				text = self.entity_regex.sub(self.read_entity, text)
+			except:
+				return None
+		if self.invalid_char_regex.search(text) != None:
+			return None
+		#text that is only whitespace is not read as a text node
+		if len(text) > 0 and len(text.strip(" \t\r\n")) == 0:
+			return None
+		return text
+
+	def read_entity(self, m):
+		name = m.group(1)
+		if self.entities.has_key(name):
+			return self.entities[name]
+		if name.startswith("#x"):
+			code = int(name[2:], 16)
+		else:
+			code = int(name[1:])
+		#surrogates are not allowed as character references and characters above them are left to the full conversion
+		if code >= 0xD800:
+			raise ValueError("Character reference not handled")
+		return unichr(code)
+
+
+class SlotReference:
+
+	def __init__(self, xml):
+		self.xml = xml
+		#[start, end, kind from get_slot_kind] of the text of each slot in xml
+		self.slots = []
+		self.body = ""
+		#[start, end] of the value of each slot in body
+		self.body_slots = []
+		self.last_slot = 0
+
+
+AppDomain.CurrentDomain.SetData("SlotSplicer", SlotSplicer())
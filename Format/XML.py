@@ -5,9 +5,16 @@ from IronWASP import *
 from System.Text import *
 from System.IO import *
 from System.Xml import *
+from System import AppDomain
+import re
 
 class XML(FormatPlugin):
   
+	#Finds the text of val elements and of a_ elements other than those of xml: attributes, whose values the writer checks.
+	#The SlotSplicer splices injected values into them.
+	slot_regex = re.compile("<(val|a_(?!xml)[^\\s/>]+)>([^<]*)</\\1>")
+	slot_quote = ""
+	
 	def ToXmlFromRequest(self, Req):
 		original_xml = Req.BodyString
 		ironwasp_xml = self.original_xml_to_ironwasp_xml(original_xml)
@@ -23,11 +30,10 @@ class XML(FormatPlugin):
 		return self.original_xml_to_ironwasp_xml(original_xml)
 	
 	def ToRequestFromXml(self, Req, XML):
-		xml_dec = self.get_xml_declaration(Req.BodyString)
-		ironwasp_xml = XML.strip()
-		original_xml = self.ironwasp_xml_to_original_xml(ironwasp_xml)
-		if len(xml_dec) > 0:
-			original_xml = "<?xml {0}?>{1}".format(xml_dec, original_xml)
+		original_xml = AppDomain.CurrentDomain.GetData("SlotSplicer").get_body(self, Req, XML)
+		if original_xml == None:
+			xml_dec = self.get_xml_declaration(Req.BodyString)
+			original_xml = self.get_original_body(XML, xml_dec)
 		Req.BodyString = original_xml
 		return Req
 	
@@ -40,11 +46,26 @@ class XML(FormatPlugin):
 		Res.BodyString = original_xml
 		return Res
 	
+	def get_original_body(self, XML, xml_dec):
+		ironwasp_xml = XML.strip()
+		original_xml = self.ironwasp_xml_to_original_xml(ironwasp_xml)
+		if len(xml_dec) > 0:
+			original_xml = "<?xml {0}?>{1}".format(xml_dec, original_xml)
+		return original_xml
+	
 	def ToObject(self, XmlString):
 		original_xml = self.ironwasp_xml_to_original_xml(XmlString)
 		return Encoding.UTF8.GetBytes(original_xml)
 	
+	#Converts with XmlReader and XmlWriter without building a DOM, giving the same Xml as the DOM based conversion.
+	#Xml that the streaming conversion does not handle, like Xml with a DTD, and Xml that is not well formed go through the DOM based one.
 	def original_xml_to_ironwasp_xml(self, original_xml):
+		try:
+			return self.otoi_stream(original_xml)
+		except:
+			return self.otoi_dom(original_xml)
+	
+	def otoi_dom(self, original_xml):
 		xd = XmlDocument()
 		xd.LoadXml(original_xml)
 		#xb = StringBuilder()
@@ -69,30 +90,13 @@ class XML(FormatPlugin):
 	
 	def otoi_read_node(self, node, xw):
 		if node.NodeType == XmlNodeType.Element:
-			node_full_name = node.Name
-			node_name_parts = node.Name.split(":")
-			node_prefix = ""
-			node_name = node_full_name
-			if len(node_name_parts) > 1:
-				node_prefix = node_name_parts[0]
-				node_name = node_name_parts[1]
-			xw.WriteStartElement("n_{0}_{1}_{2}".format(len(node_prefix), node_prefix, node_name))
+			self.otoi_write_start_element(node.Name, xw)
 			has_attrs = False
 			if node.Attributes != None and node.Attributes.Count > 0:
 				has_attrs = True
 				xw.WriteStartElement("attrs")
 				for att in node.Attributes:
-					if att.Name.startswith("xmlns"):
-						if att.Name.count(":") > 0:
-							xw.WriteStartElement("xmlns_{0}".format(att.Name[6:]))
-						else:
-							xw.WriteStartElement("xmlns_")
-						xw.WriteValue(att.Value)
-						xw.WriteEndElement()
-					else:
-						xw.WriteStartElement("a_{0}".format(att.Name))
-						xw.WriteValue(att.Value)
-						xw.WriteEndElement()
+					self.otoi_write_attribute(att.Name, att.Value, xw)
 				xw.WriteEndElement()
 			if node.HasChildNodes:
 				if node.ChildNodes.Count == 1 and node.ChildNodes[0].NodeType == XmlNodeType.Text:
@@ -108,7 +112,36 @@ class XML(FormatPlugin):
 				xw.WriteEndElement()
 			xw.WriteEndElement()
 	
+	def otoi_write_start_element(self, node_full_name, xw):
+		node_name_parts = node_full_name.split(":")
+		node_prefix = ""
+		node_name = node_full_name
+		if len(node_name_parts) > 1:
+			node_prefix = node_name_parts[0]
+			node_name = node_name_parts[1]
+		xw.WriteStartElement("n_{0}_{1}_{2}".format(len(node_prefix), node_prefix, node_name))
+	
+	def otoi_write_attribute(self, att_name, att_value, xw):
+		if att_name.startswith("xmlns"):
+			if att_name.count(":") > 0:
+				xw.WriteStartElement("xmlns_{0}".format(att_name[6:]))
+			else:
+				xw.WriteStartElement("xmlns_")
+			xw.WriteValue(att_value)
+			xw.WriteEndElement()
+		else:
+			xw.WriteStartElement("a_{0}".format(att_name))
+			xw.WriteValue(att_value)
+			xw.WriteEndElement()
+	
+	#Like original_xml_to_ironwasp_xml, converts without a DOM and falls back to the DOM based conversion
 	def ironwasp_xml_to_original_xml(self, ironwasp_xml):
+		try:
+			return self.itoo_stream(ironwasp_xml)
+		except:
+			return self.itoo_dom(ironwasp_xml)
+	
+	def itoo_dom(self, ironwasp_xml):
 		xd = XmlDocument()
 		xd.LoadXml(ironwasp_xml)
 		#xb = StringBuilder()
@@ -130,28 +163,7 @@ class XML(FormatPlugin):
 		is_tag_opened = False
 		
 		if node.NodeType == XmlNodeType.Element:
-			if node.Name.startswith("n_"):
-				node_raw_val = node.Name[2:]#.lstrip("n_")
-				node_prefix_len = int(node_raw_val.split("_")[0])
-				node_prefix_name = node_raw_val[len(str(node_prefix_len))+1:] #.lstrip("{0}_".format(node_prefix_len))
-				node_prefix = node_prefix_name[:node_prefix_len]
-				node_name = node_prefix_name[node_prefix_len + 1:]
-				if len(node_prefix) > 0:
-					xw.WriteStartElement("{0}:{1}".format(node_prefix, node_name))
-				else:
-					xw.WriteStartElement(node_name)
-				is_tag_opened = True
-			elif node.Name.startswith("xmlns_"):
-				is_attr_val = True
-				xmlns_prefix = node.Name[6:]
-				if len(xmlns_prefix) > 0:
-					xw.WriteStartAttribute("xmlns:{0}".format(xmlns_prefix))
-				else:
-					xw.WriteStartAttribute("xmlns")
-			elif node.Name.startswith("a_"):
-				is_attr_val = True
-				xw.WriteStartAttribute(node.Name[2:])#.lstrip("a_"))
-			#attrs, val and xml nodes will be ignored and will not be written
+			is_attr_val, is_tag_opened = self.itoo_write_start(node.Name, xw)
 			
 			if node.HasChildNodes:
 				if node.ChildNodes.Count == 1 and node.ChildNodes[0].NodeType == XmlNodeType.Text:
@@ -164,6 +176,179 @@ class XML(FormatPlugin):
 			
 			if is_tag_opened:
 				xw.WriteEndElement()
+	
+	#Writes the start of the element or attribute that the ironwasp xml node stands for and returns [is_attr_val, is_tag_opened]
+	def itoo_write_start(self, name, xw):
+		is_attr_val = False
+		is_tag_opened = False
+		if name.startswith("n_"):
+			node_raw_val = name[2:]#.lstrip("n_")
+			node_prefix_len = int(node_raw_val.split("_")[0])
+			node_prefix_name = node_raw_val[len(str(node_prefix_len))+1:] #.lstrip("{0}_".format(node_prefix_len))
+			node_prefix = node_prefix_name[:node_prefix_len]
+			node_name = node_prefix_name[node_prefix_len + 1:]
+			if len(node_prefix) > 0:
+				xw.WriteStartElement("{0}:{1}".format(node_prefix, node_name))
+			else:
+				xw.WriteStartElement(node_name)
+			is_tag_opened = True
+		elif name.startswith("xmlns_"):
+			is_attr_val = True
+			xmlns_prefix = name[6:]
+			if len(xmlns_prefix) > 0:
+				xw.WriteStartAttribute("xmlns:{0}".format(xmlns_prefix))
+			else:
+				xw.WriteStartAttribute("xmlns")
+		elif name.startswith("a_"):
+			is_attr_val = True
+			xw.WriteStartAttribute(name[2:])#.lstrip("a_"))
+		#attrs, val and xml nodes will be ignored and will not be written
+		return [is_attr_val, is_tag_opened]
+	
+	#The streaming conversions read the nodes that XmlDocument.LoadXml would load, in the same order, and make the same writer calls as the
+	#DOM based ones. The only look ahead needed is after a first text child, to see if it is the only child of its element.
+	#Only the stack of open elements is held, so memory use grows with the nesting depth and not with the size of the Xml.
+	def otoi_stream(self, original_xml):
+		xr = self.get_reader(original_xml)
+		sw = StringWriter()
+		xw = XmlTextWriter(sw)
+		xw.Formatting = Formatting.Indented
+		xw.WriteStartElement("xml")
+		#the DOM based conversion takes the first node at the top if it is the only one, else the second one
+		index = 0
+		root_read = False
+		more_nodes = False
+		while self.read(xr):
+			if index == 0 and xr.NodeType == XmlNodeType.Element:
+				self.otoi_read_element(xr, xw)
+				root_read = True
+			elif index == 1 and xr.NodeType == XmlNodeType.Element and not root_read:
+				self.otoi_read_element(xr, xw)
+			elif root_read:
+				more_nodes = True
+			elif xr.NodeType == XmlNodeType.Element:
+				self.skip_element(xr)
+			index = index + 1
+		xr.Close()
+		if more_nodes:
+			#the second node after the root element is a comment or processing instruction which is not converted
+			sw = StringWriter()
+			xw = XmlTextWriter(sw)
+			xw.Formatting = Formatting.Indented
+			xw.WriteStartElement("xml")
+		xw.WriteEndElement()
+		xw.Close()
+		sw.Close()
+		return sw.ToString()
+	
+	#Converts the element the reader is on like otoi_read_node and leaves the reader on the end of the element
+	def otoi_read_element(self, xr, xw):
+		self.otoi_write_start_element(xr.Name, xw)
+		is_empty = xr.IsEmptyElement
+		if xr.AttributeCount > 0:
+			xw.WriteStartElement("attrs")
+			while xr.MoveToNextAttribute():
+				self.otoi_write_attribute(xr.Name, xr.Value, xw)
+			xr.MoveToElement()
+			xw.WriteEndElement()
+		has_child_nodes = False
+		if not is_empty:
+			self.read_in_element(xr)
+			if xr.NodeType == XmlNodeType.Text:
+				has_child_nodes = True
+				text = xr.Value
+				self.read_in_element(xr)
+				if xr.NodeType == XmlNodeType.EndElement:
+					xw.WriteStartElement("val")
+					xw.WriteValue(text)
+					xw.WriteEndElement()
+				else:
+					self.otoi_read_children(xr, xw)
+			elif xr.NodeType != XmlNodeType.EndElement:
+				has_child_nodes = True
+				self.otoi_read_children(xr, xw)
+		if not has_child_nodes:
+			xw.WriteStartElement("val")
+			xw.WriteValue("")
+			xw.WriteEndElement()
+		xw.WriteEndElement()
+	
+	#Converts the child elements from the node the reader is on up to the end of the parent element, other nodes are skipped
+	def otoi_read_children(self, xr, xw):
+		while xr.NodeType != XmlNodeType.EndElement:
+			if xr.NodeType == XmlNodeType.Element:
+				self.otoi_read_element(xr, xw)
+			self.read_in_element(xr)
+	
+	def itoo_stream(self, ironwasp_xml):
+		xr = self.get_reader(ironwasp_xml)
+		sw = StringWriter()
+		xw = XmlTextWriter(sw)
+		xw.Formatting = Formatting.Indented
+		first = True
+		while self.read(xr):
+			if first and xr.NodeType == XmlNodeType.Element:
+				self.itoo_read_element(xr, xw)
+			elif xr.NodeType == XmlNodeType.Element:
+				self.skip_element(xr)
+			first = False
+		xr.Close()
+		xw.Close()
+		sw.Close()
+		return sw.ToString()
+	
+	#Converts the element the reader is on like itoo_read_node and leaves the reader on the end of the element
+	def itoo_read_element(self, xr, xw):
+		is_attr_val, is_tag_opened = self.itoo_write_start(xr.Name, xw)
+		if not xr.IsEmptyElement:
+			self.read_in_element(xr)
+			if xr.NodeType == XmlNodeType.Text:
+				text = xr.Value
+				self.read_in_element(xr)
+				if xr.NodeType == XmlNodeType.EndElement:
+					xw.WriteValue(text)
+					if is_attr_val:
+						xw.WriteEndAttribute()
+				else:
+					self.itoo_read_children(xr, xw)
+			else:
+				self.itoo_read_children(xr, xw)
+		if is_tag_opened:
+			xw.WriteEndElement()
+	
+	def itoo_read_children(self, xr, xw):
+		while xr.NodeType != XmlNodeType.EndElement:
+			if xr.NodeType == XmlNodeType.Element:
+				self.itoo_read_element(xr, xw)
+			self.read_in_element(xr)
+	
+	def skip_element(self, xr):
+		if xr.IsEmptyElement:
+			return
+		depth = xr.Depth
+		self.read_in_element(xr)
+		while not (xr.NodeType == XmlNodeType.EndElement and xr.Depth == depth):
+			self.read_in_element(xr)
+	
+	#A reader that loads the same nodes as XmlDocument.LoadXml, which drops whitespace that is not significant and only expands character entities
+	def get_reader(self, xml):
+		xr = XmlTextReader(StringReader(xml))
+		xr.WhitespaceHandling = WhitespaceHandling.Significant
+		xr.EntityHandling = EntityHandling.ExpandCharEntities
+		xr.XmlResolver = None
+		return xr
+	
+	#Entities declared in a DTD would need the DOM to expand them, so Xml with a DTD is left to the DOM based conversion
+	def read(self, xr):
+		if not xr.Read():
+			return False
+		if xr.NodeType == XmlNodeType.DocumentType or xr.NodeType == XmlNodeType.EntityReference:
+			raise Exception("Xml with a DTD is not converted by streaming")
+		return True
+	
+	def read_in_element(self, xr):
+		if not self.read(xr):
+			raise Exception("Unexpected end of Xml")
 				
 	def get_xml_declaration(self, xml):
 		dec = ""
@@ -175,6 +360,44 @@ class XML(FormatPlugin):
 		xsr.Close()
 		xr.Close()
 		return dec
+	
+	#The ironwasp xml from ToXmlFromRequest and the same without indentation as written by an XmlDocument, see SlotSplicer
+	def get_slot_xmls(self, req):
+		ironwasp_xml = self.original_xml_to_ironwasp_xml(req.BodyString)
+		xd = XmlDocument()
+		xd.LoadXml(ironwasp_xml)
+		return [ironwasp_xml, xd.OuterXml]
+	
+	def rebuild_body(self, req, ironwasp_xml):
+		return self.get_original_body(ironwasp_xml, self.get_xml_declaration(req.BodyString))
+	
+	#True for element text and False for an attribute value
+	def get_slot_kind(self, m):
+		return m.group(1) == "val"
+	
+	#The XmlTextReader of get_reader keeps line breaks as they are. An empty value makes an empty element, which the conversion writes differently.
+	def read_slot_value(self, text):
+		if len(text) == 0:
+			return None
+		return AppDomain.CurrentDomain.GetData("SlotSplicer").read_text(text, False)
+	
+	#Returns the value as XmlTextWriter writes it as the text of an element or as the value of an attribute
+	def write_slot_value(self, is_text, value):
+		sw = StringWriter()
+		xw = XmlTextWriter(sw)
+		xw.WriteStartElement("v")
+		if is_text:
+			xw.WriteValue(value)
+		else:
+			xw.WriteStartAttribute("a")
+			xw.WriteValue(value)
+			xw.WriteEndAttribute()
+		xw.WriteEndElement()
+		xw.Close()
+		written = sw.ToString()
+		if is_text:
+			return written[len("<v>"):len(written) - len("</v>")]
+		return written[written.index('"') + 1:written.rindex('"')]
 
 
 p = XML()
@@ -2,11 +2,392 @@
 #License: MIT License - http://www.opensource.org/licenses/mit-license
 
 from IronWASP import *
+from System import *
 from System.Threading import Monitor
+from collections import OrderedDict
+import os
 import re
+import time
+
+#Index of the probe strings of the Analyzer, to find all of them in a response with one pass over it however many there are.
+#
+#Each probe string is filed under its first anchor_length characters, the anchor. A response is scanned once and only the few probe strings
+#with an anchor found in it are then compared in full. When all probe strings start the same way the scan is a native search for that
+#common start. Else the anchor is cut into grams of gram_length characters and the first gram_step grams of each anchor are indexed.
+#Any anchor in the text then has one of these grams at a multiple of gram_step, so only the grams at those positions are looked up and
+#a text of n characters costs n / gram_step lookups instead of n.
+#New probe strings are first kept in a short pending list that is searched for directly, and are moved into the index in batches.
+#The index is replaced, never changed, when a batch is moved in, so a scan can go on while another thread updates it.
+class ProbeStringIndex:
+
+	#Number of new probe strings kept in the pending list before they are moved into the index
+	pending_limit = 64
+	#Longest anchor, the anchor is also never longer than the shortest probe string
+	max_anchor_length = 8
+	#Shortest gram looked up when the probe strings do not all start the same way, unless the anchor itself is shorter
+	min_gram_length = 3
+	#Texts longer than this many characters, like big response bodies, are scanned in chunks of this size
+	chunk_size = 256 * 1024
+
+	def __init__(self):
+		self.lock = Object()
+		self.Reset()
+
+	def Reset(self):
+		#number of the Analyzer's probe strings that have been added and the last of them, to find the new ones
+		self.count = 0
+		self.last = None
+		self.anchor_length = self.max_anchor_length
+		self.anchors = {}
+		#probe string -> position in the Analyzer's list, matches are given back in this order
+		self.order = {}
+		self.common_start = None
+		#gram -> [probe string, position of the gram in it], only when the probe strings do not all start the same way
+		self.grams = {}
+		self.gram_length = 0
+		self.gram_step = 0
+		self.pending = []
+
+	#Adds the probe strings that are new since the last call and returns a snapshot of the index to pass to FindIn
+	def Update(self, probe_strings):
+		Monitor.Enter(self.lock)
+		try:
+			if len(probe_strings) < self.count or (self.count > 0 and probe_strings[self.count - 1] != self.last):
+				#the list was cleared or changed, start over
+				self.Reset()
+			if len(probe_strings) > self.count:
+				pending = list(self.pending)
+				for i in range(self.count, len(probe_strings)):
+					pending.append(probe_strings[i])
+				self.count = len(probe_strings)
+				self.last = probe_strings[self.count - 1]
+				if len(pending) > self.pending_limit:
+					self.Merge(pending)
+					pending = []
+				self.pending = pending
+			return [self.anchors, self.anchor_length, self.common_start, self.grams, self.gram_length, self.gram_step, self.order, self.pending]
+		finally:
+			Monitor.Exit(self.lock)
+
+	def Merge(self, pending):
+		order = dict(self.order)
+		probes = list(order.keys())
+		for ps in pending:
+			if not order.has_key(ps) and len(ps) > 0:
+				order[ps] = len(order)
+				probes.append(ps)
+		shortest = min([len(ps) for ps in pending if len(ps) > 0] + [self.anchor_length])
+		if shortest < self.anchor_length or len(self.anchors) == 0:
+			#the anchor has to be shortened, so all probe strings are filed again
+			self.anchor_length = shortest
+			anchors = {}
+		else:
+			probes = [ps for ps in pending if len(ps) > 0]
+			anchors = dict(self.anchors)
+		common_start = self.common_start
+		for ps in probes:
+			anchor = ps[:self.anchor_length]
+			#lists are copied before they are changed as a scan may be going through the old index
+			if not anchors.has_key(anchor):
+				anchors[anchor] = [ps]
+			elif anchors[anchor].count(ps) == 0:
+				anchors[anchor] = anchors[anchor] + [ps]
+			if common_start == None:
+				common_start = anchor
+			while not anchor.startswith(common_start):
+				common_start = common_start[:-1]
+		self.anchors = anchors
+		self.order = order
+		self.common_start = common_start
+		if common_start == None or len(common_start) < 2:
+			self.MakeGrams()
+		else:
+			self.grams = {}
+
+	#Indexes the grams at the first gram_step positions of each probe string
+	#Grams shorter than min_gram_length are found too often in any text, so a short anchor gives a smaller gram_step instead.
+	def MakeGrams(self):
+		self.gram_length = min(self.anchor_length, max(self.min_gram_length, (self.anchor_length + 1) // 2))
+		self.gram_step = self.anchor_length - self.gram_length + 1
+		grams = {}
+		for probes in self.anchors.values():
+			for ps in probes:
+				for i in range(self.gram_step):
+					gram = ps[i:i + self.gram_length]
+					if not grams.has_key(gram):
+						grams[gram] = []
+					grams[gram].append([ps, i])
+		self.grams = grams
+
+	#Returns the probe strings of the snapshot that are in any of the texts, in the order the Analyzer has them
+	def FindIn(self, snapshot, texts):
+		found = {}
+		for text in texts:
+			if text == None:
+				continue
+			#a match only has to start inside the chunk, so chunks do not overlap
+			for start in xrange(0, len(text), self.chunk_size):
+				self.FindInChunk(snapshot, text, start, min(start + self.chunk_size, len(text)), found)
+		return sorted(found.keys(), key=lambda ps: found[ps])
+
+	def FindInChunk(self, snapshot, text, start, end, found):
+		anchors, anchor_length, common_start, grams, gram_length, gram_step, order, pending = snapshot
+		if len(anchors) > 0:
+			if len(grams) == 0:
+				i = text.find(common_start, start, end + len(common_start) - 1)
+				while i > -1:
+					self.MatchAt(text, i, anchors, anchor_length, order, found)
+					i = text.find(common_start, i + 1, end + len(common_start) - 1)
+			else:
+				self.FindGramsInChunk(text, start, end, grams, gram_length, gram_step, order, found)
+		for i in range(len(pending)):
+			if not found.has_key(pending[i]) and text.find(pending[i], start, end + len(pending[i]) - 1) > -1:
+				found[pending[i]] = len(order) + i
+
+	#A probe string that starts in the chunk has one of its indexed grams at a multiple of gram_step after the start of the chunk,
+	#before end + gram_step - 1
+	def FindGramsInChunk(self, text, start, end, grams, gram_length, gram_step, order, found):
+		positions = [j for j in xrange(start, min(end + gram_step - 1, len(text)), gram_step) if grams.has_key(text[j:j + gram_length])]
+		for j in positions:
+			for ps, pos in grams[text[j:j + gram_length]]:
+				if j >= pos and not found.has_key(ps) and text.startswith(ps, j - pos):
+					found[ps] = order[ps]
+
+	def MatchAt(self, text, i, anchors, anchor_length, order, found):
+		for ps in anchors.get(text[i:i + anchor_length], []):
+			if not found.has_key(ps) and text.startswith(ps, i):
+				found[ps] = order[ps]
+
+
+#Keeps the probe strings on disk so that stored reflections are still found after IronWASP is restarted.
+#
+#Each probe string is a line in the file with the time it was first seen, the url and the request that sent it.
+#The file is read the first time it is needed. Only the probe string, its time and where its line starts in the file are kept in memory,
+#the request is read back from the file when a finding needs it. Probe strings older than max_age_days are dropped when the file is read
+#and every check_interval_minutes after that, and the file is rewritten without them once they make up compact_ratio of its lines.
+#At most max_probes probe strings are kept, past that the oldest tenth of them is dropped the same way.
+#A file that cannot be read, written or rewritten never fails the plugin, the probe strings are then only searched for in this run.
+class ProbeStringStore:
+
+	max_age_days = 14
+	check_interval_minutes = 60
+	compact_ratio = 0.5
+	#Most number of probe strings kept in memory and in the file
+	max_probes = 50000
+
+	def __init__(self, path):
+		self.path = path
+		self.lock = Object()
+		self.loaded = False
+		#probe string -> [time it was first seen, position of its line in the file]
+		self.entries = OrderedDict()
+		#the probe strings in entries as a list that only grows, till probe strings are dropped and it is replaced
+		self.probe_strings = []
+		self.dropped_lines = 0
+		self.last_check = 0
+		#number of the Analyzer's probe strings that have been stored and the last of them, to find the new ones
+		self.analyzer_count = 0
+		self.analyzer_last = None
+
+	#Stores the Analyzer's probe strings that are new since the last call and returns all the stored probe strings, including those from earlier runs
+	def Sync(self, analyzer_probe_strings):
+		Monitor.Enter(self.lock)
+		try:
+			if not self.loaded:
+				self.Load()
+			if time.time() - self.last_check > self.check_interval_minutes * 60:
+				self.Expire()
+			if len(analyzer_probe_strings) < self.analyzer_count or (self.analyzer_count > 0 and analyzer_probe_strings[self.analyzer_count - 1] != self.analyzer_last):
+				self.analyzer_count = 0
+			new_probe_strings = []
+			for i in range(self.analyzer_count, len(analyzer_probe_strings)):
+				ps = analyzer_probe_strings[i]
+				if not self.entries.has_key(ps) and new_probe_strings.count(ps) == 0:
+					new_probe_strings.append(ps)
+			if len(analyzer_probe_strings) > 0:
+				self.analyzer_count = len(analyzer_probe_strings)
+				self.analyzer_last = analyzer_probe_strings[self.analyzer_count - 1]
+			if len(new_probe_strings) > 0:
+				self.Append(new_probe_strings)
+				self.Trim()
+			return self.probe_strings
+		finally:
+			Monitor.Exit(self.lock)
+
+	#Returns the request that sent the stored probe string, or None if it cannot be read back
+	def GetRequest(self, ps):
+		Monitor.Enter(self.lock)
+		try:
+			if not self.entries.has_key(ps) or self.entries[ps][1] < 0:
+				return None
+			try:
+				f = open(self.path, "rb")
+			except:
+				return None
+			try:
+				f.seek(self.entries[ps][1])
+				parts = f.readline().rstrip("\r\n").split("\t")
+			finally:
+				f.close()
+		finally:
+			Monitor.Exit(self.lock)
+		try:
+			return Request.FromBinaryString(Tools.Base64Decode(parts[3]))
+		except:
+			pass
+		#without the full request a request to the same url is better than nothing
+		if len(parts) == 4 and len(parts[2]) > 0:
+			return Request(parts[2])
+		return None
+
+	def Load(self):
+		self.loaded = True
+		self.last_check = time.time()
+		try:
+			if not os.path.exists(os.path.dirname(self.path)):
+				os.makedirs(os.path.dirname(self.path))
+		except:
+			pass
+		if not os.path.exists(self.path):
+			return
+		oldest = time.time() - self.max_age_days * 86400
+		try:
+			f = open(self.path, "rb")
+		except:
+			return
+		try:
+			pos = f.tell()
+			line = f.readline()
+			while len(line) > 0:
+				parts = line.rstrip("\r\n").split("\t")
+				try:
+					added = float(parts[0])
+				except:
+					added = 0
+				if len(parts) == 4 and added >= oldest and not self.entries.has_key(parts[1]):
+					self.entries[parts[1]] = [added, pos]
+				else:
+					self.dropped_lines = self.dropped_lines + 1
+				pos = f.tell()
+				line = f.readline()
+		finally:
+			f.close()
+		self.probe_strings = list(self.entries.keys())
+		self.Trim()
+		self.CompactIfNeeded()
+
+	#Probe strings that cannot be written to the file are kept with the position -1, they are only searched for in this run
+	def Append(self, new_probe_strings):
+		now = time.time()
+		try:
+			f = open(self.path, "ab")
+			f.seek(0, 2)
+		except:
+			f = None
+		try:
+			for ps in new_probe_strings:
+				pos = -1
+				if f != None and ps.count("\t") == 0 and ps.count("\n") == 0 and ps.count("\r") == 0:
+					url = ""
+					req_str = ""
+					try:
+						req = Analyzer.GetProbeStringRequest(ps)
+						url = req.FullUrl
+						req_str = Tools.Base64Encode(req.ToBinaryString())
+					except:
+						pass
+					pos = f.tell()
+					f.write("{0}\t{1}\t{2}\t{3}\n".format(int(now), ps, url, req_str))
+				self.entries[ps] = [now, pos]
+				self.probe_strings.append(ps)
+		finally:
+			if f != None:
+				f.close()
+
+	def Expire(self):
+		self.last_check = time.time()
+		oldest = time.time() - self.max_age_days * 86400
+		self.Drop([ps for ps in self.entries.keys() if self.entries[ps][0] < oldest])
+
+	#Drops the oldest tenth of the probe strings once there are more than max_probes, so that the list is not replaced on every new one
+	def Trim(self):
+		if len(self.entries) > self.max_probes:
+			self.Drop(list(self.entries.keys())[:len(self.entries) - self.max_probes + self.max_probes / 10])
+
+	def Drop(self, probe_strings):
+		if len(probe_strings) == 0:
+			return
+		for ps in probe_strings:
+			del self.entries[ps]
+		self.dropped_lines = self.dropped_lines + len(probe_strings)
+		#a new list, so that the index sees the change and is built again without the dropped probe strings
+		self.probe_strings = list(self.entries.keys())
+		self.CompactIfNeeded()
+
+	#Rewrites the file with only the lines of the probe strings that are kept. The new positions are only used once the new file has
+	#replaced the old one, if that fails the old file is left as it is and the rewrite is tried again the next time probe strings are dropped.
+	def CompactIfNeeded(self):
+		if self.dropped_lines == 0 or self.dropped_lines < (len(self.entries) + self.dropped_lines) * self.compact_ratio:
+			return
+		temp_path = self.path + ".tmp"
+		positions = {}
+		try:
+			src = open(self.path, "rb")
+		except:
+			return
+		try:
+			try:
+				dst = open(temp_path, "wb")
+			except:
+				return
+			try:
+				for ps in self.entries.keys():
+					if self.entries[ps][1] < 0:
+						continue
+					src.seek(self.entries[ps][1])
+					line = src.readline()
+					positions[ps] = dst.tell()
+					dst.write(line)
+			finally:
+				dst.close()
+		except:
+			self.RemoveFile(temp_path)
+			return
+		finally:
+			src.close()
+		try:
+			os.remove(self.path)
+		except:
+			self.RemoveFile(temp_path)
+			return
+		try:
+			os.rename(temp_path, self.path)
+		except:
+			#the old file is gone, so the requests of the kept probe strings cannot be read back in this run
+			for ps in self.entries.keys():
+				self.entries[ps][1] = -1
+			self.dropped_lines = 0
+			return
+		for ps in positions.keys():
+			self.entries[ps][1] = positions[ps]
+		self.dropped_lines = 0
+
+	def RemoveFile(self, path):
+		try:
+			os.remove(path)
+		except:
+			pass
+
 
 class CheckReflection(PassivePlugin):
     
+	#Content types of the responses this plugin works on, see ResponseIndex
+	content_types = ["Html", "Xml", "JavaScript", "Json"]
+	#Shared by all instances of the plugin so that the index is built only once
+	probe_index = ProbeStringIndex()
+	#Probe strings from earlier runs, see ProbeStringStore
+	probe_store = ProbeStringStore(os.path.join(Environment.GetFolderPath(Environment.SpecialFolder.LocalApplicationData), "IronWASP", "stored_probe_strings.txt"))
+	
 	#Override the GetInstance method of the base class to return a new instance with details
 	def GetInstance(self):
 		p = CheckReflection()
@@ -25,36 +406,70 @@ class CheckReflection(PassivePlugin):
 		if(Sess.Response == None):
 			return
 		
-		if not (Sess.Response.IsHtml or Sess.Response.IsXml or Sess.Response.IsJavaScript or Sess.Response.IsJson):
+		if not AppDomain.CurrentDomain.GetData("ResponseIndex").Handles(Sess.Response, self.content_types):
 			return
 		
-		#Get the probe strings injected by the XSS Plugin during XSS Scans
-		probe_strings = Analyzer.GetProbeStrings()
+		#Get the probe strings injected by the XSS Plugin during XSS Scans, along with those kept on disk from earlier runs
+		probe_strings = self.probe_store.Sync(Analyzer.GetProbeStrings())
 		if len(probe_strings) == 0:
 			return
 		
-		ReqStr = Sess.Request.ToString()
-		ResStr = Sess.Response.ToString()
+		#the headers and bodies are searched where they are instead of building the full messages with ToString
+		res_texts = self.GetHeaderTexts(Sess.Response.Headers)
+		res_texts.append(Sess.Response.BodyString)
 		
 		matching_probe_strings = []
 		
-		for ps in probe_strings:
-			if(ReqStr.count(ps) == 0):
-				if(ResStr.count(ps) > 0):
+		#the response is scanned once for all probe strings, only the ones found in it are then looked for in the request
+		snapshot = self.probe_index.Update(probe_strings)
+		found_probe_strings = self.probe_index.FindIn(snapshot, res_texts)
+		if len(found_probe_strings) > 0:
+			req_texts = self.GetHeaderTexts(Sess.Request.Headers)
+			req_texts.append(Sess.Request.Url)
+			req_texts.append(Sess.Request.BodyString)
+			for ps in found_probe_strings:
+				if not self.IsInAny(req_texts, ps):
 					matching_probe_strings.append(ps)
 		
 		if(len(matching_probe_strings) > 0):
 			Signature = '{0}|{1}'.format(Sess.Request.UrlPath, "-".join(matching_probe_strings))
-			if ReportAll or self.IsSignatureUnique(Sess.Request.BaseUrl, FindingType.TestLead, Signature):
+			if ReportAll or AppDomain.CurrentDomain.GetData("FindingSignatureIndex").IsNewSignature(self, Sess.Request.BaseUrl, FindingType.TestLead, Signature):
 				PR = Finding(Sess.Request.BaseUrl)
 				PR.Title = "Stored Reflection Found on {0}".format(Sess.Request.URLPath)
 				PR.Summary = "Probe Strings injected during XSS Scans were found to be reflected in this page. This indicates a Stored Reflection, test this for Stored XSS."
 				PR.Triggers.Add("", "", Sess.Request, "\r\n".join(matching_probe_strings), "Probe Strings found in the response body", Sess.Response)
 				for mps in matching_probe_strings:
-					PR.Triggers.Add(mps, Analyzer.GetProbeStringRequest(mps))
+					mps_req = self.GetProbeStringRequest(mps)
+					if mps_req != None:
+						PR.Triggers.Add(mps, mps_req)
 				PR.Type = FindingType.TestLead
 				PR.Signature = Signature
 				Results.Add(PR)
+	
+	#Returns the request that sent the probe string, from the Analyzer or for probe strings of earlier runs from the ProbeStringStore
+	def GetProbeStringRequest(self, ps):
+		req = None
+		try:
+			req = Analyzer.GetProbeStringRequest(ps)
+		except:
+			pass
+		if req == None:
+			req = self.probe_store.GetRequest(ps)
+		return req
+	
+	#Returns a 'Name: Value' string for each header in the collection
+	def GetHeaderTexts(self, headers):
+		texts = []
+		for name in headers.GetNames():
+			for value in headers.GetAll(name):
+				texts.append("{0}: {1}".format(name, value))
+		return texts
+	
+	def IsInAny(self, texts, ps):
+		for text in texts:
+			if text != None and text.count(ps) > 0:
+				return True
+		return False
         
 
 p = CheckReflection()
@@ -3,8 +3,71 @@
 
 from IronWASP import *
 from System import *
+from System.Threading import Monitor
+from collections import OrderedDict
 import clr
+import hashlib
 import re
+import time
+
+#Least recently used cache of the source and sink matches of each script, so that a script that comes back on many pages,
+#like a library or an app bundle, is scanned only once. Scripts are keyed on the md5 of their content.
+#The hits and misses are written to the IronWASP trace every trace_interval lookups.
+class ScriptMatchCache:
+
+	max_entries = 5000
+	#Most number of characters of matches and keys that the cache holds
+	max_chars = 4 * 1024 * 1024
+	trace_interval = 1000
+
+	def __init__(self):
+		self.lock = Object()
+		self.entries = OrderedDict()
+		self.chars = 0
+		self.hits = 0
+		self.misses = 0
+
+	def GetKey(self, script):
+		return hashlib.md5(script.encode("utf-8")).hexdigest()
+
+	#Returns the cached [source matches, sink matches] of the script or None
+	def Get(self, key):
+		Monitor.Enter(self.lock)
+		try:
+			if self.entries.has_key(key):
+				matches = self.entries.pop(key)
+				self.entries[key] = matches
+				self.hits = self.hits + 1
+			else:
+				matches = None
+				self.misses = self.misses + 1
+			if (self.hits + self.misses) % self.trace_interval == 0:
+				Tools.Trace("DOMXSS", self.GetStats())
+			return matches
+		finally:
+			Monitor.Exit(self.lock)
+
+	def Put(self, key, matches):
+		Monitor.Enter(self.lock)
+		try:
+			if self.entries.has_key(key):
+				self.chars = self.chars - self.GetSize(key, self.entries.pop(key))
+			self.entries[key] = matches
+			self.chars = self.chars + self.GetSize(key, matches)
+			while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.chars > self.max_chars):
+				old_key, old_matches = self.entries.popitem(False)
+				self.chars = self.chars - self.GetSize(old_key, old_matches)
+		finally:
+			Monitor.Exit(self.lock)
+
+	def GetSize(self, key, matches):
+		return len(key) + sum([len(m) for m in matches[0]]) + sum([len(m) for m in matches[1]])
+
+	def GetStats(self):
+		ratio = 0
+		if self.hits + self.misses > 0:
+			ratio = (self.hits * 100) / (self.hits + self.misses)
+		return "Script match cache - {0} hit[s], {1} miss[es] ({2}% hits). {3} script[s] cached using {4} of {5} characters.".format(self.hits, self.misses, ratio, len(self.entries), self.chars, self.max_chars)
 
 #Inherit from the base PassivePlugin class
 class DOMXSS(PassivePlugin):
@@ -12,6 +75,16 @@ class DOMXSS(PassivePlugin):
 	#From http://code.google.com/p/domxsswiki/wiki/FindingDOMXSS by Mario Heiderich
 	sources = re.compile('/(location\s*[\[.])|([.\[]\s*["\']?\s*(arguments|dialogArguments|innerHTML|write(ln)?|open(Dialog)?|showModalDialog|cookie|URL|documentURI|baseURI|referrer|name|opener|parent|top|content|self|frames)\W)|(localStorage|sessionStorage|Database)/')
 	sinks = re.compile('/((src|href|data|location|code|value|action)\s*["\'\]]*\s*\+?\s*=)|((replace|assign|navigate|getResponseHeader|open(Dialog)?|showModalDialog|eval|evaluate|execCommand|execScript|setTimeout|setInterval)\s*["\'\]]*\s*\()/')
+	#Content types of the responses this plugin works on, see ResponseIndex
+	content_types = ["Html", "JavaScript"]
+	#Shared by all instances of the plugin, see ScriptMatchCache
+	match_cache = ScriptMatchCache()
+	#Scripts are scanned in chunks of this many characters, each chunk overlapping the next by chunk_overlap characters.
+	#A match longer than chunk_overlap that crosses the end of a chunk is missed, matches are normally a few dozen characters long.
+	chunk_size = 64 * 1024
+	chunk_overlap = 1024
+	#Most time in ms each regex can take on a response, the rest of the response is not scanned by that regex once it is used up
+	regex_time_budget = 2000
 	
 	#Override the GetInstance method of the base class to return a new instance with details
 	def GetInstance(self):
@@ -31,32 +104,31 @@ class DOMXSS(PassivePlugin):
 			return
 		if(Sess.Response == None):
 			return
+		if not AppDomain.CurrentDomain.GetData("ResponseIndex").Handles(Sess.Response, self.content_types):
+			return
 		
 		source_matches = []
 		sink_matches = []
 		
-		JS = ""
+		scripts_js = []
 		
 		if(Sess.Response.IsHtml):
-			scripts = Sess.Response.Html.GetJavaScript()
-			scripts_js= []
+			scripts = AppDomain.CurrentDomain.GetData("ResponseIndex").Get(Sess.Response).GetJavaScript()
 			for script in scripts:
 				scripts_js.append(script)
-			JS = "\r\n".join(scripts_js)
 		elif (Sess.Response.IsJavaScript):
-			JS = Sess.Response.BodyString
-		
-		if JS == "":
-			return
+			scripts_js.append(Sess.Response.BodyString)
 		
-		for source_match in self.sources.findall(JS):
-			for match in source_match:
-				if(len(match) > 0):
-					source_matches.append(match)
-		for sink_match in self.sinks.findall(JS):
-			for match in sink_match:
-				if(len(match) > 0):
-					sink_matches.append(match)
+		#each script is scanned on its own so that its matches can be cached, the page has the matches of all its scripts
+		time_left = [self.regex_time_budget, self.regex_time_budget]
+		for script in scripts_js:
+			if len(script) == 0:
+				continue
+			script_sources, script_sinks = self.GetMatches(script, time_left)
+			source_matches.extend(script_sources)
+			sink_matches.extend(script_sinks)
+		if time_left[0] <= 0 or time_left[1] <= 0:
+			Tools.Trace("DOMXSS", "Time budget of {0}ms used up, the JavaScript of {1} was only partly scanned".format(self.regex_time_budget, Sess.Request.FullUrl))
 		
 		source_matches = list(set(source_matches))
 		sink_matches = list(set(sink_matches))
@@ -65,7 +137,7 @@ class DOMXSS(PassivePlugin):
 			return
 		
 		Signature = '{0}|{1}|{2}|{3}'.format(Sess.Request.UrlPath, Sess.Request.Method, ":".join(source_matches), ":".join(sink_matches))
-		if ReportAll or self.IsSignatureUnique(Sess.Request.BaseUrl, FindingType.TestLead, Signature):
+		if ReportAll or AppDomain.CurrentDomain.GetData("FindingSignatureIndex").IsNewSignature(self, Sess.Request.BaseUrl, FindingType.TestLead, Signature):
 			Title = ""
 			Summary = ""			
 			if((len(source_matches) > 0) and (len(sink_matches) > 0)):
@@ -98,6 +170,46 @@ class DOMXSS(PassivePlugin):
 			PR.Type = FindingType.TestLead;
 			PR.Signature = Signature
 			Results.Add(PR)
+	
+	#Returns the [source matches, sink matches] of the script, from the cache if the same script was scanned before.
+	#time_left has the ms left for the sources and the sinks regex on this response and is reduced by the time they take.
+	def GetMatches(self, script, time_left):
+		key = self.match_cache.GetKey(script)
+		matches = self.match_cache.Get(key)
+		if matches == None:
+			sources, sources_complete = self.FindMatches(self.sources, script, time_left, 0)
+			sinks, sinks_complete = self.FindMatches(self.sinks, script, time_left, 1)
+			matches = [sources, sinks]
+			#a scan cut short by the time budget is not cached, so the script is scanned in full when it comes again
+			if sources_complete and sinks_complete:
+				self.match_cache.Put(key, matches)
+		return matches
+	
+	#Returns the matches of the regex in the script and False if the time budget ran out before the whole script was scanned.
+	#The chunks are ranges of the script given to the regex, so no part of the script is copied. A match is taken from the chunk it
+	#starts in and the next chunk is scanned from the end of the last match taken, so that the matches are the same as those of
+	#finditer over the whole script, see benchmarks/domxss_chunk_benchmark.py.
+	def FindMatches(self, regex, script, time_left, budget_index):
+		matches = []
+		start = 0
+		while True:
+			if time_left[budget_index] <= 0:
+				return [list(set(matches)), False]
+			next_start = start + self.chunk_size
+			end = min(next_start + self.chunk_overlap, len(script))
+			started = time.time()
+			for regex_match in regex.finditer(script, start, end):
+				#a match that starts in the overlap is left to the next chunk, which may see more of it
+				if regex_match.start() >= next_start and end < len(script):
+					break
+				for match in regex_match.groups():
+					if match != None and len(match) > 0:
+						matches.append(match)
+				next_start = max(next_start, regex_match.end())
+			time_left[budget_index] = time_left[budget_index] - (time.time() - started) * 1000
+			if end == len(script):
+				return [list(set(matches)), True]
+			start = next_start
 			
 p = DOMXSS()
 PassivePlugin.Add(p.GetInstance())
@@ -0,0 +1,145 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+
+from IronWASP import *
+from System import *
+from System.Threading import Monitor
+from collections import OrderedDict
+import clr
+import hashlib
+import time
+
+#Remembers the signatures of the findings that the passive plugins have reported in the last max_age_minutes,
+#so that a known duplicate is dropped without asking IronWASP through IsSignatureUnique and before any Finding is made.
+#Only a signature IronWASP said is unique is kept, one it said is not unique is asked again each time, so that the answer
+#follows the findings IronWASP has. A finding that is deleted can then be reported again once its signature is max_age_minutes old.
+#This file does not add a plugin, it only creates a single index and puts it in the AppDomain under the name 'FindingSignatureIndex'.
+#Plugins get it with AppDomain.CurrentDomain.GetData("FindingSignatureIndex") and call IsNewSignature with themselves in place of IsSignatureUnique.
+#
+#Signatures are kept in exact sets partitioned on the plugin name, BaseUrl and FindingType, so two plugins that make the same signature
+#do not drop each other's findings. A Bloom filter in front of the sets answers most new signatures without looking at them.
+#When there are more than max_signatures the least recently used partitions are dropped, so a dropped
+#signature is only asked of IronWASP again. The Bloom filter is cleared and filled again from the sets when its estimated
+#false positive rate goes above max_false_positive_rate. The counts and memory use are written to the IronWASP trace every trace_interval checks.
+class FindingSignatureIndex:
+
+	max_signatures = 200000
+	#Signatures older than this are dropped when they are looked up and asked of IronWASP again
+	max_age_minutes = 60
+	#Size of the Bloom filter in bits and the number of bits set for each signature
+	bloom_bits = 8 * 1024 * 1024
+	bloom_hashes = 7
+	max_false_positive_rate = 0.001
+	trace_interval = 1000
+
+	def __init__(self):
+		self.lock = Object()
+		#plugin name|BaseUrl|FindingType -> {signature: time it was added}
+		self.partitions = OrderedDict()
+		self.signatures = 0
+		self.chars = 0
+		self.ResetBloom()
+		self.checks = 0
+		#checks answered by the index without asking IronWASP
+		self.known = 0
+		#checks the Bloom filter passed on to the sets that did not have the signature
+		self.bloom_misses = 0
+
+	#Returns True if a finding with this signature can be reported. A signature is taken to be known once this returns True for it,
+	#plugins only call this when they report the finding right after a True.
+	def IsNewSignature(self, plugin, base_url, finding_type, signature):
+		partition_key = "{0}|{1}|{2}".format(plugin.Name, base_url, finding_type)
+		positions = self.GetBloomPositions(partition_key, signature)
+		Monitor.Enter(self.lock)
+		try:
+			self.checks = self.checks + 1
+			if self.checks % self.trace_interval == 0:
+				Tools.Trace("FindingSignatureIndex", self.GetStats())
+			if self.Has(partition_key, signature, positions):
+				self.known = self.known + 1
+				return False
+		finally:
+			Monitor.Exit(self.lock)
+		unique = plugin.IsSignatureUnique(base_url, finding_type, signature)
+		if unique:
+			Monitor.Enter(self.lock)
+			try:
+				self.Add(partition_key, signature, positions)
+			finally:
+				Monitor.Exit(self.lock)
+		return unique
+
+	def Has(self, partition_key, signature, positions):
+		for pos in positions:
+			if not self.bloom[pos >> 3] & (1 << (pos & 7)):
+				return False
+		if self.partitions.has_key(partition_key):
+			partition = self.partitions.pop(partition_key)
+			self.partitions[partition_key] = partition
+			if partition.has_key(signature):
+				if time.time() - partition[signature] < self.max_age_minutes * 60:
+					return True
+				#the bits of the Bloom filter are left set, they are cleared when the filter is filled again
+				del partition[signature]
+				self.signatures = self.signatures - 1
+				self.chars = self.chars - len(signature)
+				return False
+		self.bloom_misses = self.bloom_misses + 1
+		return False
+
+	def Add(self, partition_key, signature, positions):
+		if self.partitions.has_key(partition_key):
+			partition = self.partitions.pop(partition_key)
+		else:
+			partition = {}
+			self.chars = self.chars + len(partition_key)
+		self.partitions[partition_key] = partition
+		if partition.has_key(signature):
+			return
+		partition[signature] = time.time()
+		self.signatures = self.signatures + 1
+		self.chars = self.chars + len(signature)
+		self.SetBloomBits(positions)
+		while len(self.partitions) > 1 and self.signatures > self.max_signatures:
+			old_key, old_partition = self.partitions.popitem(False)
+			self.signatures = self.signatures - len(old_partition)
+			self.chars = self.chars - len(old_key) - sum([len(s) for s in old_partition.keys()])
+		if self.GetFalsePositiveRate() > self.max_false_positive_rate:
+			self.ResetBloom()
+			for key in self.partitions.keys():
+				for s in self.partitions[key].keys():
+					self.SetBloomBits(self.GetBloomPositions(key, s))
+
+	def ResetBloom(self):
+		self.bloom = bytearray(self.bloom_bits / 8)
+		self.bloom_bits_set = 0
+
+	def SetBloomBits(self, positions):
+		for pos in positions:
+			if not self.bloom[pos >> 3] & (1 << (pos & 7)):
+				self.bloom[pos >> 3] = self.bloom[pos >> 3] | (1 << (pos & 7))
+				self.bloom_bits_set = self.bloom_bits_set + 1
+
+	#Bits of the signature in the Bloom filter, from the two halves of its md5 by double hashing
+	def GetBloomPositions(self, partition_key, signature):
+		digest = hashlib.md5("{0}|{1}".format(partition_key, signature).encode("utf-8")).hexdigest()
+		h1 = long(digest[:16], 16)
+		h2 = long(digest[16:], 16) | 1
+		return [int((h1 + i * h2) % self.bloom_bits) for i in range(self.bloom_hashes)]
+
+	#Estimated from the share of bits that are set
+	def GetFalsePositiveRate(self):
+		return (float(self.bloom_bits_set) / self.bloom_bits) ** self.bloom_hashes
+
+	#Bytes of the Bloom filter and the strings in the sets, strings are taken as two bytes a character
+	def GetMemoryUse(self):
+		return len(self.bloom) + self.chars * 2
+
+	def GetStats(self):
+		ratio = 0
+		if self.checks > 0:
+			ratio = (self.known * 100) / self.checks
+		return "Finding signature index - {0} check[s], {1} known duplicate[s] dropped ({2}%). {3} signature[s] in {4} partition[s], Bloom filter false positive rate {5:.6f} estimated, {6} seen. About {7} KB used.".format(self.checks, self.known, ratio, self.signatures, len(self.partitions), self.GetFalsePositiveRate(), self.bloom_misses, self.GetMemoryUse() / 1024)
+
+
+AppDomain.CurrentDomain.SetData("FindingSignatureIndex", FindingSignatureIndex())
@@ -2,9 +2,49 @@
 #License: MIT License - http://www.opensource.org/licenses/mit-license
 
 from IronWASP import *
+from System import *
+from System.Threading import Monitor
+from collections import OrderedDict
+
+#Least recently used cache of how the host of a resource relates to the host of the page that loads it,
+#a page with hundreds of resources normally has them from only a few hosts.
+class HostClassificationCache:
+
+	max_entries = 2000
+
+	def __init__(self):
+		self.lock = Object()
+		self.entries = OrderedDict()
+
+	#Returns the cached classification of the key or None
+	def Get(self, key):
+		Monitor.Enter(self.lock)
+		try:
+			if not self.entries.has_key(key):
+				return None
+			classification = self.entries.pop(key)
+			self.entries[key] = classification
+			return classification
+		finally:
+			Monitor.Exit(self.lock)
+
+	def Put(self, key, classification):
+		Monitor.Enter(self.lock)
+		try:
+			self.entries[key] = classification
+			while len(self.entries) > self.max_entries:
+				self.entries.popitem(False)
+		finally:
+			Monitor.Exit(self.lock)
+
 
 class HTMLAnalysis(PassivePlugin):
     
+	#Content types of the responses this plugin works on, see ResponseIndex
+	content_types = ["Html"]
+	#Shared by all instances of the plugin, see HostClassificationCache
+	host_cache = HostClassificationCache()
+	
 	#Override the GetInstance method of the base class to return a new instance with details
 	def GetInstance(self):
 		p = HTMLAnalysis()
@@ -20,7 +60,7 @@ class HTMLAnalysis(PassivePlugin):
 		if(Sess.Response.IsBinary):
 			return
 		
-		if(not Sess.Response.IsHtml):
+		if(not AppDomain.CurrentDomain.GetData("ResponseIndex").Handles(Sess.Response, self.content_types)):
 			return
 	
 		self.Sess = Sess
@@ -29,23 +69,29 @@ class HTMLAnalysis(PassivePlugin):
 		
 		Req = Sess.Request
 		Res = Sess.Response
+		#the element index of the response that the other passive plugins also read, see ResponseIndex
+		Html = AppDomain.CurrentDomain.GetData("ResponseIndex").Get(Sess.Response)
 		
-		script_srcs = Sess.Response.Html.GetValues("script","src")
-		for src in script_srcs:
+		script_srcs = Html.GetValues("script","src")
+		for src in self.GetUnique(script_srcs):
 			try:
-				src_req = Request(src)
-				if(self.IsForiegnDomain(Req, src_req)):
+				src_ssl, src_host = self.GetUrlAuthority(src)
+				foreign, insecure_in_secure, secure_in_insecure = self.ClassifyHost(Req, src_ssl, src_host)
+				#the Request is made only when there is something to report, for the urls and hosts in the finding
+				if foreign or insecure_in_secure or secure_in_insecure:
+					src_req = Request(src)
+				if(foreign):
 					self.ReportScriptFromExternalDomain()
 					Title = "Scripts loaded from External Domains"
 					Summary = "Script has been loaded in the page from {0} which is an external domain that might not be trustworthy".format(src_req.Host)
 					Signature = self.MakeSignature(Title, src_req.Host)
 					self.ReportTestLead(Title, Summary, Req.BaseUrl,"This request is made to the domain - {0}".format(Req.Host),src_req.FullUrl,"This response loads a JavaScript document from the domain - {0}".format(src_req.Host), Signature)
-				if(Req.SSL and not src_req.SSL):
+				if(insecure_in_secure):
 					Title = "Insecure Scripts loaded inside Secure Page"
 					Summary = "Page loaded over SSL includes script that is loaded over HTTP, this compromises the integrity of the SSL layer"
 					Signature = self.MakeSignature(Title, src_req.UrlPath)
 					self.ReportVulnerability(Title, Summary, "https://","This Request was made over HTTPS",src_req.FullUrl,"This response loads a JavaScript document from the HTTP url {0}".format(src_req.BaseUrl), FindingConfidence.High, FindingSeverity.Medium, Signature)
-				elif(src_req.SSL and not Req.SSL):
+				elif(secure_in_insecure):
 					Title = "Secure Script loaded inside Insecure Page"
 					Summary = "Page loaded over HTTP includes script that is loaded over SSL, this compromises the integrity of the script"
 					Signature = self.MakeSignature(Title, src_req.UrlPath)
@@ -53,16 +99,19 @@ class HTMLAnalysis(PassivePlugin):
 			except:
 				pass
 			
-		css_srcs = Sess.Response.Html.GetValues("style","src")
-		for src in css_srcs:
+		css_srcs = Html.GetValues("style","src")
+		for src in self.GetUnique(css_srcs):
 			try:
-				src_req = Request(src)
-				if(self.IsForiegnDomain(Req, src_req)):
+				src_ssl, src_host = self.GetUrlAuthority(src)
+				foreign, insecure_in_secure, secure_in_insecure = self.ClassifyHost(Req, src_ssl, src_host)
+				if foreign or insecure_in_secure:
+					src_req = Request(src)
+				if(foreign):
 					Title = "CSS loaded from External Domains"
 					Summary = "CSS document has been loaded in the page from {0} which is an external domain that might not be trustworthy".format(src_req.Host)
 					Signature = self.MakeSignature(Title, src_req.Host)
 					self.ReportTestLead(Title, Summary, Req.BaseUrl,"This request is made to the domain - {0}".format(Req.Host),src_req.FullUrl,"This response loads a CSS document from the domain - {0}".format(src_req.Host), Signature)
-				if(Req.SSL and not src_req.SSL):
+				if(insecure_in_secure):
 					Title = "Insecure CSS loaded inside Secure Page"
 					Summary = "Page loaded over SSL includes CSS that is loaded over HTTP, this compromises the integrity of the SSL layer"
 					Signature = self.MakeSignature(Title, src_req.UrlPath)
@@ -70,21 +119,24 @@ class HTMLAnalysis(PassivePlugin):
 			except:
 				pass
 		
-		iframe_srcs = Sess.Response.Html.GetValues("iframe","src")
-		for src in iframe_srcs:
+		iframe_srcs = Html.GetValues("iframe","src")
+		for src in self.GetUnique(iframe_srcs):
 			try:
-				src_req = Request(src)
-				if(self.IsForiegnDomain(Req, src_req)):
+				src_ssl, src_host = self.GetUrlAuthority(src)
+				foreign, insecure_in_secure, secure_in_insecure = self.ClassifyHost(Req, src_ssl, src_host)
+				if foreign or insecure_in_secure or secure_in_insecure:
+					src_req = Request(src)
+				if(foreign):
 					Title = "IFRAME loaded from External Domains"
 					Summary = "IFRAME has been loaded in the page from {0} which is an external domain that might not be trustworthy".format(src_req.Host)
 					Signature = self.MakeSignature(Title, src_req.Host)
 					self.ReportTestLead(Title, Summary, Req.BaseUrl,"This request is made to the domain - {0}".format(Req.Host),src_req.FullUrl,"This response contains an IFRAME from the domain - {0}".format(src_req.Host), Signature)
-				if(Req.SSL and not src_req.SSL):
+				if(insecure_in_secure):
 					Title = "Insecure IFRAMEs loaded inside Secure Page"
 					Summary = "Page loaded over SSL includes IFRAME that is loaded over HTTP, this compromises the integrity of the SSL layer"
 					Signature = self.MakeSignature(Title, src_req.UrlPath)
 					self.ReportVulnerability(Title, Summary, "https://","This Request was made over HTTPS",src_req.FullUrl,"This response contains an IFRAME from the HTTP url {0}".format(src_req.BaseUrl), FindingConfidence.High, FindingSeverity.Medium, Signature)
-				elif(src_req.SSL and not Req.SSL):
+				elif(secure_in_insecure):
 					Title = "Secure IFRAME loaded inside Insecure Page"
 					Summary = "Page loaded over HTTP includes IFRAME that is loaded over SSL, this compromises the integrity of the IFRAME"
 					Signature = self.MakeSignature(Title, src_req.UrlPath)
@@ -92,19 +144,22 @@ class HTMLAnalysis(PassivePlugin):
 			except:
 				pass
 		
-		forms = Sess.Response.Html.GetForms()
+		forms = Html.GetForms()
 		#form_actions = Sess.Response.Html.GetValues("form","src")
 		for form in forms:
 			src = self.GetFormAction(form)
 			form_signature = self.GetFormSignature(form)
 			try:
-				src_req = Request(src)
-				if(self.IsForiegnDomain(Req, src_req)):
+				src_ssl, src_host = self.GetUrlAuthority(src)
+				foreign, insecure_in_secure, secure_in_insecure = self.ClassifyHost(Req, src_ssl, src_host)
+				if foreign or insecure_in_secure or secure_in_insecure:
+					src_req = Request(src)
+				if(foreign):
 					Title = "Form contents submitted to External Domains"
 					Summary = "Form contents in the page are submitted to {0} which is an external domain that might not be trustworthy".format(src_req.Host)
 					Signature = self.MakeSignature(Title, "{0}{1}".format(src_req.Host, form_signature))
 					self.ReportTestLead(Title, Summary, Req.BaseUrl,"This request is made to the domain - {0}".format(Req.Host),src_req.FullUrl,"An HTML form loaded from {0} is submitted to {1}".format(Req.Host, src_req.Host), Signature)
-				if(Req.SSL and not src_req.SSL):
+				if(insecure_in_secure):
 					if(self.IsSensitiveForm(form, form_signature)):
 						Title = "Secure Page submits Sensitive Form contents to InSecure Page"
 						Summary = "Form contained inside page loaded over SSL submits its contents, which includes password fields, to another page over HTTP"
@@ -115,7 +170,7 @@ class HTMLAnalysis(PassivePlugin):
 						Summary = "Form contained inside page loaded over SSL submits its contents to another page over HTTP"
 						Signature = self.MakeSignature(Title, form_signature)
 						self.ReportVulnerability(Title, Summary, "https://","This Request was made over HTTPS",src_req.FullUrl,"An HTML form in this response submits its contents to the HTTP url - {0}".format(src_req.FullUrl), FindingConfidence.High, FindingSeverity.Low, Signature)
-				elif(src_req.SSL and not Req.SSL):
+				elif(secure_in_insecure):
 					if(self.IsSensitiveForm(form, form_signature)):
 						Title = "Secure Form with Sensitive contents loaded over InSecure Page"
 						Summary = "Form contained inside page loaded over HTTP submits its contents, which includes password fields, to another page over HTTPS. Loading the form over HTTP compromises the SSL security required for this form submission."
@@ -131,66 +186,103 @@ class HTMLAnalysis(PassivePlugin):
 					Title = "Sensitive Form loaded and submitted Insecurely"
 					Summary = "Form with sensitive contents, which includes password fields, is loaded and submitted over HTTP"
 					Signature = self.MakeSignature(Title, form_signature)
-					self.ReportVulnerability(Title, Summary, "http://","This Request was made over HTTP",form.OuterHtml,"The HTML form containing password fields is displayed below. The unnecessary elements from this form have been stripped away for clarity.", FindingConfidence.High, FindingSeverity.Medium, Signature)
+					self.ReportVulnerability(Title, Summary, "http://","This Request was made over HTTP",form.outer_html,"The HTML form containing password fields is displayed below. The unnecessary elements from this form have been stripped away for clarity.", FindingConfidence.High, FindingSeverity.Medium, Signature)
 		
+	#form is an HtmlElement of the ResponseIndex, its attribute names are lowercased
 	def IsSensitiveForm(self, form, form_signature):
 		AutoComplete = True
 		Sensitive = False
-		for attr in form.Attributes:
-			if(attr.Name.lower() == "autocomplete"):
-				if(attr.Value.lower() == "off"):
+		for attr_name, attr_value in form.attributes:
+			if(attr_name == "autocomplete"):
+				if(attr_value.lower() == "off"):
 					AutoComplete = False
 		
-		for child_node in form.ChildNodes:
-			if(child_node.Name.lower() == "input"):
-				Sensitive = False
-				pwd_field = False
-				field_autocomplete = AutoComplete
-				
-				for attr in child_node.Attributes:
-					attr_name = attr.Name.lower()
-					if(attr_name == "type" and attr.Value.lower() == "password"):
-						Sensitive = True
-						pwd_field = True
-					if attr_name == "autocomplete" and attr.Value.lower() == "off" :
-						field_autocomplete = False
-				if (Sensitive and AutoComplete) or (pwd_field and field_autocomplete):
-					Title = "AutoComplete Enabled on Password Fields"
-					Summary = "AutoComplete feature has not been disabled on the form/fields that accept Passwords from users"
-					Signature = self.MakeSignature(Title, form_signature)
-					self.ReportVulnerability(Title, Summary,"","","","This response contains INPUT elements whose type attribute is password but their autocomplete attribute is not set to 'off'",FindingConfidence.High, FindingSeverity.Low, Signature)
-					return True
+		for field in form.inputs:
+			Sensitive = False
+			pwd_field = False
+			field_autocomplete = AutoComplete
+			
+			for attr_name, attr_value in field.attributes:
+				if(attr_name == "type" and attr_value.lower() == "password"):
+					Sensitive = True
+					pwd_field = True
+				if attr_name == "autocomplete" and attr_value.lower() == "off" :
+					field_autocomplete = False
+			if (Sensitive and AutoComplete) or (pwd_field and field_autocomplete):
+				Title = "AutoComplete Enabled on Password Fields"
+				Summary = "AutoComplete feature has not been disabled on the form/fields that accept Passwords from users"
+				Signature = self.MakeSignature(Title, form_signature)
+				self.ReportVulnerability(Title, Summary,"","","","This response contains INPUT elements whose type attribute is password but their autocomplete attribute is not set to 'off'",FindingConfidence.High, FindingSeverity.Low, Signature)
+				return True
 		return False
 	
 	def GetFormAction(self, form):
-		for attr in form.Attributes:
-			if(attr.Name.lower() == "action"):
-				return attr.Value 
-		return ""
+		action = form.Get("action")
+		if action == None:
+			return ""
+		return action
 	
 	def GetFormSignature(self, form):
 		form_signature = []
-		for attr in form.Attributes:
-			attr_name = attr.Name.lower()
+		for attr_name, attr_value in form.attributes:
 			form_signature.append(attr_name)
 			if attr_name == "id" or attr_name == "class" or attr_name == "method":
-				form_signature.append(attr.Value)
+				form_signature.append(attr_value)
 		
-		for child_node in form.ChildNodes:
-			if(child_node.Name.lower() == "input"):
-				for attr in child_node.Attributes:
-					attr_name = attr.Name.lower()
-					if attr_name == "name":
-						form_signature.append(attr_name)
-						form_signature.append(attr.Value)
+		for field in form.inputs:
+			for attr_name, attr_value in field.attributes:
+				if attr_name == "name":
+					form_signature.append(attr_name)
+					form_signature.append(attr_value)
 		return "|".join(form_signature)
 	
-	def IsForiegnDomain(self, ReqOne, ReqTwo):
-		reqone_host_parts = ReqOne.Host.Split(".")
-		reqtwo_host_parts = ReqTwo.Host.Split(".")
+	#Returns the urls in the order they first appear, a page often loads the same resource more than once
+	def GetUnique(self, urls):
+		unique_urls = []
+		seen = {}
+		for url in urls:
+			if not seen.has_key(url):
+				seen[url] = True
+				unique_urls.append(url)
+		return unique_urls
+	
+	#Returns whether the url is https and its host, with the port if it is not the default one.
+	#Like creating a Request from the url, it raises an exception if the url is not an absolute http or https url.
+	def GetUrlAuthority(self, url):
+		url_lower = url.strip().lower()
+		if url_lower.startswith("https://"):
+			ssl = True
+		elif url_lower.startswith("http://"):
+			ssl = False
+		else:
+			raise Exception("Not an absolute http or https url - {0}".format(url))
+		authority = url_lower[url_lower.index("//") + 2:]
+		for end in ["/", "?", "#", "\\"]:
+			if authority.count(end) > 0:
+				authority = authority[:authority.index(end)]
+		if authority.count("@") > 0:
+			authority = authority[authority.rindex("@") + 1:]
+		if (ssl and authority.endswith(":443")) or (not ssl and authority.endswith(":80")):
+			authority = authority[:authority.rindex(":")]
+		if len(authority) == 0 or authority.startswith(":"):
+			raise Exception("No host in the url - {0}".format(url))
+		return [ssl, authority]
+	
+	#Returns [foreign, insecure resource in a secure page, secure resource in an insecure page] for a resource loaded by the page of Req
+	def ClassifyHost(self, Req, src_ssl, src_host):
+		key = "{0}|{1}|{2}|{3}".format(Req.SSL, Req.Host, src_ssl, src_host)
+		classification = self.host_cache.Get(key)
+		if classification == None:
+			classification = [self.IsForiegnDomain(Req.Host, src_host), Req.SSL and not src_ssl, src_ssl and not Req.SSL]
+			self.host_cache.Put(key, classification)
+		return classification
+	
+	def IsForiegnDomain(self, HostOne, HostTwo):
+		reqone_host_parts = HostOne.Split(".")
+		reqtwo_host_parts = HostTwo.Split(".")
 		
-		if((self.IsIP(ReqOne.Host) or self.IsIP(ReqTwo.Host)) or (len(reqone_host_parts) < 1 or len(reqtwo_host_parts) < 1)):
-			if(ReqOne.Host == ReqTwo.Host):
+		if((self.IsIP(HostOne) or self.IsIP(HostTwo)) or (len(reqone_host_parts) < 1 or len(reqtwo_host_parts) < 1)):
+			if(HostOne == HostTwo):
 				return False
 			else:
 				return True
@@ -222,7 +314,7 @@ class HTMLAnalysis(PassivePlugin):
 	def ReportVulnerability(self, Title, Summary, RequestTrigger, RequestTriggerDesc, ResponseTrigger, ResponseTriggerDesc, Confidence, Severity, Signature):
 		#Results = ThreadStore.Get("Results")
 		#Sess = ThreadStore.Get("Session")
-		if self.ReportAll or self.IsSignatureUnique(self.Sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
+		if self.ReportAll or AppDomain.CurrentDomain.GetData("FindingSignatureIndex").IsNewSignature(self, self.Sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
 			PR = Finding(self.Sess.Request.BaseUrl)
 			PR.Title = Title
 			PR.Summary = Summary
@@ -235,7 +327,7 @@ class HTMLAnalysis(PassivePlugin):
 	def ReportTestLead(self, Title, Summary, RequestTrigger, RequestTriggerDesc, ResponseTrigger, ResponseTriggerDesc, Signature):
 		#Results = ThreadStore.Get("Results")
 		#Sess = ThreadStore.Get("Session")
-		if self.ReportAll or self.IsSignatureUnique(self.Sess.Request.BaseUrl, FindingType.TestLead, Signature):
+		if self.ReportAll or AppDomain.CurrentDomain.GetData("FindingSignatureIndex").IsNewSignature(self, self.Sess.Request.BaseUrl, FindingType.TestLead, Signature):
 			PR = Finding(self.Sess.Request.BaseUrl)
 			PR.Title = Title
 			PR.Summary = Summary
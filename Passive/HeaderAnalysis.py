@@ -28,28 +28,34 @@ class HeaderAnalysis(PassivePlugin):
 		if Sess.Response.Headers.Has("Location") and Sess.Response.Code != 200:
 			actual_redirect_location = Sess.Response.Headers.Get("Location")
 			redirect_location = actual_redirect_location.lower()
-			for part in Sess.Request.UrlPathParts:
-				if part.lower() == redirect_location:
-					self.ReportRedirect(actual_redirect_location, part, "url", Sess, Results)
-					return
-			for name in Sess.Request.Query.GetNames():
-				for val in Sess.Request.Query.GetAll(name):
-					if val.lower() == redirect_location:
-						self.ReportRedirect(actual_redirect_location, val, "query:(0)".format(name), Sess, Results)
-						return
-			for name in Sess.Request.Body.GetNames():
-				for val in Sess.Request.Body.GetAll(name):
-					if val.lower() == redirect_location:
-						self.ReportRedirect(actual_redirect_location, val, "body:{0}".format(name), Sess, Results)
-						return
-			if Sess.Request.Headers.Has("Referer"):
-				if Sess.Request.Headers.Get("Referer").lower() == redirect_location:
-					self.ReportRedirect(actual_redirect_location, Sess.Request.Headers.Get("Referer"), "referrer", Sess, Results)
-					return
+			match = self.FindRequestValue(Sess, redirect_location)
+			if match != None:
+				self.ReportRedirect(actual_redirect_location, match[1], match[0], Sess, Results)
+
+	#Returns [section, value] of the first value of the request that is the same as the lowercased text, or None.
+	#The section is in the form used in the signature of the finding.
+	#Each value is looked at once, so this is a single scan. Only values as long as the text are lowercased, a large form post has few of them.
+	def FindRequestValue(self, Sess, text):
+		text_len = len(text)
+		for part in Sess.Request.UrlPathParts:
+			if len(part) == text_len and part.lower() == text:
+				return ["url", part]
+		for name in Sess.Request.Query.GetNames():
+			for val in Sess.Request.Query.GetAll(name):
+				if len(val) == text_len and val.lower() == text:
+					return ["query:{0}".format(name), val]
+		for name in Sess.Request.Body.GetNames():
+			for val in Sess.Request.Body.GetAll(name):
+				if len(val) == text_len and val.lower() == text:
+					return ["body:{0}".format(name), val]
+		if Sess.Request.Headers.Has("Referer"):
+			if Sess.Request.Headers.Get("Referer").lower() == text:
+				return ["referrer", Sess.Request.Headers.Get("Referer")]
+		return None
 
 	def ReportRedirect(self, redirect_location, val, section, Sess, Results):
 		Signature = '{0}|{1}'.format(Sess.Request.SSL.ToString(), section)
-		if self.ReportAll or self.IsSignatureUnique(Sess.Request.BaseUrl, FindingType.TestLead, Signature):
+		if self.ReportAll or AppDomain.CurrentDomain.GetData("FindingSignatureIndex").IsNewSignature(self, Sess.Request.BaseUrl, FindingType.TestLead, Signature):
 			PR = Finding(Sess.Request.BaseUrl)
 			PR.Title = "Possible Open Redirect"
 			PR.Summary = "The Location Header of the Response contains the value present in the Request. This could potentially be an Open Redirect. Manual investigation required."
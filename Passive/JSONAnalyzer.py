@@ -1,12 +1,15 @@
 #Author: Lavakumar Kuppan
 #License: MIT License - http://www.opensource.org/licenses/mit-license
 from IronWASP import *
+from System import *
 import re
 
 
 #Extend the PassivePlugin base class
 class JSONAnalyzer(PassivePlugin):
 
+  #Content types of the responses this plugin works on, see ResponseIndex
+  content_types = ["Json", "JavaScript"]
 
   def GetInstance(self):
     p = JSONAnalyzer()
@@ -22,7 +25,7 @@ class JSONAnalyzer(PassivePlugin):
     self.results = results
     self.report_all = report_all
     
-    if sess.Request.Method == "GET" and sess.Response:
+    if sess.Request.Method == "GET" and sess.Response and AppDomain.CurrentDomain.GetData("ResponseIndex").Handles(sess.Response, self.content_types):
       bs = sess.Response.BodyString.strip()
       if sess.Response.IsJson and bs.startswith('[') and bs.endswith(']'):
         self.ReportJH()
@@ -42,7 +45,7 @@ class JSONAnalyzer(PassivePlugin):
       sl = len(bs) - 1
     Signature = 'JSONHijacking|{0}'.format(self.MakeUniqueString(self.sess))
     
-    if self.report_all or self.IsSignatureUnique(self.sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
+    if self.report_all or AppDomain.CurrentDomain.GetData("FindingSignatureIndex").IsNewSignature(self, self.sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
       PR = Finding(self.sess.Request.BaseUrl)
       PR.Title = "JSON Hijacking Possibility Found"
       PR.Summary = "The JSON data in this response is placed inside an array, this can lead to cross-domain leakage of this data. For more details about this vulnerability refer <i<cb>>http://haacked.com/archive/2009/06/25/json-hijacking.aspx<i</cb>>"
@@ -59,7 +62,7 @@ class JSONAnalyzer(PassivePlugin):
       sl = len(bs) - 1
     Signature = 'JSONPHijacking|{0}'.format(self.MakeUniqueString(self.sess))
     
-    if self.report_all or self.IsSignatureUnique(self.sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
+    if self.report_all or AppDomain.CurrentDomain.GetData("FindingSignatureIndex").IsNewSignature(self, self.sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
       PR = Finding(self.sess.Request.BaseUrl)
       PR.Title = "JSON Hijacking via JSONP Found"
       PR.Summary = "The JSON data in this response is in the form of JSONP where it is found as the argument of the method named '{0}'. By design JSONP is meant to allow cross-domain leakage of the JSON data. For more details about this issue refer <i<cb>>http://en.wikipedia.org/wiki/JSONP#Security_concerns<i</cb>>".format(method_name)
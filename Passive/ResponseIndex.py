@@ -0,0 +1,200 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+
+from IronWASP import *
+from System import *
+from System.Threading import Monitor
+from collections import OrderedDict
+import clr
+import re
+
+#Tokenizes the HTML of a response once into an index of its elements and attributes that all the passive plugins read.
+#This file does not add a plugin, it only creates a single store and puts it in the AppDomain under the name 'ResponseIndex'.
+#Plugins get it with AppDomain.CurrentDomain.GetData("ResponseIndex").
+#
+#Plugins list the content types they work on in content_types, the names are those of the Is properties of Response
+#like Html, Xml, JavaScript and Json. Handles checks a response against them so responses of other types are skipped before anything is parsed.
+#Get returns the HtmlIndex of a response. The body is read in one pass on the first call to it and every plugin after that
+#reads the same index, see HtmlIndex for what it holds.
+class ResponseIndexStore:
+
+	#Number of the most recent responses whose index is kept
+	max_responses = 64
+
+	def __init__(self):
+		self.lock = Object()
+		self.indexes = OrderedDict()
+
+	#Returns the HtmlIndex of the response, making it if this is the first plugin to ask for it
+	def Get(self, res):
+		Monitor.Enter(self.lock)
+		try:
+			if self.indexes.has_key(res):
+				index = self.indexes.pop(res)
+			else:
+				index = HtmlIndex(res)
+			self.indexes[res] = index
+			while len(self.indexes) > self.max_responses:
+				self.indexes.popitem(False)
+			return index
+		finally:
+			Monitor.Exit(self.lock)
+
+	#True if the response is of any of the content types, 'Any' matches every response
+	def Handles(self, res, content_types):
+		for content_type in content_types:
+			if content_type == "Any" or getattr(res, "Is" + content_type):
+				return True
+		return False
+
+
+#An element of the HTML with its lowercased name and its (lowercased name, value) attributes in the order they are in the tag.
+#Forms also have the input elements between their start and end tags and their outer HTML.
+class HtmlElement:
+
+	def __init__(self, name, attributes):
+		self.name = name
+		self.attributes = attributes
+		self.inputs = []
+		self.outer_html = ""
+
+	#Returns the value of the first attribute with the lowercased name, or None
+	def Get(self, name):
+		for attr_name, attr_value in self.attributes:
+			if attr_name == name:
+				return attr_value
+		return None
+
+
+#The elements of the HTML of a response, read from the body in one pass on the first call:
+#the attributes of every element by tag name, the forms with their inputs, and the JavaScript of the page which is the text of the inline
+#script elements, the values of the event handler attributes and the code of javascript: urls.
+#Text inside comments is skipped and the text of script, style and textarea elements is not read as tags.
+#Attribute values are the text from the tag, entities are not decoded.
+class HtmlIndex:
+
+	tag_regex = re.compile(r"<!--.*?(?:-->|$)|<(/?)([a-zA-Z][^\s/>]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>", re.S)
+	attribute_regex = re.compile(r"([^\s\"'>/=]+)(?:\s*=\s*(\"[^\"]*\"|'[^']*'|[^\s>]+))?")
+	#Elements whose text is not HTML, it runs until their end tag
+	raw_text_elements = ["script", "style", "textarea"]
+	#Attributes that take a url, a javascript: url in them is JavaScript of the page
+	url_attributes = ["href", "src", "action", "formaction"]
+
+	def __init__(self, res):
+		self.res = res
+		self.lock = Object()
+		#lowercased tag name -> the HtmlElements with that name
+		self.elements = None
+		self.forms = []
+		self.javascript = []
+
+	#Returns the values of the attribute of every element with the tag name
+	def GetValues(self, tag, attribute):
+		values = []
+		for element in self.GetElements(tag):
+			value = element.Get(attribute.lower())
+			if value != None:
+				values.append(value)
+		return values
+
+	#Returns the forms as HtmlElements, each with the input elements between its start and end tags
+	def GetForms(self):
+		self.Read()
+		return self.forms
+
+	#Returns the text of the inline scripts, the values of event handler attributes and the code of javascript: urls
+	def GetJavaScript(self):
+		self.Read()
+		return self.javascript
+
+	#Returns the content attribute of the meta elements whose attribute has the value, like GetMetaContent("http-equiv", "refresh")
+	def GetMetaContent(self, attribute, value):
+		contents = []
+		for element in self.GetElements("meta"):
+			attr_value = element.Get(attribute.lower())
+			if attr_value != None and attr_value.lower() == value.lower():
+				content = element.Get("content")
+				if content != None:
+					contents.append(content)
+		return contents
+
+	def GetElements(self, tag):
+		self.Read()
+		return self.elements.get(tag.lower(), [])
+
+	def Read(self):
+		Monitor.Enter(self.lock)
+		try:
+			if self.elements == None:
+				self.ReadBody(self.res.BodyString)
+		finally:
+			Monitor.Exit(self.lock)
+
+	#The lists are only set once the whole body is read, so a body that fails to read leaves nothing half filled and is read again on the next call
+	def ReadBody(self, body):
+		elements = {}
+		forms = []
+		javascript = []
+		form = None
+		pos = 0
+		while True:
+			m = self.tag_regex.search(body, pos)
+			if m == None:
+				break
+			pos = m.end()
+			if m.group(2) == None:
+				continue
+			name = m.group(2).lower()
+			if m.group(1):
+				if name == "form" and form != None:
+					form.outer_html = body[form_start:m.end()]
+					form = None
+				continue
+			element = HtmlElement(name, self.GetAttributes(m.group(3)))
+			if not elements.has_key(name):
+				elements[name] = []
+			elements[name].append(element)
+			self.AddAttributeJavaScript(element, javascript)
+			if name == "form":
+				if form == None:
+					form = element
+					form_start = m.start()
+					forms.append(form)
+			elif name == "input" and form != None:
+				form.inputs.append(element)
+			elif name in self.raw_text_elements and not m.group(3).rstrip().endswith("/"):
+				end = re.compile("</{0}\\s*>".format(name), re.I).search(body, pos)
+				if end == None:
+					text = body[pos:]
+					pos = len(body)
+				else:
+					text = body[pos:end.start()]
+					pos = end.end()
+				if name == "script" and len(text.strip()) > 0:
+					javascript.append(text)
+		if form != None:
+			form.outer_html = body[form_start:]
+		self.forms = forms
+		self.javascript = javascript
+		self.elements = elements
+
+	def GetAttributes(self, text):
+		attributes = []
+		for m in self.attribute_regex.finditer(text):
+			value = m.group(2)
+			if value == None:
+				value = ""
+			elif value.startswith('"') or value.startswith("'"):
+				value = value[1:-1]
+			attributes.append((m.group(1).lower(), value))
+		return attributes
+
+	def AddAttributeJavaScript(self, element, javascript):
+		for attr_name, attr_value in element.attributes:
+			if attr_name.startswith("on") and len(attr_value) > 0:
+				javascript.append(attr_value)
+			elif attr_name in self.url_attributes and attr_value.strip().lower().startswith("javascript:"):
+				javascript.append(attr_value.strip()[11:])
+
+
+AppDomain.CurrentDomain.SetData("ResponseIndex", ResponseIndexStore())
@@ -2,10 +2,25 @@
 #License: MIT License - http://www.opensource.org/licenses/mit-license
 
 from IronWASP import *
+from System import *
+from System.Threading import Monitor
+from collections import OrderedDict
 import re
 
 class SessionAnalysis(PassivePlugin):
     
+  login_url_keywords = ['login','auth','signin','signoff']
+  login_usernames = ['uname','username','email','id','user','uid','user_name']
+  login_passwords = ['pwd','password','pass','passwd','passw']
+  login_url_regex = re.compile("|".join(login_url_keywords), re.I)
+  login_username_set = frozenset(login_usernames)
+  #password parameter name -> position in login_passwords, when more than one is found the one that comes last in the list is reported
+  login_password_positions = dict([(login_passwords[i], i) for i in range(len(login_passwords))])
+  #Least recently used cache of ClassifyRequest results keyed on the url path and the parameter names, a login form is submitted many times
+  classification_cache = OrderedDict()
+  max_classifications = 2000
+  classification_lock = Object()
+  
   #Override the GetInstance method of the base class to return a new instance with details
   def GetInstance(self):
     p = SessionAnalysis()
@@ -53,56 +68,14 @@ class SessionAnalysis(PassivePlugin):
               self.ReportSessionFixation(Summary, RequestTrigger, RequestTriggerDesc, ResponseTrigger, ResponseTriggerDesc, FindingConfidence.Low, FindingSeverity.Medium)
 
   def IsLoginRequest(self, Req):
-    login_url_keywords = ['login','auth','signin','signoff']
-    login_usernames = ['uname','username','email','id','user','uid','user_name']
-    login_passwords = ['pwd','password','pass','passwd','passw']
-    
-    url_check_pass = False
-    username_check_pass = False
-    password_check_pass = False
-    
-    username_in_url = False
-    password_in_url = False
-    
-    username_parameter = ""
-    password_parameter = ""
-    
-    for word in login_url_keywords:
-      if(re.search(word, Req.Url, re.I)):
-        url_check_pass = True
-        break
-    
-    for word in login_usernames:
-      for param in Req.Body.GetNames():
-        if word == param.lower():
-          username_check_pass = True
-          username_parameter = word
-          break
-    
-    for word in login_passwords:
-      for param in Req.Body.GetNames():
-        if word == param.lower():
-          password_check_pass = True
-          password_parameter = word
-          break
-        
-    if(not username_check_pass):
-      for word in login_usernames:
-        for param in Req.Query.GetNames():
-          if word == param.lower():
-            username_check_pass = True
-            username_parameter = word
-            username_in_url = True
-            break
-    
-    if(not password_check_pass):
-      for word in login_passwords:
-        for param in Req.Query.GetNames():
-          if word == param.lower():
-            password_check_pass = True
-            password_parameter = word
-            password_in_url = True
-            break
+    path_check_pass, username_check_pass, password_check_pass, username_in_url, password_in_url, password_parameter = self.ClassifyRequest(Req)
+    url_check_pass = path_check_pass
+    if not url_check_pass:
+      #the keywords are also looked for in the query, whose values change too often to be cached
+      query_string = Req.Url
+      if query_string.startswith(Req.UrlPath):
+        query_string = query_string[len(Req.UrlPath):]
+      url_check_pass = self.login_url_regex.search(query_string) != None
     
     if((url_check_pass and username_check_pass) or password_check_pass):
       if(password_in_url):
@@ -117,6 +90,58 @@ class SessionAnalysis(PassivePlugin):
     else:
       return False
 
+  #Returns [url path has a login keyword, username found, password found, username found in query, password found in query, password parameter]
+  def ClassifyRequest(self, Req):
+    body_names = frozenset([name.lower() for name in Req.Body.GetNames()])
+    query_names = frozenset([name.lower() for name in Req.Query.GetNames()])
+    key = (Req.UrlPath, body_names, query_names)
+    Monitor.Enter(self.classification_lock)
+    try:
+      if self.classification_cache.has_key(key):
+        classification = self.classification_cache.pop(key)
+        self.classification_cache[key] = classification
+        return classification
+    finally:
+      Monitor.Exit(self.classification_lock)
+    
+    path_check_pass = self.login_url_regex.search(Req.UrlPath) != None
+    username_check_pass, password_parameter = self.FindLoginNames(body_names)
+    password_check_pass = len(password_parameter) > 0
+    username_in_url = False
+    password_in_url = False
+    if not (username_check_pass and password_check_pass):
+      query_username_check_pass, query_password_parameter = self.FindLoginNames(query_names)
+      if not username_check_pass and query_username_check_pass:
+        username_check_pass = True
+        username_in_url = True
+      if not password_check_pass and len(query_password_parameter) > 0:
+        password_check_pass = True
+        password_parameter = query_password_parameter
+        password_in_url = True
+    classification = [path_check_pass, username_check_pass, password_check_pass, username_in_url, password_in_url, password_parameter]
+    
+    Monitor.Enter(self.classification_lock)
+    try:
+      self.classification_cache[key] = classification
+      while len(self.classification_cache) > self.max_classifications:
+        self.classification_cache.popitem(False)
+    finally:
+      Monitor.Exit(self.classification_lock)
+    return classification
+  
+  #Returns whether any of the lowercased names is a username parameter, and the password parameter among them or an empty string
+  def FindLoginNames(self, names):
+    username_found = False
+    password_position = -1
+    for name in names:
+      if name in self.login_username_set:
+        username_found = True
+      if self.login_password_positions.get(name, -1) > password_position:
+        password_position = self.login_password_positions[name]
+    if password_position > -1:
+      return [username_found, self.login_passwords[password_position]]
+    return [username_found, ""]
+
   def GetSessionParameterName(self, Sess):
     for sc in Sess.Response.SetCookies:
       if sc.Name.lower().count("session") > 0:
@@ -131,7 +156,7 @@ class SessionAnalysis(PassivePlugin):
     #Results = ThreadStore.Get("Results")
     #Sess = ThreadStore.Get("Session")
     Signature = 'SessionFixation|{0}|{1}|{2}'.format(self.MakeUniqueString(self.Sess), RequestTrigger, ResponseTrigger)
-    if self.ReportAll or self.IsSignatureUnique(self.Sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
+    if self.ReportAll or AppDomain.CurrentDomain.GetData("FindingSignatureIndex").IsNewSignature(self, self.Sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
       PR = Finding(self.Sess.Request.BaseUrl)
       PR.Title = "Session Fixation Found"
       PR.Summary = Summary
@@ -145,7 +170,7 @@ class SessionAnalysis(PassivePlugin):
     #Results = ThreadStore.Get("Results")
     #Sess = ThreadStore.Get("Session")
     Signature = 'PasswordInUrl|{0}|{1}|{2}'.format(self.MakeUniqueString(self.Sess), RequestTrigger, ResponseTrigger)
-    if self.ReportAll or self.IsSignatureUnique(self.Sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
+    if self.ReportAll or AppDomain.CurrentDomain.GetData("FindingSignatureIndex").IsNewSignature(self, self.Sess.Request.BaseUrl, FindingType.Vulnerability, Signature):
       PR = Finding(self.Sess.Request.BaseUrl)
       PR.Title = "Password Sent in URL"
       PR.Summary = Summary
@@ -32,7 +32,8 @@ class CodeInjection(ActivePlugin):
   def CheckForCodeInjection(self):
     self.scnr.Trace("<i<br>><i<h>>Checking for Code Injection:<i</h>>")
     self.CheckForEchoBasedCodeInjection()
-    self.CheckForTimeBasedCodeInjection()
+    AppDomain.CurrentDomain.GetData("InjectionCache").TraceHitRatio(self.scnr, self.Name)
+    AppDomain.CurrentDomain.GetData("HostConcurrencyController").RunInQuietWindow(self.scnr, self.CheckForTimeBasedCodeInjection)
     self.AnalyzeTestResult()
   
   def CheckForEchoBasedCodeInjection(self):
@@ -55,49 +56,45 @@ class CodeInjection(ActivePlugin):
     added_str = str(add_num_1 + add_num_2)
     
     self.scnr.Trace("<i<br>><i<h>>Checking for Echo based Code Injection:<i</h>>")
+    #the payloads of one language are sent together and the check stops at the first language that executes the snippet
     for i in range(len(functions)):
+      func_to_execute = functions[i].replace("<add_str>", add_str)
+      payloads = []
       for p in prefixes:
         inj_comments = ["", comments[i]]
         for c in inj_comments:
-          func_to_execute = functions[i].replace("<add_str>", add_str)
-          payload = "{0}{1}{2}".format(p, func_to_execute, c)
-          self.scnr.RequestTrace("  Injected payload - {0}".format(payload))
-          res = self.scnr.Inject(payload)
-          if res.BodyString.count(added_str) > 0:
-            self.scnr.ResponseTrace("    ==> <i<cr>>Got {0} in the response, this is the result of executing '{1}'. Indicates Code Injection!<i</cr>>".format(added_str, add_str))
-            self.scnr.SetTraceTitle("Echo based Code Injection", 5)
-            self.AddToTriggers(payload, "The payload in this request contains a code snippet which if executed will add the numbers {0} & {1} and print the result. The code snippet is: {2}".format(add_num_1, add_num_2, func_to_execute), added_str, "This response contains the value {0} which is the sum of the numbers {1} & {2} which were sent in the request.".format(add_num_1 + add_num_2, add_num_1, add_num_2))
-            reason = self.GetErrorReason(payload, func_to_execute, add_num_1, add_num_2)
-            self.reasons.append(reason)
-            return
-          else:
-            self.scnr.ResponseTrace("    ==> Did not get {0} in the response".format(added_str))
+          payloads.append("{0}{1}{2}".format(p, func_to_execute, c))
+      
+      injected = AppDomain.CurrentDomain.GetData("ConcurrentInjector").InjectMany(self.scnr, payloads, self.Name)
+      for j in range(len(payloads)):
+        payload = payloads[j]
+        req, res = injected[j]
+        self.scnr.RequestTrace("  Injected payload - {0}".format(payload))
+        if res.BodyString.count(added_str) > 0:
+          self.scnr.ResponseTrace("    ==> <i<cr>>Got {0} in the response, this is the result of executing '{1}'. Indicates Code Injection!<i</cr>>".format(added_str, add_str))
+          self.scnr.SetTraceTitle("Echo based Code Injection", 5)
+          self.AddToTriggers(payload, "The payload in this request contains a code snippet which if executed will add the numbers {0} & {1} and print the result. The code snippet is: {2}".format(add_num_1, add_num_2, func_to_execute), added_str, "This response contains the value {0} which is the sum of the numbers {1} & {2} which were sent in the request.".format(add_num_1 + add_num_2, add_num_1, add_num_2), req, res)
+          reason = self.GetErrorReason(payload, func_to_execute, add_num_1, add_num_2)
+          self.reasons.append(reason)
+          return
+        else:
+          self.scnr.ResponseTrace("    ==> Did not get {0} in the response".format(added_str))
   
   def CheckForTimeBasedCodeInjection(self):
     self.scnr.Trace("<i<br>><i<h>>Checking for Time based Code Injection:<i</h>>")
     #set the time related values for time-based code injection check
     self.time = 0
-    max_delay = 0
-    min_delay = -1
-    self.scnr.Trace("<i<br>>Sending three requests to get a baseline of the response time for time based check:")
-    base_line_delays = []
-    avg_delay = 0
-    for i in range(3):
-      res = self.scnr.Inject()
-      avg_delay = avg_delay + res.RoundTrip
-      base_line_delays.append("  {0}) Response time is - {1} ms".format(i+1, res.RoundTrip))
-      if res.RoundTrip > max_delay:
-        max_delay = res.RoundTrip
-      if res.RoundTrip < min_delay or min_delay == -1:
-        min_delay = res.RoundTrip
-    avg_delay = avg_delay / 3
+    #the range of response times that are in line with the moving average, a single slow response in the baseline does not widen it much
+    baseline = AppDomain.CurrentDomain.GetData("ResponseTimeBaseline").GetBaseline(self.scnr)
+    max_delay = baseline.usual_max
+    min_delay = baseline.usual_min
+    avg_delay = int(baseline.average)
     
-    self.scnr.Trace("<i<br>>".join(base_line_delays))
     if min_delay > 5000:
       self.time = ((max_delay + min_delay) / 1000) + 1
     else:
       self.time = ((max_delay + 5000) / 1000) + 1
-    self.scnr.Trace("<i<br>>Maximum Response Time: {0}ms. Minimum Response Time: {1}ms<i<br>>Induced Time Delay will be for {2}ms<i<br>>".format(max_delay, min_delay, self.time * 1000))
+    self.scnr.Trace("<i<br>>Usual Maximum Response Time: {0}ms. Usual Minimum Response Time: {1}ms<i<br>>Induced Time Delay will be for {2}ms<i<br>>".format(max_delay, min_delay, self.time * 1000))
     
     functions = ['sleep(<seconds>);', 'import time;time.sleep(<seconds>);']
     prefixes = ["", "';", '";']
@@ -129,13 +126,17 @@ class CodeInjection(ActivePlugin):
         else:
           self.scnr.ResponseTrace("    ==> Response time was {0}ms. Delay did not reoccur, initial delay could have been due to network issues.".format(res.RoundTrip))
   
-  def AddToTriggers(self, RequestTrigger, RequestTriggerDesc, ResponseTrigger, ResponseTriggerDesc):
+  #TriggerRequest and TriggerResponse default to the scanner's last injection, pass them in for the pairs returned by InjectMany
+  def AddToTriggers(self, RequestTrigger, RequestTriggerDesc, ResponseTrigger, ResponseTriggerDesc, TriggerRequest=None, TriggerResponse=None):
+    if TriggerRequest == None:
+      TriggerRequest = self.scnr.InjectedRequest.GetClone()
+      TriggerResponse = self.scnr.InjectionResponse.GetClone()
     self.RequestTriggers.append(RequestTrigger)
     self.ResponseTriggers.append(ResponseTrigger)
     self.RequestTriggerDescs.append(RequestTriggerDesc)
     self.ResponseTriggerDescs.append(ResponseTriggerDesc)
-    self.TriggerRequests.append(self.scnr.InjectedRequest.GetClone())
-    self.TriggerResponses.append(self.scnr.InjectionResponse.GetClone())
+    self.TriggerRequests.append(TriggerRequest)
+    self.TriggerResponses.append(TriggerResponse)
     self.TriggerCount = self.TriggerCount + 1
   
   def AnalyzeTestResult(self):
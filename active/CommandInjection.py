@@ -8,6 +8,8 @@ import re
 class CommandInjection(ActivePlugin):
   #Check logic based on osCommanding.py of the W3AF project - http://w3af.sourceforge.net/
   seperators = ['', '&&', '|', ';']
+  #The shell gets the value as it reaches the application, so only characters that are stripped or cut off block a payload
+  blocking_char_states = ["Stripped", "Truncated"]
   
   #Override the GetInstance method of the base class to return a new instance with details
   def GetInstance(self):
@@ -29,6 +31,7 @@ class CommandInjection(ActivePlugin):
     self.TriggerResponses = []
     self.TriggerCount = 0
     self.reasons = []
+    self.traits = AppDomain.CurrentDomain.GetData("ParameterTriage").GetTraits(self.scnr)
     self.CheckForCommandInjection()
     self.AnalyzeTestResults()
   
@@ -38,14 +41,17 @@ class CommandInjection(ActivePlugin):
     self.prefixes = [""]
     if len(self.scnr.PreInjectionParameterValue) > 0:
       self.prefixes.append(self.scnr.PreInjectionParameterValue)
+    #separators and backticks that cannot get through the parameter are left out of both checks
+    self.usable_seperators = [seperator for seperator in self.seperators if self.traits.CanSurvive(self.scnr, seperator, self.blocking_char_states)]
+    self.backtick_usable = self.traits.CanSurvive(self.scnr, "`", self.blocking_char_states)
     self.CheckForEchoBasedCommandInjection()
-    self.CheckForTimeBasedCommandInjection()
+    AppDomain.CurrentDomain.GetData("HostConcurrencyController").RunInQuietWindow(self.scnr, self.CheckForTimeBasedCommandInjection)
   
   def CheckForEchoBasedCommandInjection(self):
     
     self.scnr.Trace("<i<br>><i<h>>Checking for Command Injection by Printing File Contents:<i</h>>")
     for prefix in self.prefixes:
-      for seperator in self.seperators:
+      for seperator in self.usable_seperators:
         cmd = "/bin/cat /etc/passwd"
         payload = "{0}{1} {2}".format(prefix, seperator, cmd)
         self.SendAndAnalyzeEchoPayload(payload, "etc/passwd", cmd)
@@ -54,9 +60,10 @@ class CommandInjection(ActivePlugin):
         payload = "{0}{1} {2}".format(prefix, seperator, cmd)
         self.SendAndAnalyzeEchoPayload(payload, "win.ini", cmd)
       
-      cmd = "/bin/cat /etc/passwd"
-      payload = "{0} `{1}`".format(prefix, cmd)
-      self.SendAndAnalyzeEchoPayload(payload, "etc/passwd", cmd)
+      if self.backtick_usable:
+        cmd = "/bin/cat /etc/passwd"
+        payload = "{0} `{1}`".format(prefix, cmd)
+        self.SendAndAnalyzeEchoPayload(payload, "etc/passwd", cmd)
       
       cmd = "run type %SYSTEMROOT%\\win.ini"
       payload = "{0} {1}".format(prefix, cmd)
@@ -66,23 +73,12 @@ class CommandInjection(ActivePlugin):
     self.scnr.Trace("<i<br>><i<h>>Checking for Command Injection by Inducing Time Delay:<i</h>>")
     #set the time related values for time-based command injection check
     self.time = 10
-    max_delay = 0
-    min_delay = -1
-    
-    self.scnr.Trace("<i<br>>Sending three requests to get a baseline of the response time for time based check:")
-    base_line_delays = []
-    self.avg_delay = 0
-    for i in range(3):
-      res = self.scnr.Inject()
-      self.avg_delay = self.avg_delay + res.RoundTrip
-      base_line_delays.append("  {0}) Response time is - {1} ms".format(i+1, res.RoundTrip))
-      if res.RoundTrip > max_delay:
-        max_delay = res.RoundTrip
-      if res.RoundTrip < min_delay or min_delay == -1:
-        min_delay = res.RoundTrip
-    self.avg_delay = self.avg_delay / 3
+    #the range of response times that are in line with the moving average, a single slow response in the baseline does not widen it much
+    baseline = AppDomain.CurrentDomain.GetData("ResponseTimeBaseline").GetBaseline(self.scnr)
+    max_delay = baseline.usual_max
+    min_delay = baseline.usual_min
+    self.avg_delay = int(baseline.average)
     
-    self.scnr.Trace("<i<br>>".join(base_line_delays))
     if min_delay > 5000:
       self.time = ((max_delay + min_delay) / 1000) + 1
     else:
@@ -91,10 +87,10 @@ class CommandInjection(ActivePlugin):
     self.buffer = 3
     self.ping_count = self.time + self.buffer
     
-    self.scnr.Trace("<i<br>>Maximum Response Time - {0}ms. Minimum Response Time - {1}ms.<i<br>>Induced Time Delay will be for {2}ms<i<br>>".format(max_delay, min_delay, self.time * 1000))
+    self.scnr.Trace("<i<br>>Usual Maximum Response Time - {0}ms. Usual Minimum Response Time - {1}ms.<i<br>>Induced Time Delay will be for {2}ms<i<br>>".format(max_delay, min_delay, self.time * 1000))
     
     for prefix in self.prefixes:
-      for seperator in self.seperators:
+      for seperator in self.usable_seperators:
         cmd = "ping -n {0} localhost".format(self.ping_count)
         payload = "{0}{1} {2}".format(prefix, seperator, cmd)
         self.SendAndAnalyzeTimePayload(payload, cmd)
@@ -107,9 +103,10 @@ class CommandInjection(ActivePlugin):
         payload = "{0}{1} {2} ".format(prefix, seperator, cmd)
         self.SendAndAnalyzeTimePayload(payload, cmd)
         
-      cmd = "ping -c {0} localhost".format(self.ping_count)
-      payload = "{0} `{1}`".format(prefix, cmd)
-      self.SendAndAnalyzeTimePayload(payload, cmd)
+      if self.backtick_usable:
+        cmd = "ping -c {0} localhost".format(self.ping_count)
+        payload = "{0} `{1}`".format(prefix, cmd)
+        self.SendAndAnalyzeTimePayload(payload, cmd)
       
       cmd = "run ping -n {0} localhost".format(self.ping_count)
       payload = "{0} {1}".format(prefix, cmd)
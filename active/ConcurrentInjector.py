@@ -0,0 +1,145 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+from IronWASP import *
+from System import *
+from System.Threading import Monitor, Thread, ThreadStart
+import clr
+
+#Sends a batch of independent payloads to the injected parameter at the same time, for the active plugins.
+#This file does not add a plugin, it only creates a single injector and puts it in the AppDomain under the name 'ConcurrentInjector'.
+#Plugins get it with AppDomain.CurrentDomain.GetData("ConcurrentInjector") and call InjectMany with the scanner and their name.
+#
+#The scanner injects one payload at a time, so only the first payload of a batch is injected through it. The others are sent as copies of
+#the request that the scanner made for the first payload with just the value of the parameter changed. Copies are only made when the scanner's
+#request is the base request with the parameter set to the payload, which it is not when a session plugin or a format plugin has changed it,
+#and every copy is checked to be the scanner's request with only that value changed. Payloads that fail these checks are injected through
+#the scanner one after another once the copies are sent.
+#Copies are sent with Request.Send and skip the session handling of the scan. They carry the cookies and tokens of the scanner's request
+#for the first payload, but the session plugin does not update them before a copy is sent or look at its response, so a copy sent after
+#the session has ended gets the logged out response and is not sent again after a login. Set max_workers to 1 to inject every payload
+#through the scanner and its session handling.
+#Payloads that the InjectionCache has a response for are not sent again, and the HostConcurrencyController decides how many of the copies
+#can be in flight to the host at a time. Copies that it has no slot for are also left to the scanner.
+#An error sending a copy is raised on the scanner's thread after the other threads are done.
+class ConcurrentInjector:
+
+  #Most number of threads that send the copies of one batch
+  max_workers = 8
+  #Sections where the parameter is a single name-value pair that can be set on a copy of the request
+  copy_sections = ["Query", "Body", "Cookie", "Headers"]
+
+  #Injects a list of independent payloads and returns a [request, response] pair for each payload, in the same order as the payloads
+  def InjectMany(self, scnr, payloads, plugin_name):
+    results = [None] * len(payloads)
+    cache = AppDomain.CurrentDomain.GetData("InjectionCache")
+    to_send = []
+    sending = {}
+    for i in range(len(payloads)):
+      if sending.has_key(payloads[i]):
+        continue
+      results[i] = cache.Get(scnr, payloads[i], False, plugin_name)
+      if results[i] == None:
+        to_send.append(i)
+        sending[payloads[i]] = i
+    sent = self.InjectManyUncached(scnr, [payloads[i] for i in to_send])
+    for i in range(len(to_send)):
+      results[to_send[i]] = sent[i]
+      cache.Put(scnr, payloads[to_send[i]], False, sent[i][0], sent[i][1])
+    #a payload that is in the batch more than once is sent once, the others are served from the cache like a payload of an earlier batch
+    for i in range(len(payloads)):
+      if results[i] == None:
+        results[i] = cache.Get(scnr, payloads[i], False, plugin_name)
+        if results[i] == None:
+          results[i] = results[sending[payloads[i]]]
+    return results
+
+  def InjectManyUncached(self, scnr, payloads):
+    results = [None] * len(payloads)
+    if len(payloads) == 0:
+      return results
+    res = scnr.Inject(payloads[0])
+    results[0] = [scnr.InjectedRequest.GetClone(), res]
+    reqs = {}
+    if len(payloads) > 1 and self.max_workers > 1 and self.IsPlainInjection(scnr, results[0][0], payloads[0]):
+      for i in range(1, len(payloads)):
+        req = self.GetCopy(scnr, results[0][0], payloads[0], payloads[i])
+        if req != None:
+          reqs[i] = req
+    if len(reqs) > 0:
+      self.SendMany(reqs, results)
+    for i in range(1, len(payloads)):
+      if results[i] == None:
+        res = scnr.Inject(payloads[i])
+        results[i] = [scnr.InjectedRequest.GetClone(), res]
+    return results
+
+  #True if the request the scanner injected is the base request with the parameter set to the payload and nothing else changed
+  def IsPlainInjection(self, scnr, injected_req, payload):
+    if not scnr.InjectedSection in self.copy_sections:
+      return False
+    req = scnr.BaseRequest.GetClone()
+    params = getattr(req, scnr.InjectedSection)
+    if len(params.GetAll(scnr.InjectedParameter)) != 1:
+      return False
+    params.Set(scnr.InjectedParameter, payload)
+    return req.ToString() == injected_req.ToString()
+
+  #Returns a copy of the scanner's request with the parameter set to the payload, or None if the copy is anything more than that:
+  #the payload must read back unchanged and setting the scanner's payload back must give the scanner's request
+  def GetCopy(self, scnr, injected_req, injected_payload, payload):
+    req = injected_req.GetClone()
+    params = getattr(req, scnr.InjectedSection)
+    params.Set(scnr.InjectedParameter, payload)
+    if params.Get(scnr.InjectedParameter) != payload:
+      return None
+    check = req.GetClone()
+    getattr(check, scnr.InjectedSection).Set(scnr.InjectedParameter, injected_payload)
+    if check.ToString() != injected_req.ToString():
+      return None
+    req.Source = RequestSource.Scan
+    return req
+
+  #Sends the requests, a map of payload index to request, on a bounded number of threads in the order of the indexes and puts
+  #the [request, response] pairs in results. A thread stops when the HostConcurrencyController has no slot for it, so the requests
+  #it did not send are left out of results. The requests are sent as they are, without the session handling of the scan.
+  def SendMany(self, reqs, results):
+    pending = sorted(reqs.keys())
+    errors = []
+    controller = AppDomain.CurrentDomain.GetData("HostConcurrencyController")
+    workers = []
+    for w in range(min(self.max_workers, len(pending))):
+      t = Thread(ThreadStart(lambda: self.SendPending(reqs, results, pending, errors, controller)))
+      t.Start()
+      workers.append(t)
+    for t in workers:
+      t.Join()
+    if len(errors) > 0:
+      raise errors[0]
+
+  def SendPending(self, reqs, results, pending, errors, controller):
+    while True:
+      Monitor.Enter(pending)
+      try:
+        if len(pending) == 0 or len(errors) > 0:
+          return
+        i = pending.pop(0)
+      finally:
+        Monitor.Exit(pending)
+      req = reqs[i]
+      started = controller.Acquire(req.Host)
+      if started == None:
+        return
+      res = None
+      try:
+        res = req.Send()
+        results[i] = [req, res]
+      except Exception as e:
+        Monitor.Enter(pending)
+        try:
+          errors.append(e)
+        finally:
+          Monitor.Exit(pending)
+      controller.Release(req.Host, started, res)
+
+
+AppDomain.CurrentDomain.SetData("ConcurrentInjector", ConcurrentInjector())
@@ -5,7 +5,12 @@ from System import *
 import clr
 
 class CrossSiteScripting(ActivePlugin):
-    
+  
+  #Traits the parameter must have for the reflection context checks, see ParameterTriage
+  required_traits = ["Reflected"]
+  #Payloads are only useful if they are reflected as they were sent, so characters that are encoded, stripped or cut off block them
+  blocking_char_states = ["Encoded", "Stripped", "Truncated"]
+  
   def GetInstance(self):
     p = CrossSiteScripting()
     p.Name = "Cross-site Scripting"
@@ -24,6 +29,15 @@ class CrossSiteScripting(ActivePlugin):
     self.ResponseTriggerDescs = []
     self.TriggerRequests = []
     self.TriggerResponses = []
+    self.traits = AppDomain.CurrentDomain.GetData("ParameterTriage").GetTraits(self.Scnr)
+    
+    #The charset checks do not need the value to be reflected, so they are done for every parameter
+    self.CheckCharsetSecurity()
+    
+    missing_traits = self.traits.GetMissing(self.required_traits)
+    if len(missing_traits) > 0:
+      self.Scnr.Trace("<i<br>><i<b>>Skipping the reflection context checks, parameter triage shows that this parameter is not {0}<i</b>>".format(" or ".join(missing_traits)))
+      return
     #Send a Random string for analysing injection nature
     #ps = self.GetProbeString()
     self.ps = Analyzer.GetProbeString()
@@ -51,7 +65,6 @@ class CrossSiteScripting(ActivePlugin):
       ps_contexts_string = "<i<cr>>{0}<i</cr>>".format(",".join(self.ps_contexts))
     self.Scnr.ResponseTrace(" ==> Reflection contexts - {0}{1}".format(ps_contexts_string, res_details))
     
-    self.CheckCharsetSecurity()
     self.CheckForCrossSiteCookieSetting()
     
     #Do Context specific checks
@@ -212,6 +225,8 @@ class CrossSiteScripting(ActivePlugin):
           if payload_inj_success:
             break
           payload = "{0}{1}{2}{3}".format(payload_prefix, binder, keyword, padding)
+          if not self.traits.CanSurvive(self.Scnr, payload, self.blocking_char_states):
+            continue
           self.Scnr.RequestTrace("  Injected {0} - ".format(payload))
           res = self.Scnr.Inject(payload)
           if self.IsExpressionStatement(res, keyword):
@@ -237,6 +252,8 @@ class CrossSiteScripting(ActivePlugin):
       keyword = "dzpyqmw"
       for pp in payload_prefixes:
         payload = "{0}{1}".format(pp, keyword)
+        if not self.traits.CanSurvive(self.Scnr, payload, self.blocking_char_states):
+          continue
         self.Scnr.RequestTrace("  Injected {0} - ".format(payload))
         res = self.Scnr.Inject(payload)
         if self.IsNormalString(res, keyword):
@@ -754,7 +771,7 @@ class CrossSiteScripting(ActivePlugin):
     if payload.count("{") > 0 or payload.count("}") > 0:
       if InStyleAttribute:
         return False
-    return True
+    return self.traits.CanSurvive(self.Scnr, payload, self.blocking_char_states)
   
   def InjectAndCheckCss(self, payload, keyword, url_or_js):
     self.Scnr.RequestTrace("Injecting {0} - ".format(payload))
@@ -8,6 +8,11 @@ import clr
 class HeaderInjection(ActivePlugin):
   
   crlf_inj_str = ["\r\nNeww: Headerr", "aa\r\nNeww: Headerr", "\r\nNeww: Headerr\r\n", "aa\r\nNeww: Headerr\r\n"]
+  #Traits the parameter must have for this plugin to check it, see ParameterTriage
+  required_traits = ["ReflectedInHeaders"]
+  #A header is only injected if the line feed comes back in the response as it was sent. A cut off value is not taken to block it,
+  #as a response that was split by the probe can look like one.
+  blocking_char_states = ["Encoded", "Stripped"]
   
   def GetInstance(self):
     p = HeaderInjection()
@@ -20,12 +25,20 @@ class HeaderInjection(ActivePlugin):
   def Check(self, scnr):
     self.scnr = scnr
     self.reason = ""
+    self.traits = AppDomain.CurrentDomain.GetData("ParameterTriage").GetTraits(self.scnr)
+    missing_traits = self.traits.GetMissing(self.required_traits)
+    if len(missing_traits) > 0:
+      self.scnr.Trace("<i<br>><i<b>>Skipping {0} checks, parameter triage shows that this parameter is not {1}<i</b>>".format(self.Name, " or ".join(missing_traits)))
+      return
     self.CheckForCRLFInjection()
   
   def CheckForCRLFInjection(self):
     self.scnr.Trace("<i<br>><i<h>>Checking for Header Injection:<i</h>>")
     self.scnr.Trace("<i<br>><i<b>>  Trying to inject a header named 'Neww'<i</b>>")
     crlf_inj_found = False
+    #every payload ends its line with CR LF, a bare LF is enough for many servers so a CR that cannot get through does not block them
+    if not self.traits.CanSurvive(self.scnr, "\n", self.blocking_char_states):
+      return
     prefix = ["", self.scnr.PreInjectionParameterValue]
     for cis in self.crlf_inj_str:
       if crlf_inj_found:
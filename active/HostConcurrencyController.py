@@ -0,0 +1,159 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+from IronWASP import *
+from System import *
+from System.Threading import Monitor, Thread
+import clr
+
+#Decides how many injections the active plugins can have in flight to a host at the same time.
+#This file does not add a plugin, it only creates a single controller and stores it in the AppDomain under the name 'HostConcurrencyController'.
+#The ConcurrentInjector and the time based checks of the plugins get it with AppDomain.CurrentDomain.GetData("HostConcurrencyController").
+#
+#The limit of each host is increased additively, by one for every 'limit' number of healthy responses, and is halved when the host shows strain:
+#a response time well above the usual response time of the host, a 5xx or 429 status code or a request that failed or timed out.
+#Time based checks run in a quiet window, during which no concurrent injections are sent to that host so that the response times they measure are not skewed.
+#An injection that cannot get a slot, because the host is at its limit for too long or another thread has a quiet window on it, is not sent
+#concurrently at all and is left to be injected through the scanner.
+#Only the copies that the ConcurrentInjector sends take slots, so only they are held back by a quiet window. Injections that scanners on
+#other threads make themselves with Inject are not counted or held back, and a time based check can still be skewed by another scan
+#of the same host that runs at the same time.
+class HostConcurrencyController:
+
+  initial_limit = 2.0
+  min_limit = 1.0
+  max_limit = 16.0
+  #A response is taken to be slowed down if it takes rtt_growth_factor times the usual response time and is also rtt_min_growth ms slower than it
+  rtt_growth_factor = 2.0
+  rtt_min_growth = 250
+  #Weight of the latest response time in the moving average of the usual response time
+  rtt_weight = 0.2
+  #Longest time in ms that Acquire waits for a free slot before giving up
+  max_acquire_wait = 5000
+  #Longest time in ms that BeginQuietWindow waits for the injections in flight before going ahead without a window, so that a stuck check cannot stall the scan
+  max_quiet_wait = 60000
+
+  def __init__(self):
+    self.lock = Object()
+    self.hosts = {}
+
+  #Waits up to max_acquire_wait for a free slot on the host and returns the start time that must be passed to Release.
+  #Returns None without taking a slot if there is still no free slot or another thread has a quiet window on the host.
+  def Acquire(self, host):
+    Monitor.Enter(self.lock)
+    try:
+      h = self.GetHostState(host)
+      deadline = DateTime.Now.AddMilliseconds(self.max_acquire_wait)
+      while h.in_flight >= int(h.limit) and not self.IsQuietForOthers(h) and DateTime.Now < deadline:
+        Monitor.Wait(self.lock, 1000)
+      if h.in_flight >= int(h.limit) or self.IsQuietForOthers(h):
+        return None
+      h.in_flight = h.in_flight + 1
+      return DateTime.Now
+    finally:
+      Monitor.Exit(self.lock)
+
+  #Frees the slot taken by Acquire and adjusts the limit of the host. res is None if the request failed or timed out.
+  def Release(self, host, started, res):
+    Monitor.Enter(self.lock)
+    try:
+      h = self.GetHostState(host)
+      h.in_flight = h.in_flight - 1
+      if self.IsStrained(h, res):
+        #all requests in flight when the limit was last cut saw the same strain, so they only count once
+        if started > h.last_decrease:
+          h.limit = max(self.min_limit, h.limit / 2)
+          h.last_decrease = DateTime.Now
+          h.decreases = h.decreases + 1
+      else:
+        h.limit = min(self.max_limit, h.limit + 1.0 / h.limit)
+      Monitor.PulseAll(self.lock)
+    finally:
+      Monitor.Exit(self.lock)
+
+  #Waits till all concurrent injections to the host are done and then holds back new ones till EndQuietWindow is called from the same thread.
+  #Returns False if the window could not be had within max_quiet_wait, because another thread still has a window or injections are still
+  #in flight, in that case EndQuietWindow must not be called.
+  def BeginQuietWindow(self, host):
+    thread_id = Thread.CurrentThread.ManagedThreadId
+    Monitor.Enter(self.lock)
+    try:
+      h = self.GetHostState(host)
+      deadline = DateTime.Now.AddMilliseconds(self.max_quiet_wait)
+      while (self.IsQuietForOthers(h) or h.in_flight > 0) and DateTime.Now < deadline:
+        Monitor.Wait(self.lock, 1000)
+      if self.IsQuietForOthers(h) or h.in_flight > 0:
+        return False
+      h.quiet_owner = thread_id
+      h.quiet_depth = h.quiet_depth + 1
+      return True
+    finally:
+      Monitor.Exit(self.lock)
+
+  def EndQuietWindow(self, host):
+    Monitor.Enter(self.lock)
+    try:
+      h = self.GetHostState(host)
+      if h.quiet_owner == Thread.CurrentThread.ManagedThreadId:
+        h.quiet_depth = h.quiet_depth - 1
+        if h.quiet_depth == 0:
+          h.quiet_owner = -1
+        Monitor.PulseAll(self.lock)
+    finally:
+      Monitor.Exit(self.lock)
+
+  #Calls the function, a time based check of the scanner's plugin, in a quiet window on the scanner's host and returns what it returns.
+  #The check still runs if no window could be had.
+  def RunInQuietWindow(self, scnr, check):
+    host = scnr.BaseRequest.Host
+    quiet = self.BeginQuietWindow(host)
+    try:
+      return check()
+    finally:
+      if quiet:
+        self.EndQuietWindow(host)
+
+  #Returns the current limit of the host, for use in traces
+  def GetLimit(self, host):
+    Monitor.Enter(self.lock)
+    try:
+      return int(self.GetHostState(host).limit)
+    finally:
+      Monitor.Exit(self.lock)
+
+  def GetHostState(self, host):
+    host = host.lower()
+    if not self.hosts.has_key(host):
+      self.hosts[host] = HostState(self.initial_limit)
+    return self.hosts[host]
+
+  def IsQuietForOthers(self, h):
+    return h.quiet_owner != -1 and h.quiet_owner != Thread.CurrentThread.ManagedThreadId
+
+  def IsStrained(self, h, res):
+    if res == None:
+      return True
+    if res.Code >= 500 or res.Code == 429:
+      return True
+    if h.usual_rtt < 0:
+      h.usual_rtt = float(res.RoundTrip)
+      return False
+    slowed = res.RoundTrip > h.usual_rtt * self.rtt_growth_factor and res.RoundTrip - h.usual_rtt > self.rtt_min_growth
+    #slow responses are kept out of the average, unless the limit cannot go any lower and this is simply how fast the host is now
+    if not slowed or h.limit <= self.min_limit:
+      h.usual_rtt = (1 - self.rtt_weight) * h.usual_rtt + self.rtt_weight * res.RoundTrip
+    return slowed
+
+
+class HostState:
+
+  def __init__(self, limit):
+    self.limit = limit
+    self.in_flight = 0
+    self.usual_rtt = -1.0
+    self.last_decrease = DateTime.MinValue
+    self.decreases = 0
+    self.quiet_owner = -1
+    self.quiet_depth = 0
+
+
+AppDomain.CurrentDomain.SetData("HostConcurrencyController", HostConcurrencyController())
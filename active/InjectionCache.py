@@ -0,0 +1,104 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+from IronWASP import *
+from System import *
+from System.Threading import Monitor
+import clr
+from collections import OrderedDict
+
+#Keeps the responses of injections so that a payload that was already sent to the same parameter in the same scan is not sent again.
+#This file does not add a plugin, it only creates a single cache and puts it in the AppDomain under the name 'InjectionCache'.
+#Plugins get it with AppDomain.CurrentDomain.GetData("InjectionCache") and inject through its Inject method, the ConcurrentInjector also uses it.
+#
+#Entries are keyed on the ID of the scan, the injected section, parameter and url path position, whether the payload was raw injected and the payload.
+#A scan is of a single request, so a response is only served again within the scan that got it. Scanning the request again is a new scan
+#and sends every payload again, so the responses are never older than the scan that uses them.
+#The payloads of different plugins do not overlap, so the hits come from a plugin that has the same payload more than once in a scan, like
+#the known file payloads of LocalFileInclude when the extension of the parameter's value is also in its file_ext list.
+#The least recently used entries are dropped when there are more than max_entries or their response bodies take more than max_body_bytes.
+#Checks that measure response times must not go through the cache, they call Scnr.Inject directly.
+class InjectionCache:
+
+  max_entries = 1000
+  max_body_bytes = 32 * 1024 * 1024
+  #Number of the most recent scan and plugin pairs whose hits and misses are kept, see TraceHitRatio
+  max_stats = 500
+
+  def __init__(self):
+    self.lock = Object()
+    self.entries = OrderedDict()
+    self.body_bytes = 0
+    #scan ID|plugin name -> [hits, misses]
+    self.scan_stats = OrderedDict()
+
+  #Injects the payload unless the cache already has its response. Returns the injected request and the response.
+  def Inject(self, scnr, payload, raw, plugin_name):
+    result = self.Get(scnr, payload, raw, plugin_name)
+    if result == None:
+      if raw:
+        res = scnr.RawInject(payload)
+      else:
+        res = scnr.Inject(payload)
+      result = [scnr.InjectedRequest.GetClone(), res]
+      self.Put(scnr, payload, raw, result[0], res)
+    return result
+
+  #Returns the cached [request, response] of this injection or None, and counts it as a hit or a miss for the plugin in this scan
+  def Get(self, scnr, payload, raw, plugin_name):
+    key = self.GetKey(scnr, payload, raw)
+    Monitor.Enter(self.lock)
+    try:
+      stats = self.GetScanStats(scnr, plugin_name)
+      if self.entries.has_key(key):
+        result = self.entries.pop(key)
+        self.entries[key] = result
+        stats[0] = stats[0] + 1
+        return result
+      stats[1] = stats[1] + 1
+      return None
+    finally:
+      Monitor.Exit(self.lock)
+
+  def Put(self, scnr, payload, raw, req, res):
+    key = self.GetKey(scnr, payload, raw)
+    Monitor.Enter(self.lock)
+    try:
+      if self.entries.has_key(key):
+        self.body_bytes = self.body_bytes - self.entries.pop(key)[1].BodyLength
+      self.entries[key] = [req, res]
+      self.body_bytes = self.body_bytes + res.BodyLength
+      while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.body_bytes > self.max_body_bytes):
+        old_key, old_result = self.entries.popitem(False)
+        self.body_bytes = self.body_bytes - old_result[1].BodyLength
+    finally:
+      Monitor.Exit(self.lock)
+
+  #Writes the number of injections of this plugin that were served from the cache in this scan to the scan trace
+  def TraceHitRatio(self, scnr, plugin_name):
+    Monitor.Enter(self.lock)
+    try:
+      hits, misses = self.GetScanStats(scnr, plugin_name)
+    finally:
+      Monitor.Exit(self.lock)
+    ratio = 0
+    if hits + misses > 0:
+      ratio = (hits * 100) / (hits + misses)
+    scnr.Trace("<i<br>>Injection cache - {0} of {1} cacheable injection[s] made by {2} so far in this scan were served from the cache ({3}%).".format(hits, hits + misses, plugin_name, ratio))
+
+  def GetKey(self, scnr, payload, raw):
+    return "{0}|{1}|{2}|{3}|{4}|{5}".format(scnr.ID, scnr.InjectedSection, scnr.InjectedParameter, scnr.InjectedUrlPathPosition, raw, payload)
+
+  #Returns the [hits, misses] of the plugin in the scanner's scan, must be called with the lock held
+  def GetScanStats(self, scnr, plugin_name):
+    key = "{0}|{1}".format(scnr.ID, plugin_name)
+    if self.scan_stats.has_key(key):
+      stats = self.scan_stats.pop(key)
+    else:
+      stats = [0, 0]
+    self.scan_stats[key] = stats
+    while len(self.scan_stats) > self.max_stats:
+      self.scan_stats.popitem(False)
+    return stats
+
+
+AppDomain.CurrentDomain.SetData("InjectionCache", InjectionCache())
@@ -21,12 +21,13 @@ class LDAPInjection(ActivePlugin):
     self.scnr = scnr
     self.reason = ""
     self.CheckForLDAPInjection()
+    AppDomain.CurrentDomain.GetData("InjectionCache").TraceHitRatio(self.scnr, self.Name)
   
   def CheckForLDAPInjection(self):
     self.scnr.Trace("<i<br>><i<h>>Checking for LDAP Injection:<i</h>>")
     payload = "#^($!@$)(()))******"
     self.scnr.RequestTrace("  Injected payload - {0}".format(payload))
-    res = self.scnr.Inject(payload)
+    req, res = AppDomain.CurrentDomain.GetData("InjectionCache").Inject(self.scnr, payload, False, self.Name)
     errors_found = []
     for error in self.error_strings:
       if res.BodyString.count(error) > 0:
@@ -34,17 +35,17 @@ class LDAPInjection(ActivePlugin):
     if len(errors_found) > 0:
       self.scnr.ResponseTrace("  ==> <i<cr>>LDAP Injection Found.<i<br>>Errors:<i<br>>{0}<i</cr>>".format("<i<br>>".join(errors_found)))
       self.reason = self.GetReason(payload, errors_found)
-      self.ReportLDAPInjection(payload, "The payload in this request is meant to trigger LDAP errors. The payload is: {0}".format(payload), "\r\n".join(errors_found), "This response contains LDAP error messages due to the error triggered by the payload")
+      self.ReportLDAPInjection(payload, "The payload in this request is meant to trigger LDAP errors. The payload is: {0}".format(payload), "\r\n".join(errors_found), "This response contains LDAP error messages due to the error triggered by the payload", req, res)
     else:
       self.scnr.ResponseTrace("  ==> No Errors Found")
   
-  def ReportLDAPInjection(self, req_trigger, req_trigger_desc, res_trigger, res_trigger_desc):
+  def ReportLDAPInjection(self, req_trigger, req_trigger_desc, res_trigger, res_trigger_desc, trigger_req, trigger_res):
     self.scnr.SetTraceTitle("LDAP Injection Found", 10)
-    pr = Finding(self.scnr.InjectedRequest.BaseUrl)
+    pr = Finding(trigger_req.BaseUrl)
     pr.Title = "LDAP Injection Found"
     pr.Summary = "LDAP Injection has been detected in the '{0}' parameter of the {1} section of the request.<i<br>><i<br>>{2}".format(self.scnr.InjectedParameter, self.scnr.InjectedSection, self.GetSummary())
     pr.AddReason(self.reason)
-    pr.Triggers.Add(req_trigger, req_trigger_desc, self.scnr.InjectedRequest, res_trigger, res_trigger_desc, self.scnr.InjectionResponse)
+    pr.Triggers.Add(req_trigger, req_trigger_desc, trigger_req, res_trigger, res_trigger_desc, trigger_res)
     pr.Type = FindingType.Vulnerability
     pr.Severity = FindingSeverity.High
     pr.Confidence = FindingConfidence.High
@@ -33,6 +33,7 @@ class LocalFileInclude(ActivePlugin):
     self.reasons = []
     self.TriggerCount = 0
     self.slash_prefix = ""
+    self.traits = AppDomain.CurrentDomain.GetData("ParameterTriage").GetTraits(self.scnr)
     self.CheckForLocalFileInclude()
   
   def CheckForLocalFileInclude(self):
@@ -40,13 +41,14 @@ class LocalFileInclude(ActivePlugin):
     self.slash_prefix = self.GetPrefix()
     self.CheckForLocalFileIncludeWithKnownFiles()
     self.CheckForLocalFileIncludeWithDownwardTraversal()
+    AppDomain.CurrentDomain.GetData("InjectionCache").TraceHitRatio(self.scnr, self.Name)
     self.AnalyzeTestResult()
     
   def GetPrefix(self):
     #Prefix detection logic is inspired by the WAVSEP LFI test cases
     self.scnr.Trace("<i<br>><i<b>>Identifying the prefix to use in payloads:<i</b>>")
     self.scnr.RequestTrace("  Injected paylaod - aaa")
-    prefix_base_res = self.scnr.Inject("aaa")
+    prefix_base_res = AppDomain.CurrentDomain.GetData("InjectionCache").Inject(self.scnr, "aaa", False, self.Name)[1]
     self.scnr.ResponseTrace("    ==> This response will be used as baseline for prefix detection")
     
     prefix = ""
@@ -84,6 +86,8 @@ class LocalFileInclude(ActivePlugin):
     
     self.scnr.Trace("<i<br>><i<h>>Checking for Local File Include with Known Files:<i</h>>")
 
+    payloads = []
+    payload_files = []
     for f in self.files.keys():
       for nt in self.null_terminator:
         for fe in file_exts:
@@ -103,27 +107,38 @@ class LocalFileInclude(ActivePlugin):
           
           if len(fe) > 0:
             payload = "{0}.{1}".format(payload, fe)
-          self.scnr.RequestTrace("  Injected payload - {0}".format(payload))
-          res = self.scnr.Inject(payload)
-          downloaded_file_info = self.GetDownloadedFileInfo(res, f)
-          if len(downloaded_file_info) > 0:
-            self.scnr.ResponseTrace("    ==> <i<cr>>Response contains contens of {0}<i</cr>>".format(f))
-            if self.slash_prefix == "file:":
-              self.AddToTriggers(payload, "The payload in this request refers to the {0} file by using the file: protocol. The payload is {1}".format(f, payload), downloaded_file_info, "This response contains contents of the {0} file. This was caused by the payload".format(f))
-            else:
-              self.AddToTriggers(payload, "The payload in this request refers to the {0} file by traversing upwards in the directory structure. The payload is {1}".format(f, payload), downloaded_file_info, "This response contains contents of the {0} file. This was caused by the payload".format(f))
-            self.SetConfidence(3)
-            slash = ""
-            if self.files[f] == "nix":
-              slash = "/"
-            else:
-              slash = "\\"
-            reason = self.GetEchoReason(payload, f, downloaded_file_info, slash, self.TriggerCount, self.slash_prefix)
-            self.reasons.append(reason)
-          else:
-            self.scnr.ResponseTrace("    ==> No trace of {0}".format(f))
+          payloads.append(payload)
+          payload_files.append(f)
+    
+    injected = AppDomain.CurrentDomain.GetData("ConcurrentInjector").InjectMany(self.scnr, payloads, self.Name)
+    for i in range(len(payloads)):
+      payload = payloads[i]
+      f = payload_files[i]
+      req, res = injected[i]
+      self.scnr.RequestTrace("  Injected payload - {0}".format(payload))
+      downloaded_file_info = self.GetDownloadedFileInfo(res, f)
+      if len(downloaded_file_info) > 0:
+        self.scnr.ResponseTrace("    ==> <i<cr>>Response contains contens of {0}<i</cr>>".format(f))
+        if self.slash_prefix == "file:":
+          self.AddToTriggers(payload, "The payload in this request refers to the {0} file by using the file: protocol. The payload is {1}".format(f, payload), downloaded_file_info, "This response contains contents of the {0} file. This was caused by the payload".format(f), req, res)
+        else:
+          self.AddToTriggers(payload, "The payload in this request refers to the {0} file by traversing upwards in the directory structure. The payload is {1}".format(f, payload), downloaded_file_info, "This response contains contents of the {0} file. This was caused by the payload".format(f), req, res)
+        self.SetConfidence(3)
+        slash = ""
+        if self.files[f] == "nix":
+          slash = "/"
+        else:
+          slash = "\\"
+        reason = self.GetEchoReason(payload, f, downloaded_file_info, slash, self.TriggerCount, self.slash_prefix)
+        self.reasons.append(reason)
+      else:
+        self.scnr.ResponseTrace("    ==> No trace of {0}".format(f))
     
   def CheckForLocalFileIncludeWithDownwardTraversal(self):
+    #this check compares responses to different values, it cannot succeed if the value does not affect the response
+    if not self.traits.Has("Sensitive"):
+      self.scnr.Trace("<i<br>><i<b>>Parameter triage shows that the value of this parameter does not affect the response, skipping the Downward Directory Traversal check.<i</b>>")
+      return
     slashes = ["/", "\\"]
     for slash in slashes:
       self.CheckForLocalFileIncludeWithDownwardTraversalWithSlash(slash)
@@ -136,31 +151,21 @@ class LocalFileInclude(ActivePlugin):
     
     payload_a = "aa<s>..<s>{0}".format(self.scnr.PreInjectionParameterValue)
     payload_a = payload_a.replace("<s>", slash)
-    self.scnr.RequestTrace("  Injected payload - {0}".format(payload_a))
-    res_a = self.scnr.Inject(payload_a)
-    req_a = self.scnr.InjectedRequest
-    self.scnr.ResponseTrace("    ==> Got Response. Code- {0}. Length- {1}".format(res_a.Code, res_a.BodyLength))
-    
     payload_a1 = "aa..<s>{0}".format(self.scnr.PreInjectionParameterValue)
     payload_a1 = payload_a1.replace("<s>", slash)
-    self.scnr.RequestTrace("  Injected payload - {0}".format(payload_a1))
-    res_a1 = self.scnr.Inject(payload_a1)
-    req_a1 = self.scnr.InjectedRequest
-    self.scnr.ResponseTrace("    ==> Got Response. Code- {0}. Length- {1}".format(res_a1.Code, res_a1.BodyLength))
-    
     payload_b = "bb<s>..<s>{0}".format(self.scnr.PreInjectionParameterValue)
     payload_b = payload_b.replace("<s>", slash)
-    self.scnr.RequestTrace("  Injected payload - {0}".format(payload_b))
-    res_b = self.scnr.Inject(payload_b)
-    req_b = self.scnr.InjectedRequest
-    self.scnr.ResponseTrace("    ==> Got Response. Code- {0}. Length- {1}".format(res_b.Code, res_b.BodyLength))
-    
     payload_b1 = "bb..<s>{0}".format(self.scnr.PreInjectionParameterValue)
     payload_b1 = payload_b1.replace("<s>", slash)
-    self.scnr.RequestTrace("  Injected payload - {0}".format(payload_b1))
-    res_b1 = self.scnr.Inject(payload_b1)
-    req_b1 = self.scnr.InjectedRequest
-    self.scnr.ResponseTrace("    ==> Got Response. Code- {0}. Length- {1}".format(res_b1.Code, res_b1.BodyLength))
+    
+    injected = AppDomain.CurrentDomain.GetData("ConcurrentInjector").InjectMany(self.scnr, [payload_a, payload_a1, payload_b, payload_b1], self.Name)
+    req_a, res_a = injected[0]
+    req_a1, res_a1 = injected[1]
+    req_b, res_b = injected[2]
+    req_b1, res_b1 = injected[3]
+    for payload, res in [[payload_a, res_a], [payload_a1, res_a1], [payload_b, res_b], [payload_b1, res_b1]]:
+      self.scnr.RequestTrace("  Injected payload - {0}".format(payload))
+      self.scnr.ResponseTrace("    ==> Got Response. Code- {0}. Length- {1}".format(res.Code, res.BodyLength))
     
     self.scnr.Trace("<i<br>>Analysing the responses for patterns...")
     
@@ -272,13 +277,17 @@ class LocalFileInclude(ActivePlugin):
     if len(self.RequestTriggers) > 0:
       self.ReportLocalFileInclude()
   
-  def AddToTriggers(self, RequestTrigger, RequestTriggerDesc, ResponseTrigger, ResponseTriggerDesc):
+  #TriggerRequest and TriggerResponse default to the scanner's last injection, pass them in for the pairs returned by InjectMany
+  def AddToTriggers(self, RequestTrigger, RequestTriggerDesc, ResponseTrigger, ResponseTriggerDesc, TriggerRequest=None, TriggerResponse=None):
+    if TriggerRequest == None:
+      TriggerRequest = self.scnr.InjectedRequest.GetClone()
+      TriggerResponse = self.scnr.InjectionResponse.GetClone()
     self.RequestTriggers.append(RequestTrigger)
     self.ResponseTriggers.append(ResponseTrigger)
     self.RequestTriggerDescs.append(RequestTriggerDesc)
     self.ResponseTriggerDescs.append(ResponseTriggerDesc)
-    self.TriggerRequests.append(self.scnr.InjectedRequest.GetClone())
-    self.TriggerResponses.append(self.scnr.InjectionResponse.GetClone())
+    self.TriggerRequests.append(TriggerRequest)
+    self.TriggerResponses.append(TriggerResponse)
     self.TriggerCount = self.TriggerCount + 1
   
   def ReportLocalFileInclude(self):
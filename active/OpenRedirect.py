@@ -11,6 +11,8 @@ class OpenRedirect(ActivePlugin):
   basic_redirect_urls = ["http://<host>", "https://<host>", "//<host>", "<host>", "5;URL='http://<host>'"]
   #taken from http://kotowicz.net/absolute/
   full_redirect_urls = [ "http://<host>", "https://<host>", "//<host>", "http:\\\\<host>", "https:\\\\<host>", "\\\\<host>", "/\\<host>", "\\/<host>", "\r//<host>", "/ /<host>", "http:<host>", "https:<host>", "http:/<host>", "https:/<host>", "http:////<host>", "https:////<host>", "://<host>", ".:.<host>", "<host>", "5;URL='http://<host>'"]
+  #Traits the parameter must have for this plugin to check it, see ParameterTriage
+  required_traits = ["Reflected"]
   
   def GetInstance(self):
     p = OpenRedirect()
@@ -24,7 +26,13 @@ class OpenRedirect(ActivePlugin):
     self.scnr = scnr
     self.base_req = self.scnr.BaseRequest
     self.reason = ""
+    self.traits = AppDomain.CurrentDomain.GetData("ParameterTriage").GetTraits(self.scnr)
+    missing_traits = self.traits.GetMissing(self.required_traits)
+    if len(missing_traits) > 0:
+      self.scnr.Trace("<i<br>><i<b>>Skipping {0} checks, parameter triage shows that this parameter is not {1}<i</b>>".format(self.Name, " or ".join(missing_traits)))
+      return
     self.CheckForOpenRedirection()
+    AppDomain.CurrentDomain.GetData("InjectionCache").TraceHitRatio(self.scnr, self.Name)
   
   def CheckForOpenRedirection(self):
     self.scnr.Trace("<i<br>><i<h>>Checking for Open Redirect:<i</h>>")
@@ -32,7 +40,7 @@ class OpenRedirect(ActivePlugin):
     uniq_str = "eziepwlivt"
     self.scnr.Trace("<i<br>><i<h>>Checking if In-Domain Redirect Happens:<i</h>>")
     self.scnr.RequestTrace("  Injected payload - {0}".format(uniq_str))
-    res = self.scnr.Inject(uniq_str)
+    res = AppDomain.CurrentDomain.GetData("InjectionCache").Inject(self.scnr, uniq_str, False, self.Name)[1]
     if self.IsRedirectedTo(uniq_str, res, False):
       self.scnr.ResponseTrace("    ==> <i<b>>In-domain redirect happens. Using full payload set!<i</b>>")
       self.scnr.SetTraceTitle("In-domain redirect happens", 5)
@@ -49,6 +57,8 @@ class OpenRedirect(ActivePlugin):
     except:
       pass
     self.scnr.Trace("<i<br>><i<h>>Checking if Out-of-Domain Redirect Happens:<i</h>>")
+    payloads = []
+    payload_hosts = []
     for url in urls:
       for i in range(2):
         h = ""
@@ -56,24 +66,30 @@ class OpenRedirect(ActivePlugin):
           h = "example.org"
         else:
           h = "{0}.example.org".format(host)
-        payload = url.replace("<host>", h)
-        self.scnr.RequestTrace("  Injected payload - {0}".format(payload))
-        res = self.scnr.Inject(payload)
-        redirected = ""
-        if payload.startswith("5;"):
-          redirect_url = "http://{0}".format(h)
-          redirected = self.IsRedirectedTo(redirect_url, res, False)
-        elif payload.startswith(h):
-          redirected = self.IsRedirectedTo(payload, res, True)
-        else:
-          redirected = self.IsRedirectedTo(payload, res, False)
-        if len(redirected) > 0:
-            self.reason = self.GetReason(payload, redirected)
-            self.scnr.ResponseTrace("    ==> <i<cr>>Redirects to Injected payload!<i</cr>>")
-            self.ReportOpenRedirect(payload, "The payload in this request contains an url to the domain {0}. The payload is {1}".format(h, payload), payload, self.GetResponseTriggerDesc(redirected, h))
-            return
-        else:
-          self.scnr.ResponseTrace("    ==> No redirect to payload")
+        payloads.append(url.replace("<host>", h))
+        payload_hosts.append(h)
+    
+    injected = AppDomain.CurrentDomain.GetData("ConcurrentInjector").InjectMany(self.scnr, payloads, self.Name)
+    for i in range(len(payloads)):
+      payload = payloads[i]
+      h = payload_hosts[i]
+      req, res = injected[i]
+      self.scnr.RequestTrace("  Injected payload - {0}".format(payload))
+      redirected = ""
+      if payload.startswith("5;"):
+        redirect_url = "http://{0}".format(h)
+        redirected = self.IsRedirectedTo(redirect_url, res, False)
+      elif payload.startswith(h):
+        redirected = self.IsRedirectedTo(payload, res, True)
+      else:
+        redirected = self.IsRedirectedTo(payload, res, False)
+      if len(redirected) > 0:
+          self.reason = self.GetReason(payload, redirected)
+          self.scnr.ResponseTrace("    ==> <i<cr>>Redirects to Injected payload!<i</cr>>")
+          self.ReportOpenRedirect(payload, "The payload in this request contains an url to the domain {0}. The payload is {1}".format(h, payload), payload, self.GetResponseTriggerDesc(redirected, h), req, res)
+          return
+      else:
+        self.scnr.ResponseTrace("    ==> No redirect to payload")
     
   
   def IsRedirectedTo(self, ru, res, host_only):
@@ -138,13 +154,13 @@ class OpenRedirect(ActivePlugin):
         return True
     return False
   
-  def ReportOpenRedirect(self, req_trigger, req_trigger_desc, res_trigger, res_trigger_desc):
+  def ReportOpenRedirect(self, req_trigger, req_trigger_desc, res_trigger, res_trigger_desc, trigger_req, trigger_res):
     self.scnr.SetTraceTitle("Open Redirect Found", 10)
-    pr = Finding(self.scnr.InjectedRequest.BaseUrl)
+    pr = Finding(trigger_req.BaseUrl)
     pr.Title = "Open Redirect Found"
     pr.Summary = "Open redirect been detected in the '{0}' parameter of the {1} section of the request. {2}".format(self.scnr.InjectedParameter, self.scnr.InjectedSection, self.GetSummary())
     pr.AddReason(self.reason)
-    pr.Triggers.Add(req_trigger, req_trigger_desc, self.scnr.InjectedRequest, res_trigger, res_trigger_desc, self.scnr.InjectionResponse)
+    pr.Triggers.Add(req_trigger, req_trigger_desc, trigger_req, res_trigger, res_trigger_desc, trigger_res)
     pr.Type = FindingType.Vulnerability
     pr.Severity = FindingSeverity.High
     pr.Confidence = FindingConfidence.High
@@ -0,0 +1,237 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+from IronWASP import *
+from System import *
+from System.Threading import Monitor
+import clr
+from collections import OrderedDict
+
+#Finds out how a parameter behaves with a few requests, before the active plugins send their payloads to it.
+#This file does not add a plugin, it only creates a single triage and puts it in the AppDomain under the name 'ParameterTriage'.
+#Plugins get the traits of the parameter they check with AppDomain.CurrentDomain.GetData("ParameterTriage").GetTraits(scnr).
+#
+#The parameter is sent with its original value, a probe string and a random number, and once more with special characters if it is reflected.
+#The traits found are cached for the parameter within the scan so that only the first plugin to check it pays for the triage.
+#The cache is keyed on the scan ID, so a later scan of the same request runs the triage again instead of using traits that may be stale:
+#  Reflected, ReflectedInBody, ReflectedInHeaders - the probe string or number comes back in the response
+#  Sensitive - the responses to the three values are not all alike, so the value affects the response
+#  Numeric - the original value is a number, or numbers are handled like the original value while the probe string is not
+#  NumericOnly - numbers are handled like the original value while the probe string is not
+#Plugins list the traits they need in required_traits and are skipped for parameters that lack any of them.
+#Checks that can succeed on parameters without a trait, like error and time based checks, must not require it.
+#
+#For reflected parameters a character profile is also made, it says how each of the special_chars comes back in the response:
+#  Raw - as it was sent, Encoded - replaced by something else like an HTML entity or an escaped form,
+#  Stripped - removed from the value, Truncated - the value is cut off at this character, Unknown - could not be found out
+#Plugins drop payloads with characters that are in a state that would make the payload fail, see ParameterTraits.CanSurvive.
+class ParameterTriage:
+
+  #Most number of parameters whose traits are kept, the oldest are dropped first as earlier scans are done with them
+  max_parameters = 5000
+  #Characters in the character profile of reflected parameters
+  special_chars = ["'", "\"", "<", ">", "(", ")", ";", "&", "|", "`", "$", "{", "}", "\\", "\r", "\n"]
+  #Most number of requests sent to make the character profile, a new request is only needed when the value is cut off
+  max_profile_requests = 4
+  #Longest text looked at between two markers, anything longer is taken to be some other reflection of the marker
+  max_encoded_length = 16
+
+  def __init__(self):
+    self.lock = Object()
+    self.traits = OrderedDict()
+
+  #Returns the ParameterTraits of the scanner's injected parameter, running the triage if this parameter has not been seen before
+  def GetTraits(self, scnr):
+    key = self.GetKey(scnr)
+    Monitor.Enter(self.lock)
+    try:
+      if self.traits.has_key(key):
+        traits = self.traits.pop(key)
+        self.traits[key] = traits
+        return traits
+    finally:
+      Monitor.Exit(self.lock)
+    traits = self.Triage(scnr)
+    Monitor.Enter(self.lock)
+    try:
+      self.traits[key] = traits
+      while len(self.traits) > self.max_parameters:
+        self.traits.popitem(False)
+    finally:
+      Monitor.Exit(self.lock)
+    return traits
+
+  def Triage(self, scnr):
+    traits = ParameterTraits()
+    scnr.Trace("<i<br>><i<h>>Parameter Triage:<i</h>>")
+    scnr.RequestTrace("  Injected the original value - {0}".format(scnr.PreInjectionParameterValue))
+    original_res = scnr.Inject()
+    scnr.ResponseTrace("    ==> Code - {0}. Length - {1}".format(original_res.Code, original_res.BodyLength))
+
+    #the probe string is also kept with the Analyzer so that stored reflections of this parameter are found even if no other plugin probes it
+    probe = Analyzer.GetProbeString()
+    scnr.RequestTrace("  Injected probe string - {0}".format(probe))
+    probe_res = scnr.Inject(probe)
+    Analyzer.AddProbeString(probe, scnr.InjectedRequest)
+    scnr.ResponseTrace("    ==> Code - {0}. Length - {1}".format(probe_res.Code, probe_res.BodyLength))
+
+    number = str(Tools.GetRandomNumber(1000000, 10000000))
+    scnr.RequestTrace("  Injected number - {0}".format(number))
+    number_res = scnr.Inject(number)
+    scnr.ResponseTrace("    ==> Code - {0}. Length - {1}".format(number_res.Code, number_res.BodyLength))
+    traits.Requests = 3
+
+    if probe_res.BodyString.count(probe) > 0 or number_res.BodyString.count(number) > 0:
+      traits.Add("ReflectedInBody")
+    if probe_res.ToString().count(probe) > probe_res.BodyString.count(probe) or number_res.ToString().count(number) > number_res.BodyString.count(number):
+      traits.Add("ReflectedInHeaders")
+    if traits.Has("ReflectedInBody") or traits.Has("ReflectedInHeaders"):
+      traits.Add("Reflected")
+
+    sc = SimilarityChecker()
+    sc.Add("original", original_res)
+    sc.Add("probe", probe_res, probe)
+    sc.Add("number", number_res, number)
+    sc.Check()
+    alike = False
+    for group in sc.StrictGroups:
+      if group.Count == 3:
+        alike = True
+      elif group.Count == 2 and group.HasKey("original") and group.HasKey("number"):
+        traits.Add("NumericOnly")
+    if not alike:
+      traits.Add("Sensitive")
+    try:
+      int(scnr.PreInjectionParameterValue)
+      traits.Add("Numeric")
+    except:
+      if traits.Has("NumericOnly"):
+        traits.Add("Numeric")
+
+    if traits.Has("Reflected"):
+      self.ProfileChars(scnr, traits)
+    scnr.Trace("<i<br>>  Parameter traits - {0}".format(traits.Describe()))
+    return traits
+
+  #Sends the special characters with a different marker before and after each one and sees what is between the markers in the response.
+  #When the value is cut off the character before the cut is sent alone, to tell a character that truncates from a length limit,
+  #and the characters after the cut are sent again in the next request.
+  def ProfileChars(self, scnr, traits):
+    chars = list(self.special_chars)
+    requests = 0
+    while len(chars) > 0 and requests < self.max_profile_requests:
+      states = self.ProbeChars(scnr, chars)
+      requests = requests + 1
+      i = 0
+      while i < len(chars) and states[i] != "Truncated" and states[i] != "Unknown":
+        traits.CharStates[chars[i]] = states[i]
+        i = i + 1
+      if i == len(chars):
+        break
+      if states[i] == "Unknown":
+        if i == 0:
+          #the value did not come back at all, so nothing more can be learnt from another request
+          break
+        chars = chars[i:]
+        continue
+      if requests < self.max_profile_requests:
+        traits.CharStates[chars[i]] = self.ProbeChars(scnr, [chars[i]])[0]
+        requests = requests + 1
+      chars = chars[i + 1:]
+    traits.Requests = traits.Requests + requests
+    for c in self.special_chars:
+      if not traits.CharStates.has_key(c):
+        traits.CharStates[c] = "Unknown"
+    blocked = ["{0} {1}".format(Tools.EncodeForTrace(c), traits.CharStates[c]) for c in self.special_chars if traits.CharStates[c] != "Raw"]
+    if len(blocked) > 0:
+      scnr.ResponseTrace("    ==> Characters not reflected as sent - {0}".format(", ".join(blocked)))
+    else:
+      scnr.ResponseTrace("    ==> All characters reflected as sent")
+
+  #Injects the characters between markers and returns the state of each one. Where the value is reflected more than once the best state is taken.
+  def ProbeChars(self, scnr, chars):
+    base = "x{0}".format(Tools.GetRandomNumber(1000, 10000))
+    markers = [base + chr(ord("a") + i) for i in range(len(chars) + 1)]
+    payload = markers[0]
+    for i in range(len(chars)):
+      payload = payload + chars[i] + markers[i + 1]
+    scnr.RequestTrace("  Injected special characters - {0}".format(Tools.EncodeForTrace(payload)))
+    res_str = scnr.Inject(payload).ToString()
+    states = []
+    for i in range(len(chars)):
+      states.append(self.GetCharState(res_str, chars[i], markers[i], markers[i + 1], base))
+    return states
+
+  def GetCharState(self, res_str, c, start_marker, end_marker, base):
+    #a character is only taken to truncate the value if every reflection is cut off at it
+    ranks = ["Truncated", "Unknown", "Stripped", "Encoded", "Raw"]
+    best = ""
+    start = res_str.find(start_marker)
+    while start > -1:
+      start = start + len(start_marker)
+      window = res_str[start:start + self.max_encoded_length + len(end_marker)]
+      end = window.find(end_marker)
+      if end == 0:
+        state = "Stripped"
+      elif end > 0 and window[:end] == c:
+        state = "Raw"
+      elif end > 0:
+        state = "Encoded"
+      elif window.find(base[:3]) > -1:
+        #part of a later marker is there, so the value was cut for being too long and not because of this character
+        state = "Unknown"
+      else:
+        state = "Truncated"
+      if best == "" or ranks.index(state) > ranks.index(best):
+        best = state
+      start = res_str.find(start_marker, start)
+    if best == "":
+      return "Unknown"
+    return best
+
+  def GetKey(self, scnr):
+    return "{0}|{1}|{2}|{3}".format(scnr.ID, scnr.InjectedSection, scnr.InjectedParameter, scnr.InjectedUrlPathPosition)
+
+
+class ParameterTraits:
+
+  def __init__(self):
+    self.Traits = []
+    #special character -> Raw, Encoded, Stripped, Truncated or Unknown. Empty if the parameter is not reflected.
+    self.CharStates = {}
+    #Number of requests the triage sent for this parameter
+    self.Requests = 0
+
+  def Add(self, trait):
+    if not self.Has(trait):
+      self.Traits.append(trait)
+
+  def Has(self, trait):
+    return self.Traits.count(trait) > 0
+
+  #Returns the traits in the list that this parameter does not have
+  def GetMissing(self, traits):
+    return [t for t in traits if not self.Has(t)]
+
+  #Returns the characters of the payload that are in any of the given states. Characters that are not profiled are never blocked.
+  def GetBlockedChars(self, payload, states):
+    blocked = []
+    for c in self.CharStates.keys():
+      if payload.find(c) > -1 and states.count(self.CharStates[c]) > 0:
+        blocked.append(c)
+    return blocked
+
+  #False if a character of the payload is in any of the states, in which case the payload is dropped and that is written to the scan trace
+  def CanSurvive(self, scnr, payload, states):
+    blocked = self.GetBlockedChars(payload, states)
+    if len(blocked) == 0:
+      return True
+    scnr.Trace("<i<br>>  Skipped {0} - parameter triage shows that {1} cannot get through this parameter".format(Tools.EncodeForTrace(payload), " ".join([Tools.EncodeForTrace(c) for c in blocked])))
+    return False
+
+  def Describe(self):
+    if len(self.Traits) == 0:
+      return "none, the parameter is not reflected and does not affect the response"
+    return ", ".join(self.Traits)
+
+
+AppDomain.CurrentDomain.SetData("ParameterTriage", ParameterTriage())
@@ -35,7 +35,7 @@ class RemoteFileInclude(ActivePlugin):
   def CheckForRemoteFileInclude(self):
     self.scnr.Trace("<i<br>><i<h>>Checking for Remote File Include:<i</h>>")
     self.CheckForEchoBasedRemoteFileInclude()
-    self.CheckForTimeBasedRemoteFileInclude()
+    AppDomain.CurrentDomain.GetData("HostConcurrencyController").RunInQuietWindow(self.scnr, self.CheckForTimeBasedRemoteFileInclude)
     self.AnalyzeTestResult()
     
   def CheckForEchoBasedRemoteFileInclude(self):
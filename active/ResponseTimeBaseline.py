@@ -0,0 +1,158 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+from IronWASP import *
+from System import *
+from System.Threading import Monitor
+import clr
+import math
+
+#Keeps the normal response time of each endpoint for the time based checks of the active plugins.
+#This file does not add a plugin, it only creates a single store and puts it in the AppDomain under the name 'ResponseTimeBaseline'.
+#The time based checks of the plugins get it with AppDomain.CurrentDomain.GetData("ResponseTimeBaseline") and call GetResponseTimes with their scanner.
+#
+#An endpoint is the method and the url without the query, so all parameters of the same page share one baseline.
+#For each endpoint a moving average and variance of the response time and the last few response times are kept.
+#A baseline younger than probe_after seconds is used as it is. An older one is checked with a single request and is
+#measured again only if that response time has drifted away from the average. The age is from the last time the baseline was measured,
+#a check that is in line does not make it younger, so baselines older than max_age are always measured again.
+class ResponseTimeBaseline:
+
+  #Number of requests sent to measure a new baseline
+  new_samples = 3
+  #Number of the most recent response times kept for each endpoint
+  max_samples = 10
+  probe_after = 30
+  max_age = 300
+  #Weight of the latest response time in the moving average and variance
+  weight = 0.25
+  #A response time drifts if it is this many standard deviations away from the average, and by at least drift_min_ms
+  drift_deviations = 3
+  drift_min_ms = 200
+
+  def __init__(self):
+    self.lock = Object()
+    self.endpoints = {}
+
+  #Returns the most recent response times of the endpoint of the scanner's base request, see GetBaseline
+  def GetResponseTimes(self, scnr):
+    return self.GetBaseline(scnr).samples
+
+  #Returns a copy of the baseline of the endpoint of the scanner's base request, sending requests with the
+  #parameter's original value if the baseline is missing, old or has drifted. The decision is written to the scan trace.
+  def GetBaseline(self, scnr):
+    key = self.GetEndpointKey(scnr.BaseRequest)
+    age = self.GetAge(key)
+    sent = 0
+    if age >= 0 and age < self.probe_after:
+      scnr.Trace("<i<br>> Using the response time baseline of this endpoint measured {0} seconds ago.".format(int(age)))
+    elif age >= 0 and age < self.max_age:
+      res = scnr.Inject()
+      sent = 1
+      if self.AddResponseTime(key, res.RoundTrip):
+        scnr.Trace("<i<br>> Response time of {0}ms is in line with the baseline of this endpoint, using the baseline.".format(res.RoundTrip))
+      else:
+        scnr.Trace("<i<br>> <i<b>>Response time of {0}ms has drifted from the baseline of this endpoint, measuring it again.<i</b>>".format(res.RoundTrip))
+        self.Reset(key)
+        self.AddResponseTime(key, res.RoundTrip)
+        sent = sent + self.Measure(scnr, key, self.new_samples - 1)
+    else:
+      scnr.Trace("<i<br>> Sending {0} requests to get a baseline of the response time of this endpoint:".format(self.new_samples))
+      self.Reset(key)
+      sent = self.Measure(scnr, key, self.new_samples)
+    baseline = self.GetCopy(key)
+    times = baseline.samples
+    scnr.Trace("<i<br>> Baseline from {0} response times, {1} of them new: {2}ms.".format(len(times), sent, "ms, ".join([str(t) for t in times])))
+    scnr.Trace("<i<br>> Moving Average - {0}ms. Standard Deviation - {1}ms. Median - {2}ms. 90th Percentile - {3}ms.".format(int(baseline.average), int(baseline.GetDeviation()), self.GetPercentile(times, 50), self.GetPercentile(times, 90)))
+    return baseline
+
+  #Sends count requests and adds their response times to the baseline, which then counts as measured now
+  def Measure(self, scnr, key, count):
+    for i in range(count):
+      res = scnr.Inject()
+      self.AddResponseTime(key, res.RoundTrip)
+    Monitor.Enter(self.lock)
+    try:
+      self.endpoints[key].updated = DateTime.Now
+    finally:
+      Monitor.Exit(self.lock)
+    return count
+
+  #Adds a response time to the endpoint's baseline and returns False if it has drifted away from the average
+  def AddResponseTime(self, key, res_time):
+    Monitor.Enter(self.lock)
+    try:
+      e = self.endpoints[key]
+      in_line = True
+      if len(e.samples) == 0:
+        e.average = float(res_time)
+      else:
+        deviation = res_time - e.average
+        if len(e.samples) >= self.new_samples and abs(deviation) > max(self.drift_deviations * math.sqrt(e.variance), self.drift_min_ms):
+          in_line = False
+        e.average = e.average + self.weight * deviation
+        e.variance = (1 - self.weight) * (e.variance + self.weight * deviation * deviation)
+      e.samples.append(res_time)
+      if len(e.samples) > self.max_samples:
+        e.samples.pop(0)
+      return in_line
+    finally:
+      Monitor.Exit(self.lock)
+
+  def Reset(self, key):
+    Monitor.Enter(self.lock)
+    try:
+      self.endpoints[key] = EndpointResponseTimes()
+    finally:
+      Monitor.Exit(self.lock)
+
+  #Returns the age of the endpoint's baseline in seconds, or -1 if there is none
+  def GetAge(self, key):
+    Monitor.Enter(self.lock)
+    try:
+      if not self.endpoints.has_key(key) or len(self.endpoints[key].samples) < self.new_samples:
+        return -1
+      return (DateTime.Now - self.endpoints[key].updated).TotalSeconds
+    finally:
+      Monitor.Exit(self.lock)
+
+  #Returns a copy of the endpoint's baseline with the range of response times that are in line with it set, see AddResponseTime
+  def GetCopy(self, key):
+    Monitor.Enter(self.lock)
+    try:
+      e = self.endpoints[key]
+      baseline = EndpointResponseTimes()
+      baseline.samples = list(e.samples)
+      baseline.average = e.average
+      baseline.variance = e.variance
+      baseline.updated = e.updated
+      spread = max(self.drift_deviations * e.GetDeviation(), self.drift_min_ms)
+      baseline.usual_min = int(max(e.average - spread, 0))
+      baseline.usual_max = int(e.average + spread)
+      return baseline
+    finally:
+      Monitor.Exit(self.lock)
+
+  def GetPercentile(self, times, percent):
+    times = sorted(times)
+    return times[int(round((len(times) - 1) * percent / 100.0))]
+
+  def GetEndpointKey(self, req):
+    return "{0} {1}".format(req.Method, req.FullUrl.split("?")[0])
+
+
+class EndpointResponseTimes:
+
+  def __init__(self):
+    self.samples = []
+    self.average = 0.0
+    self.variance = 0.0
+    self.updated = DateTime.MinValue
+    #Lowest and highest response times that are in line with the baseline, only set on the copies made by GetCopy
+    self.usual_min = 0
+    self.usual_max = 0
+
+  def GetDeviation(self):
+    return math.sqrt(self.variance)
+
+
+AppDomain.CurrentDomain.SetData("ResponseTimeBaseline", ResponseTimeBaseline())
@@ -4,13 +4,32 @@ from IronWASP import *
 from System import *
 import clr
 import re
+import math
 
 #Inherit from the base ActivePlugin class
 class SQLInjection(ActivePlugin):
   
   error_regex_raw = []
   error_regex = []
+  error_regex_dbms = []
+  error_matcher = None
   time_check = []
+  time_check_dbms = []
+  
+  #Error rates of the sequential test used in the time based check. alpha is the chance of accepting a delay that the payload did not cause.
+  time_alpha = 0.0001
+  time_beta = 0.01
+  #A delay is accepted only after this many delayed responses, so a single slow response caused by a network hiccup is never enough
+  time_min_samples = 2
+  #Number of requests after which an undecided sequential test is treated as no delay
+  time_max_samples = 3
+  #Lower bound on the response time jitter in ms, three baseline samples can make a jittery host look very steady
+  time_min_jitter = 150
+  #Response times vary in proportion to how long the request takes, the jitter is taken as at least this fraction of the average
+  time_min_relative_jitter = 0.2
+  #The database gets the value as it reaches the application, so only characters that are stripped or cut off block a payload.
+  #A character that is encoded in the response may still reach the database as it was sent.
+  blocking_char_states = ["Stripped", "Truncated"]
   
   def GetInstance(self):
     p = SQLInjection()
@@ -37,6 +56,12 @@ class SQLInjection(ActivePlugin):
     self.ErrorCount = [0,0,0]
     self.Errors = []
     self.ErrorTriggerCount = 0
+    self.baseline_error_matches = {}
+    self.BaselineCacheHits = 0
+    self.BaselineCacheMisses = 0
+    #Backend databases identified from the error messages and the string concatenation check
+    self.detected_dbms = []
+    self.traits = AppDomain.CurrentDomain.GetData("ParameterTriage").GetTraits(self.Scnr)
     
     self.Scnr.Trace("<i<br>><i<h>>Checking for SQL Injection:<i</h>>")
     overall_error_score = self.CheckForErrorBasedSQLi()
@@ -60,43 +85,56 @@ class SQLInjection(ActivePlugin):
     self.Scnr.Trace("<i<br>><i<h>>Checking for Error based Injection:<i</h>>")
     self.Scnr.Trace("<i<br>>Sending a request with a normal value to get a Error baseline")
     self.Scnr.RequestTrace("  Injected 123 - ")
-    err_base_res = self.Scnr.Inject("123")
+    err_base_res = AppDomain.CurrentDomain.GetData("InjectionCache").Inject(self.Scnr, "123", False, self.Name)[1]
     self.Scnr.ResponseTrace("  ==> Code {0} | Length {0}".format(err_base_res.Code, err_base_res.BodyLength))
     
-    payloads = ["'", "\"", "\xBF'\"(", "(", ")"]
+    payloads = [payload for payload in ["'", "\"", "\xBF'\"(", "(", ")"] if self.traits.CanSurvive(self.Scnr, payload, self.blocking_char_states)]
+    raw_payloads = ["\xBF'\"("]
+    #the payloads do not depend on each other so all the ones that are not raw injected are sent together
+    injected = AppDomain.CurrentDomain.GetData("ConcurrentInjector").InjectMany(self.Scnr, [payload for payload in payloads if not payload in raw_payloads], self.Name)
     final_error_score = 0
     for payload in payloads:
       self.Scnr.RequestTrace("  Injected {0} - ".format(payload))
-      if payload == "\xBF'\"(":
-        inj_res = self.Scnr.RawInject(payload)
+      if payload in raw_payloads:
+        inj_req, inj_res = AppDomain.CurrentDomain.GetData("InjectionCache").Inject(self.Scnr, payload, True, self.Name)
       else:
-        inj_res = self.Scnr.Inject(payload)
-      score = self.AnalyseInjectionResultForError(payload, inj_res, err_base_res)
+        inj_req, inj_res = injected.pop(0)
+      score = self.AnalyseInjectionResultForError(payload, inj_req, inj_res, err_base_res)
       if score > final_error_score:
         final_error_score = score
+    self.Scnr.Trace("<i<br>>Baseline error signature cache - {0} hit[s], {1} miss[es]".format(self.BaselineCacheHits, self.BaselineCacheMisses))
+    AppDomain.CurrentDomain.GetData("InjectionCache").TraceHitRatio(self.Scnr, self.Name)
+    if len(self.detected_dbms) > 0:
+      self.Scnr.Trace("<i<br>><i<b>>Error messages indicate that the backend database is {0}<i</b>>".format(", ".join(self.detected_dbms)))
     self.ErrorTriggerCount = len(self.RequestTriggers)
     return final_error_score
   
-  def AnalyseInjectionResultForError(self, payload, payload_response, err_base_res):
+  def AnalyseInjectionResultForError(self, payload, payload_request, payload_response, err_base_res):
     res = payload_response
 
     triggers = []
     all_error_matches = {}
     
     error_score = 0
-    for i in range(len(self.error_regex)):
-      error_re = self.error_regex[i]
+    #only the signatures found by the single pass over the body are checked against the baselines
+    inj_error_matches = self.error_matcher.FindAll(res.BodyString)
+    if len(inj_error_matches) > 0:
+      original_res_matches = self.GetBaselineErrorMatches("normal", self.base_response)
+      base_res_matches = self.GetBaselineErrorMatches("error", err_base_res)
+    for i in sorted(inj_error_matches.keys()):
       error_re_raw = self.error_regex_raw[i]
-      matches = error_re.findall(res.BodyString)
-      if len(matches) > 0:
-        original_error_matches = error_re.findall(self.base_response.BodyString)
-        base_error_matches = error_re.findall(err_base_res.BodyString)
-        all_error_matches[error_re_raw] = [len(matches),len(original_error_matches), len(base_error_matches)]
-        triggers.extend(matches)
-        
-        self.ErrorCount[0] = self.ErrorCount[0] + len(matches)
-        self.ErrorCount[1] = self.ErrorCount[1] + len(original_error_matches)
-        self.ErrorCount[2] = self.ErrorCount[2] + len(base_error_matches)
+      matches = inj_error_matches[i]
+      original_error_matches = original_res_matches.get(i, [])
+      base_error_matches = base_res_matches.get(i, [])
+      #a signature that is just as common in the baselines is part of the page and says nothing about the database behind this parameter
+      if len(matches) > len(original_error_matches) and len(matches) > len(base_error_matches):
+        self.AddDetectedDBMS(self.error_regex_dbms[i])
+      all_error_matches[error_re_raw] = [len(matches),len(original_error_matches), len(base_error_matches)]
+      triggers.extend(matches)
+      
+      self.ErrorCount[0] = self.ErrorCount[0] + len(matches)
+      self.ErrorCount[1] = self.ErrorCount[1] + len(original_error_matches)
+      self.ErrorCount[2] = self.ErrorCount[2] + len(base_error_matches)
     
     if len(all_error_matches) > 0:
       self.Errors.extend(triggers)
@@ -114,7 +152,7 @@ class SQLInjection(ActivePlugin):
       self.RequestTriggerDescs.append("The payload in this request is meant to trigger database error messages. The payload is {0}.".format(payload))
       self.ResponseTriggers.append("\r\n".join(triggers))
       self.ResponseTriggerDescs.append("This response contains database error messages.")
-      self.TriggerRequests.append(self.Scnr.InjectedRequest.GetClone())
+      self.TriggerRequests.append(payload_request)
       self.TriggerResponses.append(res)
       self.TriggerCount = self.TriggerCount + 1
       
@@ -123,6 +161,15 @@ class SQLInjection(ActivePlugin):
       
     return error_score
   
+  #The normal and error baseline responses do not change during a Check, so their error signatures are found once and reused for every payload
+  def GetBaselineErrorMatches(self, baseline, baseline_res):
+    if self.baseline_error_matches.has_key(baseline):
+      self.BaselineCacheHits = self.BaselineCacheHits + 1
+    else:
+      self.BaselineCacheMisses = self.BaselineCacheMisses + 1
+      self.baseline_error_matches[baseline] = self.error_matcher.FindAll(baseline_res.BodyString)
+    return self.baseline_error_matches[baseline]
+  
   def CheckForBlindSQLi(self):
     self.Scnr.Trace("<i<br>><i<h>>Checking for Blind Injection:<i</h>>")
     is_int = False
@@ -139,17 +186,22 @@ class SQLInjection(ActivePlugin):
     blind_bool_score = 0
     blind_time_score = 0
     
-    if is_int:
-      blind_int_math_score = self.InjectBlindIntMath(int_value)
+    #the math and concatenation checks compare responses to different values, they cannot succeed if the value does not affect the response
+    if not self.traits.Has("Sensitive"):
+      self.Scnr.Trace("<i<br>><i<b>>Parameter triage shows that the value of this parameter does not affect the response, skipping the math and concatenation checks.<i</b>>")
     else:
-      blind_int_math_score = self.InjectBlindIntMath(0)
-      
-    if len(str_value) > 1:
-      blind_str_conc_score = self.InjectBlindStrConc(str_value)
+      if is_int:
+        blind_int_math_score = self.InjectBlindIntMath(int_value)
+      else:
+        blind_int_math_score = self.InjectBlindIntMath(0)
+        
+      if len(str_value) > 1 and not self.traits.Has("NumericOnly"):
+        blind_str_conc_score = self.InjectBlindStrConc(str_value)
     
+    #always run, the OR check makes the value invalid so that OR 1=1 can change a response that the value alone does not change
     blind_bool_score = self.InjectBlindBool()
     
-    blind_time_score = self.CheckBlindTime()
+    blind_time_score = AppDomain.CurrentDomain.GetData("HostConcurrencyController").RunInQuietWindow(self.Scnr, self.CheckBlindTime)
     
     if blind_int_math_score  + blind_str_conc_score + blind_bool_score + blind_time_score > 0:
       return 6
@@ -374,6 +426,8 @@ class SQLInjection(ActivePlugin):
     responses = []
     
     for quote in quotes:
+      if not self.traits.CanSurvive(self.Scnr, quote, self.blocking_char_states):
+        continue
       if quote == "'":
         self.Scnr.Trace("<i<br>>  <i<b>>Checking with Single Quotes:<i</b>>")
       else:
@@ -477,6 +531,7 @@ class SQLInjection(ActivePlugin):
             
             reason = self.GetBlindConcatReason(payloads, db, self.TriggerCount)
             self.reasons.append(reason)
+            self.AddDetectedDBMS(db)
             
             return confidence
     return 0
@@ -503,6 +558,8 @@ class SQLInjection(ActivePlugin):
     clean_prefix = prefix.replace("'","").replace('"',"")
     or_prefix = clean_prefix + "xxx"#this is to change the prefix to an invalid value to help with OR
     for quote in quotes:
+      if not self.traits.CanSurvive(self.Scnr, quote, self.blocking_char_states):
+        continue
       score = score + self.CheckForBlindBoolWith(or_prefix, quote, "or", int_trailers)
       score = score + self.CheckForBlindBoolWith(or_prefix, quote, "or", char_trailers)
     
@@ -515,6 +572,8 @@ class SQLInjection(ActivePlugin):
     
     self.Scnr.Trace("<i<br>>  <i<b>>Checking with AND Operator:<i</b>>")
     for quote in quotes:
+      if not self.traits.CanSurvive(self.Scnr, quote, self.blocking_char_states):
+        continue
       and_prefix = prefix.replace(quote, "")
       score = score + self.CheckForBlindBoolWith(and_prefix, quote, "and", int_trailers)
       score = score + self.CheckForBlindBoolWith(and_prefix, quote, "and", char_trailers)
@@ -636,68 +695,113 @@ class SQLInjection(ActivePlugin):
   def CheckBlindTime(self):
     score = 0
     self.Scnr.Trace("<i<br>><i<h>>Checking for Time based Injection:<i</h>>")
-    self.Scnr.Trace("<i<br>> Sending three requests to get a baseline of the response time for time based check:")
-    min_delay = -1
-    max_delay = 0
-    time = 10000
-    base_line_delays = []
-    avg_time = 0
-    for i in range(3):
-      res = self.Scnr.Inject()
-      avg_time = avg_time + res.RoundTrip
-      base_line_delays.append("  {0}) Response time is - {1} ms".format(i+1, res.RoundTrip))
-      if res.RoundTrip > max_delay:
-        max_delay = res.RoundTrip
-      if res.RoundTrip < min_delay or min_delay == -1:
-        min_delay = res.RoundTrip
-    self.Scnr.Trace("<i<br>>".join(base_line_delays))
-    avg_time = avg_time/3
-    
-    if min_delay > 5000:
-      time = ((max_delay + min_delay) / 1000) + 1
-    else:
-      time = ((max_delay + 5000) / 1000) + 1
-    
-    self.Scnr.Trace("<i<br>> Response Times: Minimum - {0}ms. Maximum - {1}ms.".format(min_delay, max_delay))
-    self.Scnr.Trace("<i<br>> <i<b>>Testing with delay time of {0}ms.<i</b>>".format(time * 1000))
-    for inj_str in self.time_check:
-      payload = inj_str.replace("__TIME__", str(time))
-      score = score + self.InjectAndCheckBlindDelay(payload, time, avg_time)
+    base_line_times = AppDomain.CurrentDomain.GetData("ResponseTimeBaseline").GetResponseTimes(self.Scnr)
+    avg_time = float(sum(base_line_times)) / len(base_line_times)
+    jitter = self.GetResponseTimeJitter(base_line_times, avg_time)
+    
+    #A delay of four times the jitter is enough for a single response to settle the sequential test either way.
+    #On most hosts this is a 1 or 2 second delay, jittery hosts get a proportionally longer one.
+    time = int(math.ceil((4 * jitter) / 1000))
+    if time < 1:
+      time = 1
+    
+    self.Scnr.Trace("<i<br>> Response Times: Minimum - {0}ms. Maximum - {1}ms. Average - {2}ms. Jitter - {3}ms.".format(min(base_line_times), max(base_line_times), int(avg_time), int(jitter)))
+    self.Scnr.Trace("<i<br>> <i<b>>Testing with delay time of {0}ms. Delays will be confirmed with {1}ms.<i</b>>".format(time * 1000, time * 2000))
+    time_checks = self.GetTimeChecksForDetectedDBMS()
+    for inj_str in time_checks:
+      if not self.traits.CanSurvive(self.Scnr, inj_str, self.blocking_char_states):
+        continue
+      score = self.InjectAndCheckBlindDelay(inj_str, time, avg_time, jitter)
+      if score > 0:
+        break
     
     return score
   
-  def InjectAndCheckBlindDelay(self, payload, time, avg_time):
-    for i in range(2):
+  #Once the backend database is known only its time delay payloads, and those not specific to any database, need to be sent.
+  #If nothing was detected, or none of the payloads are for the detected database, all payloads are sent.
+  def GetTimeChecksForDetectedDBMS(self):
+    if len(self.detected_dbms) == 0:
+      return self.time_check
+    time_checks = []
+    dbms_specific = False
+    for i in range(len(self.time_check)):
+      if self.detected_dbms.count(self.time_check_dbms[i]) > 0:
+        time_checks.append(self.time_check[i])
+        dbms_specific = True
+      elif self.time_check_dbms[i] == "Any":
+        time_checks.append(self.time_check[i])
+    if not dbms_specific:
+      self.Scnr.Trace("<i<br>> None of the time delay payloads are for {0}, sending all of them.".format(", ".join(self.detected_dbms)))
+      return self.time_check
+    self.Scnr.Trace("<i<br>> Sending only the {0} of {1} time delay payloads that are for {2}.".format(len(time_checks), len(self.time_check), ", ".join(self.detected_dbms)))
+    return time_checks
+  
+  def AddDetectedDBMS(self, dbms):
+    if dbms != "Any" and self.detected_dbms.count(dbms) == 0:
+      self.detected_dbms.append(dbms)
+  
+  def GetResponseTimeJitter(self, times, avg_time):
+    variance = 0.0
+    for t in times:
+      variance = variance + ((t - avg_time) ** 2)
+    variance = variance / max(len(times) - 1, 1)
+    return max(math.sqrt(variance), (max(times) - min(times)) / 2.0, avg_time * self.time_min_relative_jitter, self.time_min_jitter)
+  
+  #A payload is reported only if it delays the response by the short delay and then by double that delay,
+  #a slow response that happens by chance is unlikely to also scale with the requested delay.
+  def InjectAndCheckBlindDelay(self, inj_str, time, avg_time, jitter):
+    payload = inj_str.replace("__TIME__", str(time))
+    res = self.TestForBlindDelay(payload, time * 1000, avg_time, jitter)
+    if res == None:
+      return 0
+    
+    confirm_time = time * 2
+    payload = inj_str.replace("__TIME__", str(confirm_time))
+    self.Scnr.Trace("  <i<b>>Rechecking with a delay time of {0}ms<i</b>>".format(confirm_time * 1000))
+    res = self.TestForBlindDelay(payload, confirm_time * 1000, avg_time, jitter)
+    if res == None:
+      self.Scnr.Trace("  <i<b>>Time Delay did not occur again!<i</b>>")
+      return 0
+    
+    self.Scnr.Trace("  <i<cr>>Delay Observed Again! Indicates Presence of SQL Injection<i</cr>>")
+    self.RequestTriggers.append(payload)
+    self.RequestTriggerDescs.append("The payload in this request contains a SQL query snippet which if executed will cause a delay of {0} milliseconds. The payload is {1}".format(confirm_time * 1000, payload))
+    self.TriggerRequests.append(self.Scnr.InjectedRequest.GetClone())
+    
+    self.ResponseTriggers.append("")
+    self.ResponseTriggerDescs.append("It took {0} milliseconds to get this response. It took so long because of the {1} milliseconds delay caused by the payload.".format(res.RoundTrip, confirm_time * 1000))
+    self.TriggerResponses.append(res)
+    
+    self.TriggerCount = self.TriggerCount + 1
+    reason = self.GetBlindTimeReason(payload, confirm_time * 1000, res.RoundTrip, int(avg_time), self.TriggerCount)
+    self.reasons.append(reason)
+    return 1
+  
+  #Sequential probability ratio test between 'the response time is normal' and 'the response is delayed by delay_ms'.
+  #Response times are modelled as normally distributed around the baseline average with the baseline jitter as the deviation.
+  #The evidence any one response can add for a delay is capped, so accepting a delay always takes time_min_samples delayed responses
+  #and a normal response in between pulls the test back towards no delay.
+  #Requests are sent only until the evidence is conclusive, returns the last response if the delay was observed and None otherwise.
+  def TestForBlindDelay(self, payload, delay_ms, avg_time, jitter):
+    accept_delay = math.log((1 - self.time_beta) / self.time_alpha)
+    reject_delay = math.log(self.time_beta / (1 - self.time_alpha))
+    log_ratio = 0.0
+    for i in range(self.time_max_samples):
       self.Scnr.RequestTrace("  Injecting {0}".format(payload))
       res = self.Scnr.Inject(payload)
       res_trace = "	==> Code-{0} Length-{1} Time-{2}ms.".format(res.Code, res.BodyLength, res.RoundTrip)
-      if i == 0:
-        if res.RoundTrip >= (time * 1000):
-          self.Scnr.ResponseTrace("{0} <i<b>>Delay Observed! Rechecking the result with the same Injection string<i</b>>".format(res_trace))
-        else:
-          self.Scnr.ResponseTrace("{0} No Time Delay.".format(res_trace))
-          break
-      elif i == 1:
-        if res.RoundTrip >= (time * 1000):
-          self.Scnr.ResponseTrace("{0} <i<br>><i<cr>>Delay Observed Again! Indicates Presence of SQL Injection<i</cr>>".format(res_trace))
-          
-          self.RequestTriggers.append(payload)
-          self.RequestTriggerDescs.append("The payload in this request contains a SQL query snippet which if executed will cause a delay of {0} milliseconds. The payload is {1}".format(time * 1000, payload))
-          self.TriggerRequests.append(self.Scnr.InjectedRequest.GetClone())
-          
-          self.ResponseTriggers.append("")
-          self.ResponseTriggerDescs.append("It took {0} milliseconds to get this response. It took so long because of the {1} milliseconds delay caused by the payload.".format(res.RoundTrip, time * 1000))
-          self.TriggerResponses.append(res)
-          
-          self.TriggerCount = self.TriggerCount + 1
-          reason = self.GetBlindTimeReason(payload, time * 1000, res.RoundTrip, avg_time, self.TriggerCount)
-          self.reasons.append(reason)
-          #self.ReportSQLInjection()
-          return 1
-        else:
-          self.Scnr.ResponseTrace("{0} <i<b>>Time Delay did not occur again!<i</b>>".format(res_trace))
-    
-    return 0
+      res_time = max(res.RoundTrip, avg_time - delay_ms)
+      log_ratio = log_ratio + min(delay_ms * (res_time - avg_time - (delay_ms / 2.0)) / (jitter * jitter), accept_delay / self.time_min_samples)
+      if log_ratio >= accept_delay:
+        self.Scnr.ResponseTrace("{0} <i<b>>Delay Observed!<i</b>>".format(res_trace))
+        return res
+      elif log_ratio <= reject_delay:
+        self.Scnr.ResponseTrace("{0} No Time Delay.".format(res_trace))
+        return None
+      else:
+        self.Scnr.ResponseTrace("{0} Inconclusive, sending the same Injection string again.".format(res_trace))
+    self.Scnr.Trace("  Still inconclusive after {0} requests, treating it as no delay.".format(self.time_max_samples))
+    return None
   
   def ReportSQLInjection(self, Confidence):
     self.Scnr.SetTraceTitle("SQLi Found", 100)
@@ -735,19 +839,29 @@ class SQLInjection(ActivePlugin):
     err_regex_file.readline()#Ignore the first line containing comments
     error_strings = err_regex_file.readlines()
     err_regex_file.close()
+    #Lines starting with #DBMS: name the backend database that the signatures following them belong to
+    dbms = "Any"
     for err_str in error_strings:
       err_str = err_str.strip()
-      if len(err_str) > 0:
+      if err_str.startswith("#DBMS:"):
+        dbms = err_str[6:]
+      elif len(err_str) > 0:
         self.error_regex_raw.append(err_str)
         self.error_regex.append(re.compile(err_str, re.I))
+        self.error_regex_dbms.append(dbms)
+    SQLInjection.error_matcher = ErrorSignatureMatcher(self.error_regex_raw, self.error_regex)
     time_check_file = open(Config.Path + "\\plugins\\active\\sql_time_check.txt")
     time_check_file.readline()#Ignore the first line containing comments
     time_check_temp = time_check_file.readlines()
     time_check_file.close()
+    dbms = "Any"
     for tct in time_check_temp:
       tct = tct.strip()
-      if len(tct) > 0:
+      if tct.startswith("#DBMS:"):
+        dbms = tct[6:]
+      elif len(tct) > 0:
         self.time_check.append(tct)
+        self.time_check_dbms.append(dbms)
 
   def GetSummary(self):
     Summary = "SQL Injection is an issue where it is possible execute SQL queries on the database being used on the server-side. For more details on this issue refer <i<cb>>https://www.owasp.org/index.php/SQL_Injection<i</cb>><i<br>><i<br>>"
@@ -985,6 +1099,145 @@ class SQLInjection(ActivePlugin):
     return FR
 
 
+#Finds all the SQL error signatures present in a response body without running every signature regex over it.
+#Every signature is keyed on the longest literal string that any match of it must contain. The body is lowercased once and
+#the keys are looked up in it with a plain substring search, the full signature regex is only run for signatures whose key is present.
+#Keys are checked shortest first and a key that contains an already missing key is skipped without searching, so a body with
+#no 'driver' in it never gets searched for '[cli driver]' or '[sqlserver jdbc driver]'.
+#Signatures without a usable key (like ones built on alternation) are always run in full.
+class ErrorSignatureMatcher:
+  
+  min_key_length = 3
+  
+  def __init__(self, raw_signatures, signatures):
+    self.signatures = signatures
+    self.key_signatures = {}
+    self.unkeyed_signatures = []
+    for i in range(len(raw_signatures)):
+      key = self.GetLiteralKey(raw_signatures[i])
+      if len(key) < self.min_key_length:
+        self.unkeyed_signatures.append(i)
+      elif self.key_signatures.has_key(key):
+        self.key_signatures[key].append(i)
+      else:
+        self.key_signatures[key] = [i]
+    
+    self.keys = self.key_signatures.keys()
+    self.keys.sort(key=len)
+    self.contained_keys = {}
+    for key in self.keys:
+      self.contained_keys[key] = []
+      for other_key in self.keys:
+        if len(other_key) < len(key) and key.count(other_key) > 0:
+          self.contained_keys[key].append(other_key)
+  
+  #Returns a dictionary of signature index => list of matches, for every signature that has at least one match in the body.
+  #The matches are exactly what findall of that signature would return on the full body.
+  def FindAll(self, body):
+    lower_body = body.lower()
+    candidates = []
+    candidates.extend(self.unkeyed_signatures)
+    missing_keys = {}
+    for key in self.keys:
+      skip = False
+      for contained_key in self.contained_keys[key]:
+        if missing_keys.has_key(contained_key):
+          skip = True
+          break
+      if skip or lower_body.find(key) == -1:
+        missing_keys[key] = True
+      else:
+        candidates.extend(self.key_signatures[key])
+    candidates.sort()
+    
+    all_matches = {}
+    for i in candidates:
+      matches = self.signatures[i].findall(body)
+      if len(matches) > 0:
+        all_matches[i] = matches
+    return all_matches
+  
+  #Returns the longest lowercased literal string that must be present in any text matched by the pattern.
+  #Groups, character classes and escaped classes like \s break up literal runs and are not looked inside.
+  #A pattern with alternation outside of a group has no single required literal, so an empty key is returned for it.
+  def GetLiteralKey(self, pattern):
+    runs = []
+    run = ""
+    last_atom_literal = False
+    i = 0
+    while i < len(pattern):
+      c = pattern[i]
+      if c == "\\" and i + 1 < len(pattern):
+        if pattern[i + 1].isalnum():
+          runs.append(run)
+          run = ""
+          last_atom_literal = False
+        else:
+          run = run + pattern[i + 1]
+          last_atom_literal = True
+        i = i + 2
+      elif c == "[":
+        i = i + 1
+        if i < len(pattern) and pattern[i] == "^":
+          i = i + 1
+        if i < len(pattern) and pattern[i] == "]":
+          i = i + 1
+        while i < len(pattern) and pattern[i] != "]":
+          if pattern[i] == "\\":
+            i = i + 1
+          i = i + 1
+        i = i + 1
+        runs.append(run)
+        run = ""
+        last_atom_literal = False
+      elif c == "(":
+        depth = 0
+        while i < len(pattern):
+          if pattern[i] == "\\":
+            i = i + 1
+          elif pattern[i] == "(":
+            depth = depth + 1
+          elif pattern[i] == ")":
+            depth = depth - 1
+            if depth == 0:
+              break
+          i = i + 1
+        i = i + 1
+        runs.append(run)
+        run = ""
+        last_atom_literal = False
+      elif c == "|":
+        return ""
+      elif c in "*?{+":
+        #the atom before an optional quantifier might not be there at all
+        if c != "+" and last_atom_literal:
+          run = run[:-1]
+        if c == "{":
+          while i < len(pattern) and pattern[i] != "}":
+            i = i + 1
+        i = i + 1
+        if i < len(pattern) and pattern[i] == "?":
+          i = i + 1
+        runs.append(run)
+        run = ""
+        last_atom_literal = False
+      elif c in ".^$":
+        runs.append(run)
+        run = ""
+        last_atom_literal = False
+        i = i + 1
+      else:
+        run = run + c
+        last_atom_literal = True
+        i = i + 1
+    runs.append(run)
+    key = ""
+    for run in runs:
+      if len(run) > len(key):
+        key = run
+    return key.lower()
+
+
 p = SQLInjection()
 p.SetUp()
 ActivePlugin.Add(p.GetInstance())
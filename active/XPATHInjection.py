@@ -19,12 +19,13 @@ class XPATHInjection(ActivePlugin):
     self.scnr = scnr
     self.reason = ""
     self.CheckForXPATHInjection()
+    AppDomain.CurrentDomain.GetData("InjectionCache").TraceHitRatio(self.scnr, self.Name)
   
   def CheckForXPATHInjection(self):
     self.scnr.Trace("<i<br>><i<h>>Checking for XPATH Injection:<i</h>>")
     payload = "<!--'\"a"
     self.scnr.RequestTrace("  Injected payload - {0}".format(payload))
-    res = self.scnr.Inject(payload)
+    req, res = AppDomain.CurrentDomain.GetData("InjectionCache").Inject(self.scnr, payload, False, self.Name)
     errors_found = []
     for error in self.error_strings:
       if res.BodyString.count(error) > 0:
@@ -32,17 +33,17 @@ class XPATHInjection(ActivePlugin):
     if len(errors_found) > 0:
       self.scnr.ResponseTrace("    ==> <i<cr>>XPATH Injection Found.<i<br>>Errors:<i<br>>{0}<i</cr>>".format("<i<br>>".join(errors_found)))
       self.reason = self.GetReason(payload, errors_found)
-      self.ReportXPATHInjection(payload, "The payload in this request is meant to trigger XPATH errors. The payload is: {0}".format(payload), "\r\n".join(errors_found), "This response contains XPATH error messages due to the error triggered by the payload")
+      self.ReportXPATHInjection(payload, "The payload in this request is meant to trigger XPATH errors. The payload is: {0}".format(payload), "\r\n".join(errors_found), "This response contains XPATH error messages due to the error triggered by the payload", req, res)
     else:
       self.scnr.ResponseTrace("    ==> No Errors Found")
   
-  def ReportXPATHInjection(self, req_trigger, req_trigger_desc, res_trigger, res_trigger_desc):
+  def ReportXPATHInjection(self, req_trigger, req_trigger_desc, res_trigger, res_trigger_desc, trigger_req, trigger_res):
     self.scnr.SetTraceTitle("XPATH Injection Found", 10)
-    pr = Finding(self.scnr.InjectedRequest.BaseUrl)
+    pr = Finding(trigger_req.BaseUrl)
     pr.Title = "XPATH Injection Found"
     pr.Summary = "XPATH Injection has been detected in the '{0}' parameter of the {1} section of the request.<i<br>><i<br>>{2}".format(self.scnr.InjectedParameter, self.scnr.InjectedSection, self.GetSummary())
     pr.AddReason(self.reason)
-    pr.Triggers.Add(req_trigger, req_trigger_desc, self.scnr.InjectedRequest, res_trigger, res_trigger_desc, self.scnr.InjectionResponse)
+    pr.Triggers.Add(req_trigger, req_trigger_desc, trigger_req, res_trigger, res_trigger_desc, trigger_res)
     pr.Type = FindingType.Vulnerability
     pr.Severity = FindingSeverity.High
     pr.Confidence = FindingConfidence.High
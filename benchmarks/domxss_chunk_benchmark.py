@@ -0,0 +1,128 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+
+#Equivalence test and benchmark of how the DOMXSS plugin scans a script in chunks.
+#This is not a plugin and runs with plain Python 2 or 3 outside IronWASP: python benchmarks/domxss_chunk_benchmark.py [sizes in KB]
+#
+#FindMatches and the sources and sinks regex are read from Passive/DOMXSS.py. With no time budget FindMatches must find the same
+#matches as finditer over the whole script. This is checked on random scripts made of the words and characters the regex look for,
+#with small chunks so that matches often cross the end of a chunk. The earlier loop, that scanned each chunk from a fixed offset,
+#is run on the same scripts and the scripts it differed on are counted.
+#Then FindMatches and finditer over the whole script are timed on scripts of each size.
+
+import os
+import random
+import re
+import sys
+import textwrap
+import time
+
+plugin_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Passive", "DOMXSS.py")
+
+class Plugin:
+
+	def __init__(self, chunk_size, chunk_overlap):
+		self.chunk_size = chunk_size
+		self.chunk_overlap = chunk_overlap
+
+
+#[FindMatches, sources regex, sinks regex] as they are in Passive/DOMXSS.py
+def load_plugin():
+	source = open(plugin_path).read().replace("\r\n", "\n")
+	m = re.search(r"\n(\tdef FindMatches\(self, regex, script, time_left, budget_index\):\n(?:\t\t.*\n)*)", source)
+	namespace = {"time": time}
+	exec(textwrap.dedent(m.group(1)), namespace)
+	regexes = []
+	for name in ["sources", "sinks"]:
+		regexes.append(eval(re.search(r"\n\t" + name + r" = (re\.compile\(.*\))\n", source).group(1), {"re": re}))
+	return [namespace["FindMatches"], regexes[0], regexes[1]]
+
+def find_all(regex, script):
+	matches = []
+	for regex_match in regex.finditer(script):
+		for match in regex_match.groups():
+			if match != None and len(match) > 0:
+				matches.append(match)
+	return sorted(set(matches))
+
+def find_chunked(find_matches, plugin, regex, script):
+	matches, complete = find_matches(plugin, regex, script, [float("inf")], 0)
+	return sorted(matches)
+
+#The loop of FindMatches that scanned each chunk from chunk_size after the start of the last one
+def old_find_chunked(plugin, regex, script):
+	matches = []
+	start = 0
+	while True:
+		end = min(start + plugin.chunk_size + plugin.chunk_overlap, len(script))
+		for regex_match in regex.finditer(script, start, end):
+			for match in regex_match.groups():
+				if match != None and len(match) > 0:
+					matches.append(match)
+		if end == len(script):
+			return sorted(set(matches))
+		start = start + plugin.chunk_size
+
+def make_script(size, rnd, match_rate):
+	words = ["location", "arguments", "innerHTML", "write", "writeln", "open", "openDialog", "cookie", "URL", "referrer", "name", "top", "self",
+		"localStorage", "sessionStorage", "Database", "src", "href", "value", "action", "replace", "assign", "eval", "setTimeout", "execScript"]
+	marks = ["/", ".", "[", "]", "\"", "'", "=", "+", "(", ")", " ", "  ", "\t", "\r\n"]
+	filler = ["var x = 1;", "function f(a, b) { return a + b; }", "if (a < b) { c++; }", "\r\n", " ", "$('#id').hide();"]
+	parts = []
+	length = 0
+	while length < size:
+		if rnd.random() < match_rate:
+			part = "".join([rnd.choice([rnd.choice(words), rnd.choice(marks)]) for i in range(rnd.randrange(2, 8))])
+		else:
+			part = rnd.choice(filler)
+		parts.append(part)
+		length = length + len(part)
+	return "".join(parts)[:size]
+
+def check(find_matches, regexes):
+	rnd = random.Random(1)
+	differences = 0
+	old_differences = 0
+	runs = 0
+	for n in range(3000):
+		script = make_script(rnd.randrange(0, 3000), rnd, 0.8)
+		#overlaps longer than any match in these scripts, and chunks small enough for matches to cross their ends often
+		plugin = Plugin(rnd.randrange(1, 300), rnd.randrange(64, 200))
+		for regex in regexes:
+			runs = runs + 1
+			full = find_all(regex, script)
+			if find_chunked(find_matches, plugin, regex, script) != full:
+				differences = differences + 1
+				print("Different matches with chunk_size {0} for {1!r}".format(plugin.chunk_size, script[:80]))
+			if old_find_chunked(plugin, regex, script) != full:
+				old_differences = old_differences + 1
+	print("{0} scans compared, {1} difference[s], the earlier loop differed on {2}".format(runs, differences, old_differences))
+	return differences == 0
+
+def bench(find_matches, regexes, sizes):
+	rnd = random.Random(2)
+	plugin = Plugin(64 * 1024, 1024)
+	for size in sizes:
+		script = make_script(size * 1024, rnd, 0.01)
+		for name, regex in [["sources", regexes[0]], ["sinks", regexes[1]]]:
+			start = time.time()
+			chunked = find_chunked(find_matches, plugin, regex, script)
+			chunked_time = time.time() - start
+			start = time.time()
+			full = find_all(regex, script)
+			line = "{0:>6} KB {1:<8} FindMatches {2:.4f}s, finditer over the whole script {3:.4f}s".format(size, name, chunked_time, time.time() - start)
+			if chunked != full:
+				line = line + ", DIFFERENT MATCHES"
+			print(line + ", {0} match[es]".format(len(full)))
+
+def main():
+	sizes = [100, 1024, 5120]
+	if len(sys.argv) > 1:
+		sizes = [int(s) for s in sys.argv[1:]]
+	find_matches, sources, sinks = load_plugin()
+	if not check(find_matches, [sources, sinks]):
+		sys.exit(1)
+	bench(find_matches, [sources, sinks], sizes)
+
+if __name__ == "__main__":
+	main()
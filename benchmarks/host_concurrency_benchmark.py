@@ -0,0 +1,227 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+
+#Benchmark of the HostConcurrencyController against a stand-in server with a limited capacity.
+#This is not a plugin and runs with plain Python 2 or 3 outside IronWASP: python benchmarks/host_concurrency_benchmark.py [capacities]
+#
+#The controller is read from active/HostConcurrencyController.py and run with stand-ins for the .NET Monitor, Thread and DateTime.
+#The stand-in server handles 'capacity' requests at a time, each in service_ms. Requests above that wait in a queue of the same size
+#and the server answers 503 right away once the queue is full too, so the response time grows and errors show up as the load goes over
+#its capacity. A batch of requests is sent the way the ConcurrentInjector sends its copies: max_workers threads that each Acquire a slot,
+#send and Release it. A thread that gets no slot leaves its requests to the scanner, which sends them one at a time here.
+#For each capacity the batch is sent one request at a time, with a fixed pool of max_workers threads and with the controller, and the
+#throughput of answered requests, their response times, the 503s and the limit the controller ended with are printed.
+#The quiet window and the slots are checked first.
+
+import os
+import re
+import sys
+import textwrap
+import threading
+import time
+
+service_ms = 20
+requests_per_run = 200
+max_workers = 8
+
+class Object:
+
+	def __init__(self):
+		self.condition = threading.Condition(threading.RLock())
+
+
+class Monitor:
+
+	@staticmethod
+	def Enter(o):
+		o.condition.acquire()
+
+	@staticmethod
+	def Exit(o):
+		o.condition.release()
+
+	@staticmethod
+	def Wait(o, ms):
+		o.condition.wait(ms / 1000.0)
+
+	@staticmethod
+	def PulseAll(o):
+		o.condition.notify_all()
+
+
+class ThreadInfo:
+
+	def __init__(self):
+		self.ManagedThreadId = threading.current_thread().ident
+
+
+class ThreadStatic:
+
+	@property
+	def CurrentThread(self):
+		return ThreadInfo()
+
+
+class DateTimeValue:
+
+	def __init__(self, seconds):
+		self.seconds = seconds
+
+	def AddMilliseconds(self, ms):
+		return DateTimeValue(self.seconds + ms / 1000.0)
+
+	def __lt__(self, other):
+		return self.seconds < other.seconds
+
+	def __gt__(self, other):
+		return self.seconds > other.seconds
+
+
+class DateTimeStatic:
+
+	MinValue = DateTimeValue(0.0)
+
+	@property
+	def Now(self):
+		return DateTimeValue(time.time())
+
+
+class Res:
+
+	def __init__(self, code, round_trip):
+		self.Code = code
+		self.RoundTrip = round_trip
+
+
+#A server that handles capacity requests at a time and queues as many more
+class StandInServer:
+
+	def __init__(self, capacity):
+		self.capacity = capacity
+		self.slots = threading.Semaphore(capacity)
+		self.lock = threading.Lock()
+		self.waiting = 0
+
+	def Send(self):
+		start = time.time()
+		with self.lock:
+			if self.waiting >= self.capacity * 2:
+				return Res(503, int((time.time() - start) * 1000))
+			self.waiting = self.waiting + 1
+		self.slots.acquire()
+		try:
+			time.sleep(service_ms / 1000.0)
+		finally:
+			self.slots.release()
+			with self.lock:
+				self.waiting = self.waiting - 1
+		return Res(200, int((time.time() - start) * 1000))
+
+
+#HostConcurrencyController as it is in active/HostConcurrencyController.py
+def load_controller_class():
+	path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "active", "HostConcurrencyController.py")
+	source = open(path).read().replace("\r\n", "\n")
+	code = ""
+	for name in ["HostConcurrencyController", "HostState"]:
+		m = re.search(r"\n(class " + name + r":\n(?:(?:  .*)?\n)*)", source)
+		code = code + m.group(1)
+	#IronPython 2 only calls, so that the classes also run with Python 3
+	code = code.replace(".has_key(", ".__contains__(")
+	namespace = {"Object": Object, "Monitor": Monitor, "Thread": ThreadStatic(), "DateTime": DateTimeStatic()}
+	exec(textwrap.dedent(code), namespace)
+	return namespace["HostConcurrencyController"]
+
+#Sends requests_per_run requests on workers threads, through the controller if there is one, and returns the responses
+def send_batch(server, workers, controller):
+	pending = list(range(requests_per_run))
+	lock = threading.Lock()
+	responses = []
+	left = []
+	def send_pending():
+		while True:
+			with lock:
+				if len(pending) == 0:
+					return
+				pending.pop(0)
+			started = None
+			if controller != None:
+				started = controller.Acquire("stand-in")
+				if started == None:
+					with lock:
+						left.append(1)
+					return
+			res = server.Send()
+			if controller != None:
+				controller.Release("stand-in", started, res)
+			with lock:
+				responses.append(res)
+	threads = [threading.Thread(target=send_pending) for w in range(workers)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	#what the threads did not send is injected through the scanner, one request at a time
+	for i in range(len(pending) + len(left)):
+		responses.append(server.Send())
+	return responses
+
+def run(name, capacity, workers, controller_class):
+	server = StandInServer(capacity)
+	controller = None
+	if controller_class != None:
+		controller = controller_class()
+	start = time.time()
+	responses = send_batch(server, workers, controller)
+	elapsed = time.time() - start
+	times = sorted([res.RoundTrip for res in responses if res.Code == 200])
+	errors = len([res for res in responses if res.Code != 200])
+	#a 503 comes back at once, so only the answered requests count in the throughput
+	line = "  {0:<22} {1:>4.0f} answered/s, response time median {2:>4}ms p90 {3:>4}ms, {4:>3} 503s".format(name, len(times) / elapsed, times[len(times) // 2], times[int(len(times) * 0.9)], errors)
+	if controller != None:
+		line = line + ", limit ended at {0}".format(controller.GetLimit("stand-in"))
+	print(line)
+
+#A quiet window is not had while a slot is taken, and no slot is given while another thread has a window
+def check(controller_class):
+	ok = True
+	controller = controller_class()
+	controller.max_quiet_wait = 300
+	started = controller.Acquire("stand-in")
+	if controller.BeginQuietWindow("stand-in"):
+		print("A quiet window was had with an injection still in flight")
+		ok = False
+	controller.Release("stand-in", started, Res(200, 10))
+	if not controller.BeginQuietWindow("stand-in"):
+		print("No quiet window was had with nothing in flight")
+		ok = False
+	other = []
+	t = threading.Thread(target=lambda: other.append(controller.Acquire("stand-in")))
+	t.start()
+	t.join()
+	if other[0] != None:
+		print("A slot was given while another thread had a quiet window")
+		ok = False
+	controller.EndQuietWindow("stand-in")
+	if controller.Acquire("stand-in") == None:
+		print("No slot was given after the quiet window ended")
+		ok = False
+	print("Quiet window and slot checks {0}".format(["failed", "passed"][ok]))
+	return ok
+
+def main():
+	capacities = [1, 2, 4, 8, 16]
+	if len(sys.argv) > 1:
+		capacities = [int(c) for c in sys.argv[1:]]
+	controller_class = load_controller_class()
+	if not check(controller_class):
+		sys.exit(1)
+	print("{0} requests of {1}ms each, {2} worker threads".format(requests_per_run, service_ms, max_workers))
+	for capacity in capacities:
+		print("Server capacity {0}:".format(capacity))
+		run("one at a time", capacity, 1, None)
+		run("fixed pool of {0}".format(max_workers), capacity, max_workers, None)
+		run("controller", capacity, max_workers, controller_class)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,176 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+
+#Equivalence test and benchmark of how the MultiPart format plugin finds the boundaries of a body.
+#This is not a plugin and runs with plain Python 2 or 3 outside IronWASP: python benchmarks/multipart_boundary_benchmark.py [sizes in MB]
+#
+#get_boundary_points is read from Format/MultiPart.py and run with a stand-in for the ISO-8859-1 Encoding. The per-byte check_boundary
+#loop it replaced is ported here as it was, reading out of the body counts as no match where IronPython would have raised.
+#Both are run on crafted bodies and on random bodies made of the characters that markers are made of, and must give the same
+#boundary offsets and the same parts. Then both are timed on bodies with a binary upload of each size, the old loop only up to old_max_mb.
+
+import os
+import random
+import re
+import sys
+import textwrap
+import time
+
+boundary = "----WebKitFormBoundary7MA4YWxkTrZu0gW"
+#The old loop takes seconds a MB, it is not timed on bodies larger than this
+old_max_mb = 10
+
+class Latin1:
+
+	def GetString(self, ba):
+		return bytes(ba).decode("latin-1")
+
+
+class Encoding:
+
+	@staticmethod
+	def GetEncoding(code_page):
+		return Latin1()
+
+
+class Req:
+
+	def __init__(self, body):
+		self.BodyArray = body
+
+
+#get_boundary_points as it is in Format/MultiPart.py
+def load_new_points():
+	path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Format", "MultiPart.py")
+	source = open(path).read().replace("\r\n", "\n")
+	m = re.search(r"\n(\tdef get_boundary_points\(self, req, sign_bytes\):\n(?:\t\t.*\n)*)", source)
+	namespace = {"Encoding": Encoding}
+	exec(textwrap.dedent(m.group(1).replace("\t", "    ")), namespace)
+	find = namespace["get_boundary_points"]
+	return lambda body, sign: find(None, Req(body), sign)
+
+#The check_boundary loop of BodyToXml before get_boundary_points
+def old_check_boundary(sign_bytes, ba, index):
+	for i in range(len(sign_bytes)):
+		if index + i >= len(ba) or sign_bytes[i] != ba[index + i]:
+			return "No"
+	end_ba = ba[index + len(sign_bytes):index + len(sign_bytes) + 2]
+	if len(end_ba) < 2:
+		return "No"
+	if end_ba == bytearray(b"--"):
+		return "End"
+	elif end_ba == bytearray(b"\r\n"):
+		return "Bound"
+	else:
+		return "No"
+
+def old_points(body, sign):
+	b_len = len(sign) + 2
+	i = 0
+	points = []
+	while i < len(body):
+		chk_result = old_check_boundary(sign, body, i)
+		if chk_result == "Bound":
+			points.append(i)
+			i = i + b_len
+		elif chk_result == "End":
+			points.append(i)
+			i = len(body)
+		else:
+			i = i + 1
+	return points
+
+#The parts BodyToXml slices out between the points, old is the loop before get_boundary_points which skipped the last point
+def old_parts(body, points, b_len):
+	parts = []
+	start_point = 0
+	for i in range(len(points)):
+		if i == len(points) - 1:
+			if i == 0:
+				#end_point was never set, the old code raised a NameError here
+				return None
+		else:
+			if i == 0:
+				start_point = points[i] + b_len
+			end_point = points[i + 1] - 2
+			parts.append(bytes(body[start_point:end_point]))
+			start_point = points[i + 1] + b_len
+	return parts
+
+def new_parts(body, points, b_len):
+	return [bytes(body[points[i] + b_len:points[i + 1] - 2]) for i in range(len(points) - 1)]
+
+def make_body(upload_size, rnd):
+	marker = ("--" + boundary).encode("latin-1")
+	upload = bytearray(rnd.getrandbits(8) for i in range(min(upload_size, 65536)))
+	while len(upload) < upload_size:
+		upload.extend(upload[:upload_size - len(upload)])
+	#near misses, the marker with something other than CRLF or -- after it and the marker cut short
+	for i in range(0, upload_size - 2 * len(marker), max(upload_size // 50, len(marker) + 3)):
+		upload[i:i + len(marker) + 1] = marker + b"x"
+		upload[i + len(marker) + 1:i + 2 * len(marker)] = marker[:len(marker) - 1]
+	body = bytearray()
+	body.extend(marker + b"\r\nContent-Disposition: form-data; name=\"title\"\r\n\r\nsome text\r\n")
+	body.extend(marker + b"\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.bin\"\r\nContent-Type: application/octet-stream\r\n\r\n")
+	body.extend(upload)
+	body.extend(b"\r\n" + marker + b"--\r\n")
+	return body
+
+def check(new_find):
+	sign = bytearray(("--" + boundary).encode("latin-1"))
+	b_len = len(sign) + 2
+	rnd = random.Random(21)
+	bodies = [make_body(size, rnd) for size in [0, 1, 100, 5000]]
+	bodies.append(bytearray(sign + b"--\r\n"))
+	bodies.append(bytearray(sign + b"\r\nabc\r\n" + sign))
+	bodies.append(bytearray(sign + b"-x" + sign + b"\r\n\r\n" + sign + b"--"))
+	#random bodies from the characters markers are made of, with short boundaries so that markers turn up often.
+	#A boundary of dashes makes markers that overlap each other.
+	cases = [(body, sign) for body in bodies]
+	for short_sign, alphabet in [(bytearray(b"--ab"), bytearray(b"-\r\nab")), (bytearray(b"---"), bytearray(b"-\r\n"))]:
+		for n in range(3000):
+			body = bytearray([alphabet[rnd.randrange(len(alphabet))] for i in range(rnd.randrange(1, 40))])
+			cases.append((body, short_sign))
+	differences = 0
+	for body, s in cases:
+		old = old_points(body, s)
+		new = new_find(body, s)
+		if old != new:
+			differences = differences + 1
+			print("Different points for {0!r}: old {1}, new {2}".format(bytes(body[:80]), old, new))
+			continue
+		o_parts = old_parts(body, old, len(s) + 2)
+		if o_parts != None and o_parts != new_parts(body, new, len(s) + 2):
+			differences = differences + 1
+			print("Different parts for {0!r}".format(bytes(body[:80])))
+	print("{0} bodies compared, {1} difference[s]".format(len(cases), differences))
+	return differences == 0
+
+def bench(new_find, sizes):
+	sign = bytearray(("--" + boundary).encode("latin-1"))
+	rnd = random.Random(1)
+	for size in sizes:
+		body = make_body(size * 1024 * 1024, rnd)
+		start = time.time()
+		new = new_find(body, sign)
+		new_time = time.time() - start
+		line = "{0:>4} MB  get_boundary_points {1:.4f}s".format(size, new_time)
+		if size <= old_max_mb:
+			start = time.time()
+			old = old_points(body, sign)
+			line = line + ", per-byte loop {0:.2f}s".format(time.time() - start)
+			if old != new:
+				line = line + ", DIFFERENT POINTS"
+		print(line + ", {0} boundaries".format(len(new)))
+
+def main():
+	sizes = [1, 10, 100]
+	if len(sys.argv) > 1:
+		sizes = [int(s) for s in sys.argv[1:]]
+	new_find = load_new_points()
+	if not check(new_find):
+		sys.exit(1)
+	bench(new_find, sizes)
+
+if __name__ == "__main__":
+	main()
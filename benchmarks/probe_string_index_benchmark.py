@@ -0,0 +1,157 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+
+#Equivalence test and benchmark of how CheckReflection finds probe strings in a response with the ProbeStringIndex.
+#This is not a plugin and runs with plain Python 2 or 3 outside IronWASP: python benchmarks/probe_string_index_benchmark.py [numbers of probe strings]
+#
+#ProbeStringIndex is read from Passive/CheckReflection.py and run with stand-ins for the .NET Object and Monitor. It must find the same
+#probe strings, in the same order, as a search for each probe string on its own. This is checked on random texts with probe strings that
+#all start the same way, that share no start and that are cut from each other so that anchors overlap.
+#Then the index, the per-character loop it used when the probe strings share no start, and a search for each probe string are timed
+#on a response body for each number of probe strings.
+
+import os
+import random
+import re
+import string
+import sys
+import textwrap
+import time
+
+body_kb = 512
+letters = string.ascii_letters + string.digits
+
+class Object:
+	pass
+
+
+class Monitor:
+
+	@staticmethod
+	def Enter(o):
+		pass
+
+	@staticmethod
+	def Exit(o):
+		pass
+
+
+#ProbeStringIndex as it is in Passive/CheckReflection.py
+def load_index_class():
+	path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Passive", "CheckReflection.py")
+	source = open(path).read().replace("\r\n", "\n")
+	m = re.search(r"\n(class ProbeStringIndex:\n(?:(?:\t.*)?\n)*)", source)
+	#IronPython 2 only calls, so that the class also runs with Python 3
+	code = m.group(1).replace(".has_key(", ".__contains__(").replace("xrange(", "range(")
+	namespace = {"Object": Object, "Monitor": Monitor, "re": re}
+	exec(textwrap.dedent(code), namespace)
+	return namespace["ProbeStringIndex"]
+
+#A search for each probe string on its own, in the order they were added
+def find_each(probe_strings, texts):
+	found = []
+	for ps in probe_strings:
+		if len(ps) > 0 and found.count(ps) == 0:
+			for text in texts:
+				if text.find(ps) > -1:
+					found.append(ps)
+					break
+	return found
+
+#The loop of FindInChunk that looked up the anchor at every position when the probe strings shared no start
+def old_find_in(index, snapshot, text):
+	anchors, anchor_length = snapshot[0], snapshot[1]
+	found = {}
+	for i in range(0, len(text) - anchor_length + 1):
+		if text[i:i + anchor_length] in anchors:
+			index.MatchAt(text, i, anchors, anchor_length, snapshot[6], found)
+	return sorted(found.keys(), key=lambda ps: found[ps])
+
+def make_probe_strings(count, rnd, kind, min_length):
+	probe_strings = []
+	for n in range(count):
+		if kind == "common start":
+			ps = "irwsp" + "".join([rnd.choice(letters) for i in range(rnd.randrange(3, 10))])
+		elif kind == "overlapping" and len(probe_strings) > 0 and rnd.random() < 0.5:
+			#a probe string that starts inside another one, so that an anchor is found inside another anchor
+			other = rnd.choice(probe_strings)
+			ps = other[rnd.randrange(len(other)):] + "".join([rnd.choice(letters[:4]) for i in range(rnd.randrange(1, 6))])
+		else:
+			ps = "".join([rnd.choice(letters) for i in range(rnd.randrange(min_length, 14))])
+		probe_strings.append(ps)
+	return probe_strings
+
+def make_text(size, probe_strings, rnd, probe_rate):
+	parts = []
+	length = 0
+	while length < size:
+		if rnd.random() < probe_rate:
+			ps = rnd.choice(probe_strings)
+			#parts of probe strings too, so that anchors are found without their probe string
+			part = ps[:rnd.randrange(1, len(ps) + 1)]
+		else:
+			part = "".join([rnd.choice(letters + " <>\"'=/") for i in range(rnd.randrange(1, 40))])
+		parts.append(part)
+		length = length + len(part)
+	return "".join(parts)[:size]
+
+def check(index_class):
+	rnd = random.Random(1)
+	differences = 0
+	runs = 0
+	for kind in ["common start", "no common start", "overlapping"]:
+		for count in [1, 5, 70, 300]:
+			index = index_class()
+			index.chunk_size = 97
+			probe_strings = []
+			for step in range(3):
+				probe_strings = probe_strings + make_probe_strings(count, rnd, kind, 1)
+				snapshot = index.Update(probe_strings)
+				for n in range(40):
+					texts = [make_text(rnd.randrange(0, 600), probe_strings, rnd, 0.2) for t in range(rnd.randrange(1, 4))]
+					runs = runs + 1
+					if index.FindIn(snapshot, texts) != find_each(probe_strings, texts):
+						differences = differences + 1
+						print("Different probe strings found with {0} probe strings that have {1}".format(len(probe_strings), kind))
+	print("{0} searches compared, {1} difference[s]".format(runs, differences))
+	return differences == 0
+
+def bench(index_class, counts):
+	rnd = random.Random(2)
+	for kind in ["no common start", "common start"]:
+		print("Probe strings with {0}, {1} KB body:".format(kind, body_kb))
+		for count in counts:
+			probe_strings = make_probe_strings(count, rnd, kind, 8)
+			index = index_class()
+			start = time.time()
+			snapshot = index.Update(probe_strings)
+			update_time = time.time() - start
+			#a response seldom has a probe string in it, most of the body is the page itself
+			text = make_text(body_kb * 1024, probe_strings, rnd, 0.001)
+			start = time.time()
+			new = index.FindIn(snapshot, [text])
+			line = "  {0:>5} probe strings  index {1:.4f}s (built in {2:.4f}s)".format(count, time.time() - start, update_time)
+			if len(snapshot[3]) > 0:
+				start = time.time()
+				old = old_find_in(index, snapshot, text)
+				line = line + ", per-character loop {0:.4f}s".format(time.time() - start)
+				if old != new:
+					line = line + " DIFFERENT"
+			start = time.time()
+			each = find_each(probe_strings, [text])
+			line = line + ", search for each {0:.4f}s".format(time.time() - start)
+			if each != new:
+				line = line + " DIFFERENT"
+			print(line + ", {0} found".format(len(new)))
+
+def main():
+	counts = [100, 1000, 5000]
+	if len(sys.argv) > 1:
+		counts = [int(c) for c in sys.argv[1:]]
+	index_class = load_index_class()
+	if not check(index_class):
+		sys.exit(1)
+	bench(index_class, counts)
+
+if __name__ == "__main__":
+	main()
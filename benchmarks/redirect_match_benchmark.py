@@ -0,0 +1,142 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+
+#Micro-benchmark of how HeaderAnalysis finds the request value that a redirect Location is made of.
+#This is not a plugin and runs with plain Python 2 or 3 outside IronWASP: python benchmarks/redirect_match_benchmark.py
+#
+#FindRequestValue is read from Passive/HeaderAnalysis.py and run on stand-in requests with thousands of parameters. It is timed against
+#the loop it replaced, which lowercased every value, and against a lowercased value -> section map built for each request.
+#Every case is first checked to give the same result with all three.
+
+import os
+import re
+import sys
+import textwrap
+import time
+
+class Params:
+
+	def __init__(self, pairs):
+		self.pairs = pairs
+		self.names = []
+		self.values = {}
+		for name, value in pairs:
+			if not name in self.values:
+				self.names.append(name)
+				self.values[name] = []
+			self.values[name].append(value)
+
+	def GetNames(self):
+		return list(self.names)
+
+	def GetAll(self, name):
+		return list(self.values[name])
+
+	def Has(self, name):
+		return name in self.values
+
+	def Get(self, name):
+		return self.values[name][0]
+
+
+class Req:
+
+	def __init__(self, path_parts, query, body, referrer):
+		self.UrlPathParts = path_parts
+		self.Query = Params(query)
+		self.Body = Params(body)
+		headers = []
+		if referrer != None:
+			headers.append(("Referer", referrer))
+		self.Headers = Params(headers)
+
+
+class Sess:
+
+	def __init__(self, req):
+		self.Request = req
+
+
+#The loop before this change, it lowercased every value
+def find_old(Sess, text):
+	for part in Sess.Request.UrlPathParts:
+		if part.lower() == text:
+			return ["url", part]
+	for name in Sess.Request.Query.GetNames():
+		for val in Sess.Request.Query.GetAll(name):
+			if val.lower() == text:
+				return ["query:{0}".format(name), val]
+	for name in Sess.Request.Body.GetNames():
+		for val in Sess.Request.Body.GetAll(name):
+			if val.lower() == text:
+				return ["body:{0}".format(name), val]
+	if Sess.Request.Headers.Has("Referer"):
+		if Sess.Request.Headers.Get("Referer").lower() == text:
+			return ["referrer", Sess.Request.Headers.Get("Referer")]
+	return None
+
+#A lowercased value -> [section, value] map of the request, built for the one lookup that HeaderAnalysis makes on a session
+def find_map(Sess, text):
+	values = {}
+	for part in Sess.Request.UrlPathParts:
+		values.setdefault(part.lower(), ["url", part])
+	for name in Sess.Request.Query.GetNames():
+		for val in Sess.Request.Query.GetAll(name):
+			values.setdefault(val.lower(), ["query:{0}".format(name), val])
+	for name in Sess.Request.Body.GetNames():
+		for val in Sess.Request.Body.GetAll(name):
+			values.setdefault(val.lower(), ["body:{0}".format(name), val])
+	if Sess.Request.Headers.Has("Referer"):
+		values.setdefault(Sess.Request.Headers.Get("Referer").lower(), ["referrer", Sess.Request.Headers.Get("Referer")])
+	return values.get(text)
+
+#FindRequestValue as it is in Passive/HeaderAnalysis.py
+def load_find_new():
+	path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Passive", "HeaderAnalysis.py")
+	source = open(path).read().replace("\r\n", "\n")
+	m = re.search(r"\n(\tdef FindRequestValue\(self, Sess, text\):\n(?:\t\t.*\n)*)", source)
+	namespace = {}
+	exec(textwrap.dedent(m.group(1).replace("\t", "    ")), namespace)
+	find = namespace["FindRequestValue"]
+	return lambda Sess, text: find(None, Sess, text)
+
+def make_sessions(count, params):
+	sessions = []
+	for s in range(count):
+		query = [("q{0}".format(i), "QueryValue{0}_{1}".format(s, i)) for i in range(10)]
+		body = [("field{0}".format(i), "Some Body Value {0} {1}".format(s, i)) for i in range(params)]
+		req = Req(["app", "Page{0}".format(s)], query, body, "http://example.com/from/{0}".format(s))
+		sessions.append(Sess(req))
+	return sessions
+
+def check(finds, sessions):
+	texts = ["nothing matches this", "app", "queryvalue0_3", "some body value 0 4999", "http://example.com/from/0", "SOME BODY VALUE 0 1".lower(), ""]
+	for sess in sessions[:1]:
+		for text in texts:
+			results = [find(sess, text) for find in finds]
+			for result in results[1:]:
+				if result != results[0]:
+					print("Mismatch for '{0}': {1}".format(text, results))
+					sys.exit(1)
+	print("All {0} lookups gave the same result with every version".format(len(texts)))
+
+def run(name, find, sessions, text):
+	start = time.time()
+	for sess in sessions:
+		find(sess, text)
+	print("  {0:<32} {1:.3f}s".format(name, time.time() - start))
+
+def main():
+	params = 5000
+	if len(sys.argv) > 1:
+		params = int(sys.argv[1])
+	finds = [("old loop, lowercases every value", find_old), ("FindRequestValue", load_find_new()), ("map built per request", find_map)]
+	sessions = make_sessions(100, params)
+	check([f for n, f in finds], sessions)
+	#HeaderAnalysis looks up the Location once for each session, and a Location that is not in the request is the common case that scans every value
+	print("100 requests with {0} body parameters, one lookup each of a Location that matches nothing:".format(params))
+	for name, find in finds:
+		run(name, find, sessions, "http://elsewhere.example.com/landing")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,109 @@
+#Author: Lavakumar Kuppan
+#License: MIT License - http://www.opensource.org/licenses/mit-license
+
+#Equivalence test and benchmark of how SQLInjection finds SQL error signatures in a response body.
+#This is not a plugin and runs with plain Python 2 or 3 outside IronWASP: python benchmarks/sql_error_signature_benchmark.py [sizes in KB]
+#
+#ErrorSignatureMatcher is read from active/SQLInjection.py and the signatures from active/sql_error_regex.txt, the way SetUp reads them.
+#The loop it replaced ran findall of every signature on the body. Both are run on random bodies made of HTML and the words of the
+#signatures, so that keys turn up without their signature often, and must find the same matches. Then both are timed on bodies of each size.
+
+import os
+import random
+import re
+import sys
+import textwrap
+import time
+
+active = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "active")
+
+#The signatures as SetUp reads them, [raw patterns, compiled patterns]
+def load_signatures():
+	lines = open(os.path.join(active, "sql_error_regex.txt")).read().replace("\r\n", "\n").split("\n")[1:]
+	raw = [line.strip() for line in lines if len(line.strip()) > 0 and not line.strip().startswith("#DBMS:")]
+	return [raw, [re.compile(r, re.I) for r in raw]]
+
+#ErrorSignatureMatcher as it is in active/SQLInjection.py
+def load_matcher_class():
+	source = open(os.path.join(active, "SQLInjection.py")).read().replace("\r\n", "\n")
+	m = re.search(r"\n(class ErrorSignatureMatcher:\n(?:(?:  .*)?\n)*)", source)
+	code = m.group(1)
+	#IronPython 2 only calls, so that the class also runs with Python 3
+	code = code.replace(".has_key(", ".__contains__(").replace("self.key_signatures.keys()", "list(self.key_signatures.keys())")
+	namespace = {}
+	exec(textwrap.dedent(code), namespace)
+	return namespace["ErrorSignatureMatcher"]
+
+#The loop of AnalyseInjectionResultForError before ErrorSignatureMatcher
+def old_find_all(signatures, body):
+	all_matches = {}
+	for i in range(len(signatures)):
+		matches = signatures[i].findall(body)
+		if len(matches) > 0:
+			all_matches[i] = matches
+	return all_matches
+
+#Words of the signatures, with the regex syntax taken out, and some of them cut short so that keys are found without a full match
+def get_words(raw):
+	words = []
+	for r in raw:
+		for word in re.split(r"[\\\[\]().*+?|^$\s]+", r):
+			if len(word) > 0:
+				words.append(word)
+				words.append(word[:len(word) // 2])
+	return words
+
+def make_body(size, words, rnd, error_rate):
+	filler = ["<div class=\"row\">", "</div>", "<td>", "</td>", "Lorem ipsum dolor sit amet", "<a href=\"/item?id=42\">", "\r\n", " ", "'", "\""]
+	parts = []
+	length = 0
+	while length < size:
+		if rnd.random() < error_rate:
+			part = " ".join([rnd.choice(words) for i in range(rnd.randrange(1, 5))])
+		else:
+			part = rnd.choice(filler)
+		parts.append(part)
+		length = length + len(part)
+	return "".join(parts)[:size]
+
+def check(matcher, signatures, words):
+	rnd = random.Random(1)
+	bodies = ["", "Warning: mysql_fetch_array() expects parameter 1", "ORA-00933: SQL command not properly ended", "Unclosed quotation mark after the character string"]
+	bodies.extend([make_body(rnd.randrange(1, 3000), words, rnd, 0.5) for n in range(2000)])
+	differences = 0
+	for body in bodies:
+		if matcher.FindAll(body) != old_find_all(signatures, body):
+			differences = differences + 1
+			print("Different matches for {0!r}".format(body[:80]))
+	print("{0} bodies compared, {1} difference[s]".format(len(bodies), differences))
+	return differences == 0
+
+def bench(matcher, signatures, words, sizes):
+	rnd = random.Random(2)
+	for size in sizes:
+		#an error page is the exception, most injected responses are the normal page with no signature in them
+		body = make_body(size * 1024, words, rnd, 0.001)
+		start = time.time()
+		new = matcher.FindAll(body)
+		new_time = time.time() - start
+		start = time.time()
+		old = old_find_all(signatures, body)
+		line = "{0:>6} KB  ErrorSignatureMatcher {1:.4f}s, findall of every signature {2:.4f}s".format(size, new_time, time.time() - start)
+		if old != new:
+			line = line + ", DIFFERENT MATCHES"
+		print(line + ", {0} signature[s] matched".format(len(new)))
+
+def main():
+	sizes = [100, 1024, 5120]
+	if len(sys.argv) > 1:
+		sizes = [int(s) for s in sys.argv[1:]]
+	raw, signatures = load_signatures()
+	matcher = load_matcher_class()(raw, signatures)
+	words = get_words(raw)
+	print("{0} signatures, {1} without a key and always run".format(len(raw), len(matcher.unkeyed_signatures)))
+	if not check(matcher, signatures, words):
+		sys.exit(1)
+	bench(matcher, signatures, words, sizes)
+
+if __name__ == "__main__":
+	main()